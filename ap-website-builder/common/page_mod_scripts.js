@@ -10,6 +10,7 @@ class SiteModificationUI {
         this.insertionButtons = [];
         this.siteId = null;
         this.pageId = null;
+        this.pageEtag = null;
     }
 
     /**
@@ -25,6 +26,7 @@ class SiteModificationUI {
             this.siteId = pathnameComps[editorIndex-1];
             this.pageId = pathnameComps[editorIndex+1];
             this.pageId = this.pageId.split('.')[0];
+            await this.loadPageEtag();
         } catch (error) {
             console.error('Failed to initialize Site Modification UI:', error);
         }
@@ -200,7 +202,10 @@ class SiteModificationUI {
 
             componentOption.addEventListener('click', () => {
                 modal.remove();
-                this.insertComponent(component, {}, targetElement);
+                const params = this.promptComponentParams(component);
+                if (params) {
+                    this.insertComponent(component, params, targetElement);
+                }
             });
 
             componentOption.addEventListener('mouseenter', () => {
@@ -716,45 +721,96 @@ class SiteModificationUI {
         return null;
     }
 
+    /**
+     * Ask for a value for each of the component's @param declarations
+     * The server rejects inserts with missing parameters (422).
+     * @param {Object} component - The component to insert
+     * @returns {Object|null} Parameter values, or null if the user cancelled
+     */
+    promptComponentParams(component) {
+        const params = {};
+        for (const name of component.params || []) {
+            let value = '';
+            while (!value.trim()) {
+                value = prompt(`${component.name}: ${name}`, value);
+                if (value === null) {
+                    return null;
+                }
+            }
+            params[name] = value;
+        }
+        return params;
+    }
+
     /**
      * Insert component into the target element
+     * The server renders the component and applies it to the stored page, so
+     * only the operation is uploaded rather than the whole document.
      * @param {Object} component - The component to insert
-     * @param {Object} params - Parameter values (unused since components no longer have parameters)
+     * @param {Object} params - Parameter values for the component's ${PARAM} placeholders
      * @param {Element} targetElement - The target DOM element
      */
-    insertComponent(component, params, targetElement) {
+    async insertComponent(component, params, targetElement) {
         try {
-            // Process component content
-            let processedContent = component.content;
+            const [selector] = component.target.split(':');
+            const index = Array.from(document.querySelectorAll(selector)).indexOf(targetElement);
 
-            // Remove comment lines with @target and @param
-            processedContent = processedContent.replace(/<!--\s*@(target|param).*?-->/g, '');
+            await this.patchPage([{
+                op: 'insert_component',
+                component: component.id,
+                target: component.target,
+                index: Math.max(index, 0),
+                params: params || {}
+            }]);
 
-            // Create temporary container to parse HTML
-            const tempDiv = document.createElement('div');
-            tempDiv.innerHTML = processedContent.trim();
+            console.log(`Inserted component ${component.name}`);
+        } catch (error) {
+            console.error('Failed to insert component:', error);
+            alert('Failed to insert component: ' + error.message);
+        }
+    }
 
-            // Insert the processed content
-            if (component.target.includes(':child')) {
-                // Insert as child
-                while (tempDiv.firstChild) {
-                    targetElement.appendChild(tempDiv.firstChild);
-                }
-            } else {
-                // Insert before the element
-                while (tempDiv.firstChild) {
-                    targetElement.parentNode.insertBefore(tempDiv.firstChild, targetElement);
-                }
-            }
+    /**
+     * Apply partial updates to the stored page and reload it
+     * @param {Array} operations - insert_component / replace_content / remove operations
+     */
+    async patchPage(operations) {
+        const headers = {
+            'Content-Type': 'application/json'
+        };
+        if (this.pageEtag) {
+            headers['If-Match'] = this.pageEtag;
+        }
 
-            console.log(`Inserted component ${component.name}`);
+        const response = await fetch(`http://127.0.0.1:8000/api/v1/sites/${this.siteId}/pages/${this.pageId}`, {
+            method: 'PATCH',
+            headers: headers,
+            body: JSON.stringify({ operations: operations })
+        });
 
-            // Refresh insertion buttons to account for new DOM structure
-            setTimeout(() => this.savePage(), 100);
+        if (response.ok) {
+            window.location.reload();
+        } else if (response.status === 412) {
+            alert('This page was changed in another editor. It will be reloaded with the latest version.');
+            window.location.reload();
+        } else {
+            throw new Error(`Failed to update page: ${response.statusText}`);
+        }
+    }
 
+    /**
+     * Fetch the current page validator so saves can be made conditional
+     */
+    async loadPageEtag() {
+        try {
+            const response = await fetch(`http://127.0.0.1:8000/api/v1/sites/${this.siteId}/pages/${this.pageId}`, {
+                method: 'HEAD'
+            });
+            if (response.ok) {
+                this.pageEtag = response.headers.get('ETag');
+            }
         } catch (error) {
-            console.error('Failed to insert component:', error);
-            alert('Failed to insert component: ' + error.message);
+            console.error('Failed to load page ETag:', error);
         }
     }
 
@@ -772,6 +828,7 @@ class SiteModificationUI {
                 throw new Error(`Failed to get page: ${response.statusText}`);
             }
 
+            this.pageEtag = response.headers.get('ETag') || this.pageEtag;
             const pageContent = await response.text();
             return pageContent;
         } catch (error) {
@@ -786,12 +843,18 @@ class SiteModificationUI {
     async savePage() {
         try {
             this.removeInsertionButtons();
+            const headers = {
+                'Content-Type': 'application/json'
+            };
+            // Refuse to overwrite changes saved from another tab since this page was loaded
+            if (this.pageEtag) {
+                headers['If-Match'] = this.pageEtag;
+            }
+
             // Send the HTML to the backend to save
             const response = await fetch(`http://127.0.0.1:8000/api/v1/sites/${this.siteId}/pages/${this.pageId}`, {
                 method: 'PUT',
-                headers: {
-                    'Content-Type': 'application/json'
-                },
+                headers: headers,
                 body: JSON.stringify({
                     content: document.documentElement.outerHTML
                 })
@@ -800,6 +863,9 @@ class SiteModificationUI {
             if (response.ok) {
                 // Reload the page
                 window.location.reload();
+            } else if (response.status === 412) {
+                alert('This page was changed in another editor. It will be reloaded with the latest version.');
+                window.location.reload();
             } else {
                 throw new Error(`Failed to save page: ${response.statusText}`);
             }
@@ -0,0 +1,203 @@
+"""In-process load test of the site API.
+
+Generates synthetic sites directories and drives the Bottle application
+through WSGI from a thread pool, reporting latency percentiles per endpoint.
+
+    python bench_api.py --sites 1,100,10000 --page-size 1KB,5MB --concurrency 8
+    python compare.py results/api-<before>.json results/api-<after>.json
+"""
+import argparse
+import gzip
+import json
+import logging
+import os
+import random
+import shutil
+import tempfile
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+from bench_common import SRC_DIR, parse_list, parse_size, print_table, run_concurrent, WSGIClient, write_results
+
+BUILDER_DIR = SRC_DIR.parent.parent / "ap-website-builder"
+PANEL = """    <article class="panel">
+      <header>
+        <h2 class="editable editable-text">Section {index}</h2>
+      </header>
+      <div class="panel-body editable editable-markdown">
+        <p>{text}</p>
+      </div>
+    </article>
+"""
+WORDS = ("lorem", "ipsum", "dolor", "sit", "amet", "consectetur", "adipiscing", "elit", "sed", "do",
+         "eiusmod", "tempor", "incididunt", "ut", "labore", "et", "dolore", "magna", "aliqua")
+
+
+def make_page(template: str, size: int, rng: random.Random) -> str:
+    """Fill the template's main element with panels until the page is ``size`` bytes."""
+    marker = "</main>"
+    head, tail = template.split(marker, 1) if marker in template else (template, "")
+    parts = [head]
+    length = len(head) + len(tail) + len(marker)
+    index = 0
+    while length < size:
+        text = " ".join(rng.choice(WORDS) for _ in range(80))
+        panel = PANEL.format(index=index, text=text)
+        parts.append(panel)
+        length += len(panel)
+        index += 1
+    return "".join(parts) + "  " + marker + tail
+
+
+def generate_sites(root: Path, sites: int, pages: int, page_size: int, seed: int = 1) -> List[str]:
+    """Write ``sites`` sites with ``pages`` pages each in the SiteManager on-disk format.
+
+    Page files of one size are hard-linked from a single copy, so large
+    matrices stay cheap on disk; writes through the API replace the link.
+    """
+    from site_manager import SCHEMA_VERSION, page_metadata
+
+    rng = random.Random(seed)
+    template = (BUILDER_DIR / "templates" / "pluribus.html").read_text(encoding='utf-8')
+    style = (BUILDER_DIR / "styles" / "pluribus_dark.css").read_text(encoding='utf-8')
+    root.mkdir(parents=True, exist_ok=True)
+    originals = root / ".bench-pages"
+    originals.mkdir(exist_ok=True)
+
+    page_ids = ["index"] + [f"page-{n}" for n in range(1, pages)]
+    sources = {}
+    for page_id in page_ids:
+        source = originals / f"{page_id}.html"
+        source.write_text(make_page(template.replace("${PAGE_ID}", page_id), page_size, rng), encoding='utf-8')
+        sources[page_id] = source
+    metadata = {page_id: page_metadata(source.read_bytes(), source.stat()) for page_id, source in sources.items()}
+    style_source = originals / "style.css"
+    style_source.write_text(style, encoding='utf-8')
+
+    site_ids = []
+    now = datetime.now().isoformat()
+    for n in range(sites):
+        site_id = str(uuid.UUID(int=rng.getrandbits(128)))
+        editor = root / site_id / "editor"
+        editor.mkdir(parents=True)
+        for page_id, source in sources.items():
+            os.link(source, editor / f"{page_id}.html")
+            os.link(style_source, editor / f"{page_id}.css")
+        config = {
+            "schema_version": SCHEMA_VERSION,
+            "id": site_id,
+            "name": f"Bench site {n}",
+            "description": "Synthetic benchmark site",
+            "created_at": now,
+            "updated_at": now,
+            "pages": {page_id: dict({"name": "Home" if page_id == "index" else page_id.replace('-', ' ').title(),
+                                     "created_at": now}, **metadata[page_id])
+                      for page_id in page_ids}
+        }
+        (root / site_id / "site.json").write_text(json.dumps(config, indent=2), encoding='utf-8')
+        site_ids.append(site_id)
+    return site_ids
+
+
+def run_case(api_server, root: Path, sites: int, pages: int, page_size: int, requests: int,
+             concurrency: int, warmup: int, seed: int) -> Dict:
+    from site_manager import SiteManager
+
+    site_ids = generate_sites(root, sites, pages, page_size, seed)
+    page_ids = ["index"] + [f"page-{n}" for n in range(1, pages)]
+    api_server.site_manager = SiteManager(str(root), coalesce_delay=2.0)
+    client = WSGIClient(api_server.application)
+    rng = random.Random(seed)
+    targets = [(rng.choice(site_ids), rng.choice(page_ids)) for _ in range(max(requests, 1))]
+    body = json.dumps({"content": (root / ".bench-pages" / "index.html").read_text(encoding='utf-8')}).encode()
+    gzip_body = gzip.compress(body, mtime=0)
+
+    def get(path, expect=200, headers=None):
+        def operation(i):
+            status, _, _ = client.request("GET", path(i), headers=headers(i) if headers else None)
+            return status == expect
+        return operation
+
+    etags = {}
+
+    def page_etag(i):
+        site_id, page_id = targets[i]
+        key = (site_id, page_id)
+        if key not in etags:
+            _, response_headers, _ = client.request("HEAD", f"/api/v1/sites/{site_id}/pages/{page_id}")
+            etags[key] = response_headers.get("etag", "")
+        return {"If-None-Match": etags[key]}
+
+    def put_page(i, compressed=False):
+        site_id, page_id = targets[i]
+        headers = {"Content-Type": "application/json"}
+        if compressed:
+            headers["Content-Encoding"] = "gzip"
+        status, _, _ = client.request("PUT", f"/api/v1/sites/{site_id}/pages/{page_id}",
+                                      gzip_body if compressed else body, headers)
+        return status == 200
+
+    scenarios = {
+        "list_sites": get(lambda i: "/api/v1/sites"),
+        "list_pages": get(lambda i: f"/api/v1/sites/{targets[i][0]}/pages"),
+        "get_page": get(lambda i: f"/api/v1/sites/{targets[i][0]}/pages/{targets[i][1]}"),
+        "get_page_304": get(lambda i: f"/api/v1/sites/{targets[i][0]}/pages/{targets[i][1]}", 304, page_etag),
+        "get_page_gzip": get(lambda i: f"/api/v1/sites/{targets[i][0]}/pages/{targets[i][1]}",
+                             headers=lambda i: {"Accept-Encoding": "gzip"}),
+        "put_page": put_page,
+        "put_page_gzip": lambda i: put_page(i, compressed=True),
+        "list_components": get(lambda i: "/api/v1/components"),
+    }
+
+    results = {}
+    for name, operation in scenarios.items():
+        for i in range(min(warmup, requests)):
+            operation(i)
+        results[name] = run_concurrent(operation, requests, concurrency)
+    api_server.site_manager.flush()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the site API in-process")
+    parser.add_argument("--sites", default="1,100,1000", help="Comma-separated site counts")
+    parser.add_argument("--pages", type=int, default=5, help="Pages per site")
+    parser.add_argument("--page-size", default="1KB,100KB", help="Comma-separated page sizes, e.g. 1KB,5MB")
+    parser.add_argument("--requests", type=int, default=500, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent client threads")
+    parser.add_argument("--warmup", type=int, default=20, help="Untimed requests per scenario")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--workdir", default=None, help="Where to generate sites (default: a temp dir)")
+    parser.add_argument("--output", default=None, help="Results JSON path (default: results/api-<time>.json)")
+    args = parser.parse_args()
+
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="bench-api-"))
+    os.environ.setdefault("SITES_DIR", str(workdir / "unused"))
+    import api_server
+    # Per-request access logs would dominate the timings
+    logging.getLogger().setLevel(os.environ.get("LOG_LEVEL", "WARNING"))
+
+    results = {}
+    try:
+        for sites in parse_list(args.sites):
+            for page_size in parse_list(args.page_size, parse_size):
+                case = f"sites={sites},page_size={page_size}"
+                root = workdir / case.replace(',', '_').replace('=', '-')
+                print(f"Running {case} ...", flush=True)
+                results[case] = run_case(api_server, root, sites, args.pages, page_size, args.requests,
+                                         args.concurrency, args.warmup, args.seed)
+                shutil.rmtree(root, ignore_errors=True)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    params = {key: getattr(args, key) for key in ("sites", "pages", "page_size", "requests", "concurrency",
+                                                  "warmup", "seed")}
+    print_table(results)
+    print(f"Saved {write_results('api', params, results, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
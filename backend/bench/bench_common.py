@@ -0,0 +1,175 @@
+import io
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+BENCH_DIR = Path(__file__).resolve().parent
+SRC_DIR = BENCH_DIR.parent / "src"
+RESULTS_DIR = BENCH_DIR / "results"
+RESULTS_VERSION = 1
+
+if str(SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(SRC_DIR))
+
+_SIZE = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*([kmg]?)i?b?\s*$', re.IGNORECASE)
+
+
+def parse_size(text: str) -> int:
+    """Parse sizes such as ``512``, ``1KB`` or ``5MB`` into bytes."""
+    match = _SIZE.match(text)
+    if not match:
+        raise ValueError(f"Invalid size: {text}")
+    number, unit = match.groups()
+    return int(float(number) * 1024 ** " kmg".index(unit.lower() or " "))
+
+
+def parse_list(text: str, convert=int) -> List:
+    return [convert(part) for part in text.split(',') if part.strip()]
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+def summarize(latencies: List[float], errors: int = 0, wall_seconds: Optional[float] = None) -> Dict:
+    """Latency summary in milliseconds."""
+    values = sorted(latencies)
+    summary = {
+        "requests": len(values) + errors,
+        "errors": errors,
+        "p50_ms": percentile(values, 0.50) * 1000,
+        "p90_ms": percentile(values, 0.90) * 1000,
+        "p99_ms": percentile(values, 0.99) * 1000,
+        "mean_ms": (sum(values) / len(values) * 1000) if values else 0.0,
+        "max_ms": (values[-1] * 1000) if values else 0.0,
+    }
+    if wall_seconds:
+        summary["throughput_rps"] = len(values) / wall_seconds
+    return summary
+
+
+def run_concurrent(operation: Callable[[int], bool], requests: int, concurrency: int) -> Dict:
+    """Call ``operation(i)`` ``requests`` times on ``concurrency`` threads.
+
+    The operation returns False for a failed request.
+    """
+    def timed(i: int) -> Tuple[float, bool]:
+        started = time.perf_counter()
+        ok = operation(i)
+        return time.perf_counter() - started, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(timed, range(requests)))
+    wall = time.perf_counter() - started
+    latencies = [elapsed for elapsed, ok in outcomes if ok]
+    return summarize(latencies, errors=len(outcomes) - len(latencies), wall_seconds=wall)
+
+
+class WSGIClient:
+    """Calls a WSGI application in-process, the way a server would."""
+
+    def __init__(self, app, remote_addr: str = "127.0.0.1"):
+        self.app = app
+        self.remote_addr = remote_addr
+
+    def request(self, method: str, path: str, body: Optional[bytes] = None,
+                headers: Optional[Dict[str, str]] = None) -> Tuple[int, Dict[str, str], bytes]:
+        path, _, query = path.partition('?')
+        body = body or b""
+        environ = {
+            "REQUEST_METHOD": method,
+            "PATH_INFO": path,
+            "QUERY_STRING": query,
+            "SERVER_NAME": "localhost",
+            "SERVER_PORT": "8000",
+            "SERVER_PROTOCOL": "HTTP/1.1",
+            "REMOTE_ADDR": self.remote_addr,
+            "CONTENT_LENGTH": str(len(body)),
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": "http",
+            "wsgi.input": io.BytesIO(body),
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+        }
+        for name, value in (headers or {}).items():
+            key = name.upper().replace('-', '_')
+            environ[key if key in ("CONTENT_TYPE", "CONTENT_LENGTH") else "HTTP_" + key] = value
+
+        captured = {}
+
+        def start_response(status, response_headers, exc_info=None):
+            captured["status"] = int(status.split(' ', 1)[0])
+            captured["headers"] = {name.lower(): value for name, value in response_headers}
+
+        result = self.app(environ, start_response)
+        try:
+            data = b"".join(result)
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+        return captured["status"], captured["headers"], data
+
+    def json(self, method: str, path: str, payload, headers: Optional[Dict[str, str]] = None):
+        headers = dict(headers or {}, **{"Content-Type": "application/json"})
+        return self.request(method, path, json.dumps(payload).encode('utf-8'), headers)
+
+
+def environment() -> Dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR,
+                                capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "git_commit": commit,
+    }
+
+
+def write_results(suite: str, params: Dict, results: Dict, output: Optional[str] = None) -> Path:
+    """Save results as ``{"suite", "version", "created_at", "environment", "params", "results"}``.
+
+    ``results`` maps case name -> scenario name -> summary, which is what
+    compare.py diffs.
+    """
+    created_at = datetime.now()
+    if output:
+        path = Path(output)
+    else:
+        path = RESULTS_DIR / f"{suite}-{created_at.strftime('%Y%m%d-%H%M%S')}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    document = {
+        "suite": suite,
+        "version": RESULTS_VERSION,
+        "created_at": created_at.isoformat(),
+        "environment": environment(),
+        "params": params,
+        "results": results,
+    }
+    path.write_text(json.dumps(document, indent=2), encoding='utf-8')
+    return path
+
+
+def print_table(results: Dict) -> None:
+    print(f"{'case':<32} {'scenario':<20} {'n':>6} {'err':>4} {'p50 ms':>9} {'p99 ms':>9} {'rps':>9}")
+    for case, scenarios in results.items():
+        for scenario, summary in scenarios.items():
+            print(f"{case:<32} {scenario:<20} {summary.get('requests', 0):>6} {summary.get('errors', 0):>4} "
+                  f"{summary.get('p50_ms', 0):>9.2f} {summary.get('p99_ms', 0):>9.2f} "
+                  f"{summary.get('throughput_rps', 0):>9.1f}")
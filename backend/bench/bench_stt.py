@@ -0,0 +1,200 @@
+"""Benchmark the STT pipeline without a microphone or a real Whisper model.
+
+Recorded clips (16-bit PCM WAV; resampled to 16 kHz mono) are replayed into
+concurrent recording sessions, and a stub model stands in for Whisper with a
+configurable cost per audio second, so the numbers measure VAD, buffering,
+streaming and the worker pool rather than the model.
+
+    python bench_stt.py --audio clip1.wav clip2.wav --concurrency 1,4,8 --speed 10
+    python bench_stt.py                     # uses generated speech-like fixtures
+"""
+import argparse
+import tempfile
+import threading
+import time
+import wave
+from collections import namedtuple
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+import numpy as np
+
+from bench_common import parse_list, print_table, summarize, write_results
+
+SR = 16000
+BLOCK_SECONDS = 0.1
+
+StubSegment = namedtuple("StubSegment", ["text", "start", "end"])
+
+
+class StubWhisperModel:
+    """Imitates WhisperModel.transcribe: costs ``rtf`` wall seconds per audio
+    second (sleeping, like CTranslate2, without holding the GIL) and returns
+    one segment per ``segment_seconds`` of audio."""
+
+    def __init__(self, rtf: float = 0.05, overhead: float = 0.01, segment_seconds: float = 2.0):
+        self.rtf = rtf
+        self.overhead = overhead
+        self.segment_seconds = segment_seconds
+
+    def transcribe(self, audio, language=None, initial_prompt=None, **kwargs):
+        seconds = len(audio) / SR
+        time.sleep(self.overhead + seconds * self.rtf)
+        segments = []
+        start = 0.0
+        while start < seconds:
+            end = min(seconds, start + self.segment_seconds)
+            segments.append(StubSegment(f" words {start:.1f}-{end:.1f}", start, end))
+            start = end
+        return iter(segments), None
+
+
+def read_wav(path: Path) -> np.ndarray:
+    with wave.open(str(path), 'rb') as f:
+        channels, width, rate = f.getnchannels(), f.getsampwidth(), f.getframerate()
+        frames = f.readframes(f.getnframes())
+    if width != 2:
+        raise ValueError(f"{path}: only 16-bit PCM WAV is supported")
+    audio = np.frombuffer(frames, dtype='<i2').astype(np.float32) / 32768.0
+    audio = audio.reshape(-1, channels).mean(axis=1)
+    if rate != SR:
+        positions = np.arange(0, len(audio), rate / SR)
+        audio = np.interp(positions, np.arange(len(audio)), audio).astype(np.float32)
+    return audio
+
+
+def write_wav(path: Path, audio: np.ndarray) -> None:
+    with wave.open(str(path), 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SR)
+        f.writeframes((np.clip(audio, -1, 1) * 32767).astype('<i2').tobytes())
+
+
+def synthetic_speech(seconds: float, seed: int) -> np.ndarray:
+    """Voiced bursts (harmonics with a syllable-rate envelope) separated by pauses over a noise floor."""
+    rng = np.random.default_rng(seed)
+    audio = rng.normal(0, 0.002, int(seconds * SR)).astype(np.float32)
+    position = int(rng.uniform(0.2, 0.8) * SR)
+    while position < len(audio):
+        length = min(int(rng.uniform(0.5, 3.0) * SR), len(audio) - position)
+        t = np.arange(length) / SR
+        pitch = rng.uniform(110, 220)
+        voice = sum(np.sin(2 * np.pi * pitch * k * t) / k for k in range(1, 6))
+        envelope = 0.5 * (1 - np.cos(2 * np.pi * 4 * t)) * np.minimum(1, np.minimum(t, t[::-1]) * 20)
+        audio[position:position + length] += (0.15 * voice * envelope).astype(np.float32)
+        position += length + int(rng.uniform(0.3, 1.5) * SR)
+    return audio
+
+
+def generate_fixtures(directory: Path, durations: List[float]) -> List[Path]:
+    paths = []
+    for i, seconds in enumerate(durations):
+        path = directory / f"synthetic-{int(seconds)}s.wav"
+        write_wav(path, synthetic_speech(seconds, seed=i))
+        paths.append(path)
+    return paths
+
+
+def paced_source(audio: np.ndarray, speed: float, done: threading.Event) -> Iterator[np.ndarray]:
+    """Yield audio in microphone-sized blocks at ``speed`` x real time (0 = unpaced)."""
+    block = int(BLOCK_SECONDS * SR)
+    started = time.perf_counter()
+    for offset in range(0, len(audio), block):
+        if speed > 0:
+            delay = started + (offset / SR) / speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        yield audio[offset:offset + block].reshape(-1, 1)
+    done.set()
+
+
+def run_case(clips: List[np.ndarray], concurrency: int, streaming: bool, speed: float, workers: int,
+             rtf: float) -> Dict:
+    from speech_to_text import SpeechToText
+    from stt_sessions import STTSessionManager
+
+    stt = SpeechToText(model_size="stub", num_workers=workers, warmup=False, streaming=streaming,
+                       max_record_seconds=max(len(clip) for clip in clips) / SR + 10)
+    stt.model = StubWhisperModel(rtf=rtf)
+    manager = STTSessionManager(stt, workers=workers, max_pending=concurrency, max_sessions=concurrency,
+                                max_record_seconds=3600)
+
+    started = time.perf_counter()
+    finished = []
+    for i in range(concurrency):
+        done = threading.Event()
+        manager.start(f"bench-{i}", source=paced_source(clips[i % len(clips)], speed, done))
+        finished.append(done)
+    for done in finished:
+        done.wait()
+
+    latencies = [None] * concurrency
+
+    def stop(i):
+        stop_started = time.perf_counter()
+        manager.stop(f"bench-{i}", timeout=3600)
+        latencies[i] = time.perf_counter() - stop_started
+
+    threads = [threading.Thread(target=stop, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    timings = [manager.result(f"bench-{i}")["timings"] for i in range(concurrency)]
+    manager.shutdown()
+    audio_seconds = sum(t.get("captured_seconds", 0.0) for t in timings)
+    return {
+        "stop_latency": summarize([latency for latency in latencies if latency is not None]),
+        "pipeline": {
+            "audio_seconds": audio_seconds,
+            "wall_seconds": wall,
+            "audio_seconds_per_wall_second": audio_seconds / wall if wall else 0.0,
+            "decoded_seconds": sum(t.get("decoded_seconds", 0.0) for t in timings),
+            "inference_seconds": sum(t.get("inference_seconds", 0.0) for t in timings),
+            "vad_seconds": sum(t.get("vad_seconds", 0.0) for t in timings),
+            "inferences": sum(t.get("inferences", 0) for t in timings),
+            "skipped": sum(t.get("skipped", 0) for t in timings),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark STT sessions with a stub model")
+    parser.add_argument("--audio", nargs="*", default=None, help="WAV fixtures (default: generated)")
+    parser.add_argument("--durations", default="10,60", help="Generated fixture lengths in seconds")
+    parser.add_argument("--concurrency", default="1,4", help="Comma-separated concurrent sessions")
+    parser.add_argument("--workers", type=int, default=2, help="Transcription workers")
+    parser.add_argument("--speed", type=float, default=20.0, help="Playback speed vs real time (0 = unpaced)")
+    parser.add_argument("--rtf", type=float, default=0.05, help="Stub model seconds per audio second")
+    parser.add_argument("--streaming", default="on,off", help="Streaming modes to run: on,off")
+    parser.add_argument("--output", default=None, help="Results JSON path (default: results/stt-<time>.json)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench-stt-") as tmp:
+        paths = [Path(path) for path in args.audio] if args.audio else \
+            generate_fixtures(Path(tmp), parse_list(args.durations, float))
+        clips = [read_wav(path) for path in paths]
+
+    results = {}
+    for streaming in parse_list(args.streaming, str):
+        for concurrency in parse_list(args.concurrency):
+            case = f"concurrency={concurrency},streaming={streaming}"
+            print(f"Running {case} ...", flush=True)
+            results[case] = run_case(clips, concurrency, streaming == "on", args.speed, args.workers, args.rtf)
+
+    params = {key: getattr(args, key) for key in ("durations", "concurrency", "workers", "speed", "rtf",
+                                                  "streaming")}
+    params["fixtures"] = [path.name for path in paths]
+    print_table({case: {"stop_latency": scenarios["stop_latency"]} for case, scenarios in results.items()})
+    for case, scenarios in results.items():
+        pipeline = scenarios["pipeline"]
+        print(f"{case:<32} audio/wall {pipeline['audio_seconds_per_wall_second']:.1f}x, "
+              f"{pipeline['inferences']} inferences, {pipeline['skipped']} skipped by VAD")
+    print(f"Saved {write_results('stt', params, results, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""Compare two benchmark result files from bench_api.py or bench_stt.py.
+
+    python compare.py results/api-before.json results/api-after.json
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+KEYS = ("p50_ms", "p99_ms", "throughput_rps", "audio_seconds_per_wall_second", "inference_seconds")
+
+
+def load(path: str) -> dict:
+    return json.loads(Path(path).read_text(encoding='utf-8'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="Mark changes larger than this percentage")
+    args = parser.parse_args()
+
+    before, after = load(args.before), load(args.after)
+    if before.get("suite") != after.get("suite"):
+        sys.exit(f"Cannot compare suite {before.get('suite')} with {after.get('suite')}")
+    if before.get("params") != after.get("params"):
+        print("warning: benchmark parameters differ", file=sys.stderr)
+
+    print(f"{'case':<32} {'scenario':<20} {'metric':<30} {'before':>10} {'after':>10} {'change':>8}")
+    for case, scenarios in after["results"].items():
+        for scenario, summary in scenarios.items():
+            previous = before["results"].get(case, {}).get(scenario)
+            if previous is None:
+                continue
+            for key in KEYS:
+                if key not in summary or key not in previous:
+                    continue
+                old, new = previous[key], summary[key]
+                change = (new - old) / old * 100 if old else 0.0
+                flag = " *" if abs(change) >= args.threshold else ""
+                print(f"{case:<32} {scenario:<20} {key:<30} {old:>10.2f} {new:>10.2f} {change:>+7.1f}%{flag}")
+
+
+if __name__ == "__main__":
+    main()
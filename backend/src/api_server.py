@@ -1,17 +1,44 @@
+import argparse
+import json
+import os
+import shutil
+import tempfile
 import urllib.parse
-import re
 from pathlib import Path
-from bottle import Bottle, run, request, response, HTTPError
+from bottle import BaseRequest, Bottle, run, request, response, HTTPError
 
 from speech_to_text import SpeechToText
-from site_manager import SiteManager, slugify_to_filename
+from stt_sessions import (STTSessionManager, SessionLimitReached, SessionNotFound,
+                          TranscriptionQueueFull, TranscriptionTimeout)
+from publisher import SitePublisher
+from site_archive import ArchiveError, SiteArchiver
+from site_manager import PAGE_FIELDS, PAGE_SORT_KEYS, SITE_FIELDS, SiteManager, PreconditionFailed, file_etag, slugify_to_filename
+from render_engine import RenderEngine
+from revision_store import InvalidPageId, check_page_id
+from page_patch import PatchError, apply_operations
+from http_cache import check_not_modified, check_precondition, etag_from_bytes
+from listing import ListingParams
+from metrics import REGISTRY, MetricsMiddleware
+from compression import CompressionMiddleware
+from events import EventBus
+from wsgi_server import DevServer, serve
 
 import logging
 
 logging.basicConfig(format='%(levelname)s:%(message)s', level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Bottle refuses JSON bodies over 100 KB by default, which large pages exceed
+BaseRequest.MEMFILE_MAX = int(os.environ.get("API_MAX_BODY_BYTES", str(32 * 1024 * 1024)))
+
 app = Bottle()
+# WSGI entry point: the Bottle app with negotiated compression, wrapped with request metrics
+application = MetricsMiddleware(CompressionMiddleware(
+    app,
+    min_size=int(os.environ.get("API_COMPRESS_MIN_BYTES", "1024")),
+    level=int(os.environ.get("API_COMPRESS_LEVEL", "6")),
+    max_request_bytes=BaseRequest.MEMFILE_MAX
+))
 plugins_dict = {
     "plugins": [
         "speech-to-text",
@@ -19,8 +46,42 @@ plugins_dict = {
     ]
 }
 
-stt = SpeechToText()
-site_manager = SiteManager()
+# Site, page and STT session changes, streamed to clients by /api/v1/events
+events = EventBus(heartbeat=float(os.environ.get("EVENTS_HEARTBEAT_SECONDS", "15")),
+                  max_clients=int(os.environ.get("EVENTS_MAX_CLIENTS", "512")))
+
+# The Whisper model loads lazily (or in the background once the server starts),
+# so the site-management API is available immediately.
+# Caps both a session's length and its audio buffer, so no audio is dropped
+STT_MAX_RECORD_SECONDS = float(os.environ.get("STT_MAX_RECORD_SECONDS", "300"))
+stt = SpeechToText(
+    model_size=os.environ.get("STT_MODEL_SIZE", "base"),
+    device=os.environ.get("STT_DEVICE", "auto"),
+    compute_type=os.environ.get("STT_COMPUTE_TYPE", "int8"),
+    cpu_threads=int(os.environ.get("STT_CPU_THREADS", "0")),
+    num_workers=int(os.environ.get("STT_WORKERS", "2")),
+    max_record_seconds=STT_MAX_RECORD_SECONDS,
+    streaming=True
+)
+stt_sessions = STTSessionManager(
+    stt,
+    workers=stt.num_workers,
+    max_pending=int(os.environ.get("STT_MAX_PENDING", "4")),
+    max_record_seconds=STT_MAX_RECORD_SECONDS,
+    events=events
+)
+STT_STOP_TIMEOUT = float(os.environ.get("STT_STOP_TIMEOUT", "60"))
+# Bursts of editor saves only rewrite site.json once per coalescing window
+site_manager = SiteManager(os.environ.get("SITES_DIR", "../sites"), coalesce_delay=float(os.environ.get("SITE_WRITE_COALESCE_SECONDS", "2")),
+                           events=events)
+publisher = SitePublisher(site_manager)
+# Limits both the uploaded archive and the files it expands to
+SITE_IMPORT_MAX_BYTES = int(os.environ.get("SITE_IMPORT_MAX_BYTES", str(1024 ** 3)))
+archiver = SiteArchiver(site_manager, max_import_bytes=SITE_IMPORT_MAX_BYTES)
+WEBSITE_BUILDER_PATH = Path(__file__).parent / '../../ap-website-builder'
+render_engine = RenderEngine.for_directory(WEBSITE_BUILDER_PATH)
+component_catalog = render_engine.catalog
+component_catalog.refresh(force=True)
 
 # CORS headers for local frontend integration only
 def enable_cors():
@@ -36,8 +97,9 @@ def enable_cors():
     
     if origin in allowed_origins:
         response.headers['Access-Control-Allow-Origin'] = origin
-        response.headers['Access-Control-Allow-Methods'] = 'GET, POST, PUT, DELETE, OPTIONS'
-        response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'
+        response.headers['Access-Control-Allow-Methods'] = 'GET, POST, PUT, PATCH, DELETE, OPTIONS'
+        response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Content-Encoding, Authorization, If-Match, If-None-Match, Last-Event-ID'
+        response.headers['Access-Control-Expose-Headers'] = 'ETag, Last-Modified'
 
 @app.hook('before_request')
 def restrict_to_localhost():
@@ -68,25 +130,112 @@ def after_request():
 def handle_options(path):
     enable_cors()
 
+@app.get("/api/v1/metrics")
+def metrics():
+    """Prometheus text exposition of request, STT and disk metrics"""
+    response.content_type = 'text/plain; version=0.0.4; charset=utf-8'
+    return REGISTRY.render()
+
 @app.get("/api/v1/plugins")
 def plugins():
     return plugins_dict
 
 # STT Endpoints
+# Requests without a session_id share the "default" session, which keeps the
+# keybind client working unchanged.
+def stt_session_id():
+    return request.query.get("session_id") or "default"
+
+@app.get("/api/v1/plugins/stt/status")
+def stt_status():
+    return {**stt.status(), **stt_sessions.status()}
+
 @app.get("/api/v1/plugins/stt/recording/start")
 def audio_recording_start():
-    stt.start_recording()
-    return {"status": "recording_started"}
+    try:
+        session = stt_sessions.start(stt_session_id())
+    except ValueError as e:
+        raise HTTPError(400, str(e))
+    except SessionLimitReached as e:
+        raise HTTPError(503, str(e))
+    return {"status": "recording_started", "session_id": session.session_id}
 
 @app.get("/api/v1/plugins/stt/recording/stop")
 def audio_recording_stop():
-    text = stt.stop_recording()
-    return {"transcription": text}
+    """Stop recording and wait for the transcription.
+
+    ``?wait=<seconds>`` bounds the wait (capped at STT_STOP_TIMEOUT); when it
+    runs out the response is 202 and the result can be polled, which keeps
+    request threads free while the worker pool transcribes.
+    """
+    session_id = stt_session_id()
+    wait = request.query.get("wait")
+    try:
+        timeout = STT_STOP_TIMEOUT if wait is None else min(max(float(wait), 0.0), STT_STOP_TIMEOUT)
+    except ValueError:
+        raise HTTPError(400, "wait must be a number of seconds")
+    try:
+        result = stt_sessions.stop(session_id, timeout=timeout)
+    except SessionNotFound:
+        raise HTTPError(404, "Recording session not found")
+    except TranscriptionQueueFull:
+        error = HTTPError(503, "Transcription queue is full, retry shortly")
+        error.set_header('Retry-After', '1')
+        raise error
+    except TranscriptionTimeout:
+        if wait is not None:
+            response.status = 202
+            return {"status": "transcribing", "session_id": session_id}
+        raise HTTPError(504, f"Transcription still running; poll /api/v1/plugins/stt/recording/result?session_id={session_id}")
+    return result
+
+@app.get("/api/v1/plugins/stt/recording/result")
+def audio_recording_result():
+    try:
+        return stt_sessions.result(stt_session_id())
+    except SessionNotFound:
+        raise HTTPError(404, "Recording session not found")
+
+@app.get("/api/v1/plugins/stt/recording/partial")
+def audio_recording_partial():
+    try:
+        return stt_sessions.partial(stt_session_id())
+    except SessionNotFound:
+        raise HTTPError(404, "Recording session not found")
 
 # Site Management Endpoints
+@app.get("/api/v1/events")
+def event_stream():
+    """Server-Sent Events: site.*, page.* and stt.session changes; ?site_id= limits site and page events to one site"""
+    site_id = request.query.getunicode("site_id") or None
+    last_event_id = request.get_header('Last-Event-ID') or request.query.get("last_event_id")
+    if not events.has_capacity():
+        raise HTTPError(503, "Too many event stream clients")
+    detach = request.environ.get('wsgi_server.detach')
+    if detach is not None:
+        # Served by the event dispatcher from here on, freeing this request thread
+        enable_cors()
+        events.attach(detach(), site_id, last_event_id,
+                      [(name, value) for name, value in response.headerlist if name.startswith('Access-Control-')])
+        return []
+    response.content_type = 'text/event-stream'
+    response.set_header('Cache-Control', 'no-cache')
+    return events.stream(site_id, last_event_id)
+
 @app.get("/api/v1/sites")
 def list_sites():
-    return {"sites": site_manager.list_sites()}
+    """Sites one page at a time.
+
+    ?sort=updated_at|name|created_at&order=asc|desc&limit=<1-500>&cursor=<next_cursor>&fields=id,name,...
+    Without a limit every site is returned.
+    """
+    try:
+        params = ListingParams.parse(request.query, default_sort="updated_at", default_order="desc",
+                                     allowed_fields=SITE_FIELDS)
+    except ValueError as e:
+        raise HTTPError(400, str(e))
+    sites, next_cursor, total = site_manager.page_sites(params)
+    return {"sites": sites, "next_cursor": next_cursor, "total": total}
 
 @app.post("/api/v1/sites")
 def create_site():
@@ -105,9 +254,12 @@ def create_site():
 
 @app.get("/api/v1/sites/<site_id>")
 def get_site(site_id):
-    site = site_manager.get_site_config(site_id)
-    if not site:
+    # Validators come from the in-memory config, which is ahead of site.json while writes are coalesced
+    found = site_manager.get_site_with_validators(site_id)
+    if found is None:
         raise HTTPError(404, "Site not found")
+    site, etag, modified = found
+    check_not_modified(etag, modified)
     return {"site": site}
 
 @app.put("/api/v1/sites/<site_id>")
@@ -128,23 +280,87 @@ def delete_site(site_id):
         raise HTTPError(404, "Site not found")
     return {"deleted": True}
 
+@app.post("/api/v1/sites/<site_id>/clone")
+def clone_site(site_id):
+    data = request.json or {}
+    site = site_manager.clone_site(site_id, data.get("name"))
+    if not site:
+        raise HTTPError(404, "Site not found")
+    return {"site": site}
+
+@app.get("/api/v1/sites/<site_id>/export")
+def export_site(site_id):
+    """Zip of site.json and editor/; ?published=1 adds the published output, ?revisions=1 the page history"""
+    archive = archiver.export_site(site_id, published=request.query.get("published") in ("1", "true"),
+                                   revisions=request.query.get("revisions") in ("1", "true"))
+    if archive is None:
+        raise HTTPError(404, "Site not found")
+    filename = slugify_to_filename(site_manager.get_site_config(site_id).get("name") or "", 48) or site_id
+    response.content_type = 'application/zip'
+    response.set_header('Content-Disposition', f'attachment; filename="{filename}.zip"')
+    return archive
+
+def _spool_upload(limit: int):
+    """The request body (or its ``archive`` form field) copied to a temporary file in chunks."""
+    if request.content_type.startswith('multipart/form-data'):
+        upload = request.files.get("archive")
+        if upload is None:
+            raise HTTPError(400, "archive file field is required")
+        source, length = upload.file, upload.content_length
+    else:
+        source, length = request.environ['wsgi.input'], request.content_length
+        if length < 0:
+            raise HTTPError(411, "Content-Length is required")
+    if length > limit:
+        raise HTTPError(413, "Archive too large")
+    spool = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+    if source is request.environ['wsgi.input']:
+        remaining = length
+        while remaining > 0:
+            chunk = source.read(min(remaining, 1024 * 1024))
+            if not chunk:
+                break
+            spool.write(chunk)
+            remaining -= len(chunk)
+    else:
+        shutil.copyfileobj(source, spool, 1024 * 1024)
+    if spool.tell() > limit:
+        spool.close()
+        raise HTTPError(413, "Archive too large")
+    spool.seek(0)
+    return spool
+
+@app.post("/api/v1/sites/import")
+def import_site():
+    """Create a new site from an export archive sent as the body or as multipart field ``archive``"""
+    name = request.query.getunicode("name")
+    with _spool_upload(SITE_IMPORT_MAX_BYTES) as spool:
+        try:
+            site = archiver.import_site(spool, name=name, website_builder_path=str(WEBSITE_BUILDER_PATH))
+        except ArchiveError as e:
+            raise HTTPError(400, str(e))
+    return {"site": site}
+
 # Page Management Endpoints
+def valid_page_id(page_id):
+    """400 for IDs this API could not have created, before they get anywhere near a file path"""
+    try:
+        return check_page_id(page_id)
+    except InvalidPageId as e:
+        raise HTTPError(400, str(e))
+
 @app.get("/api/v1/sites/<site_id>/pages")
 def list_pages(site_id):
-    pages = site_manager.list_pages(site_id)
-    return {"pages": pages}
-
-@app.get("/api/v1/sites/<site_id>/pages/<page_id>")
-def get_page(site_id, page_id):
-    content = site_manager.get_page_content(site_id, page_id)
-
-    if content is None:
-        raise HTTPError(404, "Page not found")
-    return {
-        "site_id": site_id,
-        "id": page_id,
-        "content": content
-    }
+    """Pages one page at a time; same parameters as the site listing, plus sort=position (the default)"""
+    try:
+        params = ListingParams.parse(request.query, default_sort="position", allowed_fields=PAGE_FIELDS,
+                                     sort_keys=PAGE_SORT_KEYS)
+    except ValueError as e:
+        raise HTTPError(400, str(e))
+    page, next_cursor, total = site_manager.page_pages(site_id, params) or ([], None, 0)
+    body = {"pages": page, "next_cursor": next_cursor, "total": total}
+    check_not_modified(etag_from_bytes(json.dumps(body, sort_keys=True).encode('utf-8')))
+    return body
 
 @app.post("/api/v1/sites/<site_id>/pages")
 def create_page(site_id):
@@ -167,6 +383,15 @@ def create_page(site_id):
 
 @app.get("/api/v1/sites/<site_id>/pages/<page_id>")
 def get_page(site_id, page_id):
+    valid_page_id(page_id)
+    # Validate against the file's stat first so unchanged pages are never read
+    stat = site_manager.get_page_stat(site_id, page_id)
+    if stat is None:
+        raise HTTPError(404, "Page or site not found")
+    check_not_modified(file_etag(stat), stat.st_mtime)
+    if request.method == 'HEAD':
+        return ""
+
     content = site_manager.get_page_content(site_id, page_id)
     if not content:
         raise HTTPError(404, "Page or site not found")
@@ -175,30 +400,58 @@ def get_page(site_id, page_id):
 
 @app.put("/api/v1/sites/<site_id>/pages/<page_id>")
 def update_page(site_id, page_id):
-    logger.info(f"Updating page: {request}")
+    valid_page_id(page_id)
     data = request.json or {}
     content = data.get("content", "")
-    logger.info(f"Page content: {content}")
+    # Page bodies are only logged when debug logging is enabled
+    logger.debug("Page content: %s", content)
     
-    success = site_manager.update_page_content(site_id, page_id, content)
+    expected_etag = check_precondition(site_manager.get_page_etag(site_id, page_id))
+    try:
+        success = site_manager.update_page_content(site_id, page_id, content, expected_etag)
+    except PreconditionFailed:
+        raise HTTPError(412, "Precondition failed: page was modified")
     if not success:
         raise HTTPError(404, "Page or site not found")
-    
-    return {"updated": True}
+
+    etag = site_manager.get_page_etag(site_id, page_id)
+    if etag:
+        response.set_header('ETag', etag)
+    return {"updated": True, "etag": etag}
+
+@app.route("/api/v1/sites/<site_id>/pages/<page_id>", method='PATCH')
+def patch_page(site_id, page_id):
+    """Apply a list of operations (see page_patch) to the stored page"""
+    valid_page_id(page_id)
+    data = request.json or {}
+    operations = data.get("operations")
+
+    expected_etag = check_precondition(site_manager.get_page_etag(site_id, page_id))
+    try:
+        success = site_manager.modify_page_content(
+            site_id, page_id, lambda content: apply_operations(content, operations, render_engine),
+            expected_etag)
+    except PreconditionFailed:
+        raise HTTPError(412, "Precondition failed: page was modified")
+    except PatchError as e:
+        raise HTTPError(422, str(e))
+    if not success:
+        raise HTTPError(404, "Page or site not found")
+
+    etag = site_manager.get_page_etag(site_id, page_id)
+    if etag:
+        response.set_header('ETag', etag)
+    return {"updated": True, "etag": etag}
 
 @app.get("/api/v1/sites/<site_id>/pages/<page_id>/editorPath")
 def get_page_editor_path(site_id, page_id):
     """Get the absolute file path for a page"""
+    valid_page_id(page_id)
     site = site_manager.get_site_config(site_id)
     if not site:
         raise HTTPError(404, "Site not found")
 
-    page_id_found = False
-    for page in site.get("pages", []):
-        if list(page.keys())[0] == page_id:
-            page_id_found = True
-            break
-    if not page_id_found:
+    if page_id not in site.get("pages", {}):
         raise HTTPError(404, "Page not found")
 
     page_path = site_manager.get_page_editor_path(site_id, page_id)
@@ -213,15 +466,92 @@ def get_page_editor_path(site_id, page_id):
 
 @app.delete("/api/v1/sites/<site_id>/pages/<page_id>")
 def delete_page(site_id, page_id):
-    success = site_manager.delete_page(site_id, page_id)
+    success = site_manager.delete_page(site_id, valid_page_id(page_id))
     if not success:
-        raise HTTPError(400, "Cannot delete page (not found or is index page)")
+        raise HTTPError(404, "Page or site not found")
 
     return {"deleted": True}
 
+# Page Revision Endpoints
+@app.get("/api/v1/sites/<site_id>/pages/<page_id>/revisions")
+def list_page_revisions(site_id, page_id):
+    valid_page_id(page_id)
+    if site_manager.get_page_stat(site_id, page_id) is None:
+        raise HTTPError(404, "Page or site not found")
+    return {"revisions": site_manager.get_revision_store(site_id).list(page_id)}
+
+@app.get("/api/v1/sites/<site_id>/pages/<page_id>/revisions/<revision:int>")
+def get_page_revision(site_id, page_id, revision):
+    valid_page_id(page_id)
+    content = site_manager.get_revision_store(site_id).get(page_id, revision)
+    if content is None:
+        raise HTTPError(404, "Revision not found")
+    # Revisions never change once written
+    response.set_header('Cache-Control', 'private, max-age=31536000, immutable')
+    response.content_type = 'text/html; charset=utf-8'
+    return content
+
+@app.get("/api/v1/sites/<site_id>/pages/<page_id>/revisions/<revision:int>/diff")
+def diff_page_revision(site_id, page_id, revision):
+    """Unified diff from ?against= (default: the previous revision, or an empty page for the first) to this revision"""
+    valid_page_id(page_id)
+    try:
+        against = int(request.query.get("against", revision - 1))
+    except ValueError:
+        raise HTTPError(400, "against must be a revision number")
+    diff = site_manager.get_revision_store(site_id).diff(page_id, against, revision)
+    if diff is None:
+        raise HTTPError(404, "Revision not found")
+    response.content_type = 'text/plain; charset=utf-8'
+    return diff
+
+@app.post("/api/v1/sites/<site_id>/pages/<page_id>/revisions/<revision:int>/restore")
+def restore_page_revision(site_id, page_id, revision):
+    valid_page_id(page_id)
+    expected_etag = check_precondition(site_manager.get_page_etag(site_id, page_id))
+    try:
+        result = site_manager.restore_page_revision(site_id, page_id, revision, expected_etag)
+    except PreconditionFailed:
+        raise HTTPError(412, "Precondition failed: page was modified")
+    if result is None:
+        raise HTTPError(404, "Revision not found")
+
+    etag = site_manager.get_page_etag(site_id, page_id)
+    if etag:
+        response.set_header('ETag', etag)
+    return dict(result, etag=etag)
+
+# Publishing Endpoints
+@app.post("/api/v1/sites/<site_id>/publish")
+def publish_site(site_id):
+    data = request.json or {}
+    result = publisher.publish_site(site_id, force=bool(data.get("force", False)))
+    if result is None:
+        raise HTTPError(404, "Site not found")
+    return result
+
+# Shared Asset Endpoints
+@app.post("/api/v1/assets/common/upgrade")
+def upgrade_common_assets():
+    """Import the builder's common/ directory and point every site at it"""
+    data = request.json or {}
+    website_builder_path = data.get("websiteBuilderPath")
+    if website_builder_path:
+        website_builder_path = urllib.parse.unquote(website_builder_path)
+    source = Path(website_builder_path or WEBSITE_BUILDER_PATH) / "common"
+
+    try:
+        result = site_manager.asset_store.upgrade(source)
+    except FileNotFoundError as e:
+        raise HTTPError(400, str(e))
+    if data.get("prune"):
+        result["pruned"] = site_manager.asset_store.prune()
+    return result
+
 # Page Modification Script Endpoints
 @app.post("/api/v1/sites/<site_id>/pages/<page_id>/scripts")
 def create_modification_script(site_id, page_id):
+    valid_page_id(page_id)
     data = request.json or {}
     script_content = data.get("script_content", "")
     script_name = data.get("script_name")
@@ -235,56 +565,98 @@ def create_modification_script(site_id, page_id):
     
     return {"script_id": script_id, "created": True}
 
+# Search Endpoints
+@app.get("/api/v1/search")
+def search():
+    """Full-text search over every page: ?q=words[&site=<site_id>][&limit=20][&offset=0]"""
+    query = request.query.getunicode('q', default='').strip()
+    site_id = request.query.getunicode('site') or None
+    try:
+        limit = min(100, max(1, int(request.query.get('limit', 20))))
+        offset = max(0, int(request.query.get('offset', 0)))
+    except ValueError:
+        raise HTTPError(400, "limit and offset must be integers")
+    if not query:
+        raise HTTPError(400, "Query parameter q is required")
+
+    result = site_manager.search_index.search(query, limit=limit, offset=offset, site_id=site_id)
+    sites = {}
+    for hit in result["results"]:
+        if hit["site_id"] not in sites:
+            config = site_manager.get_site_config(hit["site_id"]) or {}
+            sites[hit["site_id"]] = (config.get("name"),
+                                     {page_id: page.get("name") for page_id, page in config.get("pages", {}).items()})
+        site_name, page_names = sites[hit["site_id"]]
+        hit["site_name"] = site_name
+        hit["page_name"] = page_names.get(hit["page_id"])
+    return dict(result, query=query, pending=site_manager.search_index.pending())
+
+@app.post("/api/v1/search/reindex")
+def reindex_search():
+    """Rebuild the search index from disk, e.g. after pages were edited outside the API"""
+    return {"queued": site_manager.reindex_search()}
+
 # Components Endpoints
 @app.get("/api/v1/components")
 def list_components():
     """List all available components with their targets and parameters"""
-    
-    components = []
-    components_dir = Path(__file__).parent / '../../ap-website-builder/components'
-    
-    # Find all XML files recursively
-    xml_files = list(components_dir.glob('**/*.xml'))
-    
-    for xml_file in xml_files:
-        try:
-            with open(xml_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # Extract component info
-            component_id = xml_file.stem
-            component_name = component_id.replace('-', ' ').replace('_', ' ').title()
-            
-            # Extract @target
-            target_match = re.search(r'<!-- @target\s+(.+?)\s+-->', content)
-            target = target_match.group(1) if target_match else None
-            
-            # Extract @param entries
-            param_matches = re.findall(r'<!-- @param\s+(\w+)\s+-->', content)
-            params = param_matches if param_matches else []
-            
-            # Get relative file path for loading content
-            rel_path = xml_file.relative_to(Path(__file__).parent / '../../ap-website-builder')
-            rel_path = str(rel_path).replace('\\', '/')  # Normalize path separators
-            
-            component_info = {
-                'id': component_id,
-                'name': component_name,
-                'target': target,
-                'params': params,
-                'file_path': rel_path,
-                'content': content
-            }
-            
-            components.append(component_info)
-            
-        except Exception as e:
-            logger.error(f"Failed to parse component {xml_file}: {e}")
-            continue
-    
-    return {"components": components}
+    fields = request.query.get('fields')
+    target = request.query.get('target')
+    if fields is not None:
+        fields = [field.strip() for field in fields.split(',') if field.strip()]
+
+    try:
+        body, etag = component_catalog.serialize(fields, target)
+    except ValueError as e:
+        raise HTTPError(400, str(e))
+    check_not_modified(etag)
+
+    response.content_type = 'application/json'
+    return body
+
+@app.post("/api/v1/render")
+def render_batch():
+    """Render templates and components: {"items": [{"template" | "component": name, "params"?: {...}}, ...]}"""
+    data = request.json or {}
+    try:
+        results = render_engine.render_batch(data.get("items"))
+    except ValueError as e:
+        raise HTTPError(400, str(e))
+    return {"results": results}
+
+def shutdown_services():
+    # Persist coalesced site.json writes, queued index updates and transcriptions
+    site_manager.flush()
+    site_manager.search_index.wait(timeout=30)
+    stt_sessions.shutdown(wait=True)
+    events.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Agora Pluribus API server")
+    parser.add_argument("--mode", choices=("dev", "prod"), default=os.environ.get("API_MODE", "dev"),
+                        help="dev: Bottle's debug server; prod: thread-pool server with debug off")
+    # Listen only on localhost (127.0.0.1) by default
+    parser.add_argument("--host", default=os.environ.get("API_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("API_PORT", "8000")))
+    parser.add_argument("--threads", type=int, default=int(os.environ.get("API_THREADS", "16")),
+                        help="Request threads in prod mode")
+    parser.add_argument("--timeout", type=float, default=float(os.environ.get("API_SOCKET_TIMEOUT", "30")),
+                        help="Socket timeout in seconds in prod mode")
+    parser.add_argument("--log-level", default=os.environ.get("LOG_LEVEL", "INFO"),
+                        help="DEBUG also logs page bodies")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(args.log_level.upper())
+
+    if os.environ.get("STT_PRELOAD", "1") != "0":
+        stt.load_model_async()
+
+    if args.mode == "dev":
+        run(application, server=DevServer(host=args.host, port=args.port), debug=True)
+        shutdown_services()
+    else:
+        serve(application, args.host, args.port, threads=args.threads, timeout=args.timeout,
+              on_shutdown=[shutdown_services])
 
 if __name__ == "__main__":
-    # Listen only on localhost (127.0.0.1)
-    run(app, host="127.0.0.1", port=8000, debug=True)
+    main()
 
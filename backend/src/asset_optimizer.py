@@ -0,0 +1,229 @@
+import gzip
+import hashlib
+import logging
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import html_document
+from site_manager import atomic_write_bytes
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; only .gz siblings are written without it
+    brotli = None
+
+logging.basicConfig(format='%(levelname)s:%(message)s', level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ASSETS_DIRNAME = "assets"
+COMPRESSIBLE_SUFFIXES = (".html", ".css", ".js", ".svg", ".json", ".xml", ".txt")
+MIN_COMPRESS_SIZE = 256
+
+_CSS_TOKENS = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|(/\*.*?\*/)|(\s+)', re.DOTALL)
+_CSS_PUNCTUATION = re.compile(r'\s*([{};,>])\s*|\s*:\s+')
+_HTML_RAW_BLOCKS = re.compile(r'(<(pre|textarea|script|style)\b.*?</\2\s*>)', re.DOTALL | re.IGNORECASE)
+_HTML_COMMENTS = re.compile(r'<!--(?!\[if).*?-->', re.DOTALL)
+
+
+def minify_css(text: str) -> str:
+    strings = []
+
+    def protect(match):
+        string, comment, _ = match.groups()
+        if string:
+            strings.append(string)
+            return f"\0{len(strings) - 1}\0"
+        return "" if comment else " "
+
+    text = _CSS_TOKENS.sub(protect, text)
+    # Spaces before ':' are kept since "a :hover" and "a:hover" differ
+    text = _CSS_PUNCTUATION.sub(lambda match: match.group(1) or ':', text)
+    text = text.replace(';}', '}').strip()
+    return re.sub(r'\0(\d+)\0', lambda match: strings[int(match.group(1))], text)
+
+
+def minify_js(text: str) -> str:
+    """Conservative JS minification: trims indentation, blank lines and
+    whole-line // comments but keeps line breaks so ASI is unaffected."""
+    lines = []
+    in_template = False
+    for line in text.splitlines():
+        if line.count('`') % 2:
+            in_template = not in_template
+            lines.append(line.rstrip())
+            continue
+        if in_template:
+            lines.append(line)
+            continue
+        stripped = line.strip()
+        if not stripped or stripped.startswith('//'):
+            continue
+        lines.append(stripped)
+    return "\n".join(lines)
+
+
+def minify_html(text: str) -> str:
+    """Drop comments and collapse whitespace runs, leaving pre/textarea/script/style alone.
+
+    Runs are collapsed rather than removed since whitespace between inline
+    elements is significant.
+    """
+    parts = _HTML_RAW_BLOCKS.split(text)
+    out = []
+    # split() yields [text, block, tagname, text, block, tagname, ...]
+    for i in range(0, len(parts), 3):
+        chunk = _HTML_COMMENTS.sub('', parts[i])
+        chunk = re.sub(r'\s*\n\s*', '\n', chunk)
+        chunk = re.sub(r'[ \t]{2,}', ' ', chunk)
+        out.append(chunk)
+        if i + 1 < len(parts):
+            out.append(parts[i + 1])
+    return "".join(out).strip()
+
+
+MINIFIERS = {".css": minify_css, ".html": minify_html}
+
+
+def _minify(path: Path, data: bytes) -> bytes:
+    if path.name.endswith(('.min.js', '.min.css')):
+        return data
+    if path.suffix == '.js':
+        return minify_js(data.decode('utf-8')).encode('utf-8')
+    minifier = MINIFIERS.get(path.suffix)
+    if minifier is None:
+        return data
+    return minifier(data.decode('utf-8')).encode('utf-8')
+
+
+def write_precompressed(path: Path, data: bytes) -> List[Path]:
+    """Write .gz (and .br when brotli is installed) siblings for web servers
+    that serve precompressed files (gzip_static / brotli_static)."""
+    written = []
+    if path.suffix not in COMPRESSIBLE_SUFFIXES or len(data) < MIN_COMPRESS_SIZE:
+        return written
+
+    compressed = gzip.compress(data, compresslevel=9, mtime=0)
+    if len(compressed) < len(data):
+        gz_path = path.with_name(path.name + ".gz")
+        # Replaced rather than rewritten in place: a cloned site may share the file
+        atomic_write_bytes(gz_path, compressed, fsync=False)
+        written.append(gz_path)
+    if brotli is not None:
+        compressed = brotli.compress(data, quality=11)
+        if len(compressed) < len(data):
+            br_path = path.with_name(path.name + ".br")
+            atomic_write_bytes(br_path, compressed, fsync=False)
+            written.append(br_path)
+    return written
+
+
+_FINGERPRINT = re.compile(r'\.([0-9a-f]{12})((?:\.min)?\.[A-Za-z0-9]+)$')
+
+
+def fingerprint_name(path: Path, digest: str) -> str:
+    name = path.name
+    for suffix in ('.min.js', '.min.css'):
+        if name.endswith(suffix):
+            return f"{name[:-len(suffix)]}.{digest}{suffix}"
+    return f"{path.stem}.{digest}{path.suffix}"
+
+
+class AssetOptimizer:
+    """Minifies, fingerprints and precompresses a site's published output.
+
+    Local stylesheets, scripts and images referenced by a page are written
+    once to ``assets/<name>.<hash><ext>`` (identical files from different
+    pages share one copy) and the page is rewritten to point at them, so
+    they can be served with far-future cache headers.
+    """
+
+    REFERENCE_ATTRS = {"link": "href", "script": "src", "img": "src"}
+
+    def __init__(self, site_path: Path):
+        self.site_path = Path(site_path)
+        self.assets_path = self.site_path / ASSETS_DIRNAME
+        self._lock = threading.Lock()
+        self._by_digest: Optional[Dict[Tuple[str, str], str]] = None
+
+    def _existing_assets(self) -> Dict[Tuple[str, str], str]:
+        if self._by_digest is None:
+            self._by_digest = {}
+            if self.assets_path.exists():
+                for path in self.assets_path.iterdir():
+                    match = _FINGERPRINT.search(path.name)
+                    if match:
+                        self._by_digest.setdefault(match.groups(), path.name)
+        return self._by_digest
+
+    def _local_source(self, reference: str, base_dir: Path) -> Optional[Path]:
+        if not reference or re.match(r'^([a-z][a-z0-9+.-]*:|//|#|\$\{)', reference, re.IGNORECASE):
+            return None
+        # Normalise without resolving symlinks (common/ may link to a shared store)
+        path = Path(os.path.normpath(os.path.abspath(base_dir / reference.split('?')[0].split('#')[0])))
+        try:
+            path.relative_to(os.path.abspath(self.site_path))
+        except ValueError:
+            return None
+        return path if path.is_file() else None
+
+    def add_asset(self, source: Path) -> Tuple[str, bytes]:
+        """Optimize one source file; returns its fingerprinted path relative to the site."""
+        data = _minify(source, source.read_bytes())
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        name = fingerprint_name(source, digest)
+        key = _FINGERPRINT.search(name).groups()
+        with self._lock:
+            # Identical content is stored once, whatever file it came from
+            existing = self._existing_assets()
+            if key in existing and (self.assets_path / existing[key]).exists():
+                name = existing[key]
+            else:
+                target = self.assets_path / name
+                self.assets_path.mkdir(parents=True, exist_ok=True)
+                write_precompressed(target, data)
+                # Readers (and concurrent publishes) never see a partly written asset
+                atomic_write_bytes(target, data, fsync=False)
+                existing[key] = name
+        return f"{ASSETS_DIRNAME}/{name}", data
+
+    def optimize_page(self, html: str, base_dir: Path) -> Tuple[str, Dict[str, str]]:
+        """Rewrite local asset references in a page.
+
+        Returns the minified page and a mapping of each referenced source
+        (relative to the site) to the fingerprinted asset it was written to.
+        """
+        root = html_document.parse(html)
+        edits = []
+        assets = {}
+        for element in root.iter():
+            attr = self.REFERENCE_ATTRS.get(element.tag)
+            if attr is None or attr not in element.attrs:
+                continue
+            source = self._local_source(element.attrs[attr], base_dir)
+            if source is None:
+                continue
+            asset, _ = self.add_asset(source)
+            assets[str(source.relative_to(os.path.abspath(self.site_path))).replace('\\', '/')] = asset
+
+            tag_text = element.start_tag(html)
+            pattern = re.compile(r'(\s' + attr + r'\s*=\s*)("[^"]*"|\'[^\']*\'|[^\s>]+)', re.IGNORECASE)
+            tag_text = pattern.sub(lambda match: f'{match.group(1)}"{asset}"', tag_text, count=1)
+            edits.append((element.start, element.start_tag_end, tag_text))
+
+        return minify_html(html_document.splice(html, edits)), assets
+
+    def collect_garbage(self, referenced: List[str]) -> List[str]:
+        """Delete fingerprinted assets no published page references any more."""
+        keep = {Path(asset).name for asset in referenced}
+        removed = []
+        if not self.assets_path.exists():
+            return removed
+        for path in self.assets_path.iterdir():
+            base = path.name[:-3] if path.name.endswith(('.gz', '.br')) else path.name
+            if base not in keep:
+                path.unlink()
+                removed.append(path.name)
+        return removed
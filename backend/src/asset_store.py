@@ -0,0 +1,181 @@
+import hashlib
+import logging
+import os
+import shutil
+import threading
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logging.basicConfig(format='%(levelname)s:%(message)s', level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+STORE_DIRNAME = ".shared"
+
+
+class SharedAssetStore:
+    """Content-addressed, versioned copies of the builder's common/ directory.
+
+    Each distinct common/ tree is stored once under
+    ``<sites>/.shared/common/<version>`` where the version is a hash of its
+    contents, and ``common/current`` points at the newest one. A site's
+    ``common`` is a symlink to ``current``, so creating a site costs one
+    symlink and upgrading the editor scripts for every site is a single
+    pointer swap. Where symlinks are unavailable (e.g. Windows without
+    developer mode) sites get hard-linked copies instead, which are re-linked
+    on upgrade.
+    """
+
+    def __init__(self, sites_dir: Path):
+        self.sites_dir = Path(sites_dir)
+        self.root = self.sites_dir / STORE_DIRNAME / "common"
+        self._lock = threading.Lock()
+        self._version_cache: Dict[Tuple[str, Tuple], str] = {}
+        self._symlinks: Optional[bool] = None
+
+    @property
+    def current_link(self) -> Path:
+        return self.root / "current"
+
+    @property
+    def current_file(self) -> Path:
+        return self.root / "CURRENT"
+
+    def symlinks_supported(self) -> bool:
+        if self._symlinks is None:
+            self.root.mkdir(parents=True, exist_ok=True)
+            probe = self.root / f".probe-{uuid.uuid4().hex}"
+            try:
+                os.symlink(".", probe, target_is_directory=True)
+                probe.unlink()
+                self._symlinks = True
+            except (OSError, NotImplementedError):
+                self._symlinks = False
+        return self._symlinks
+
+    @staticmethod
+    def _tree_signature(source: Path) -> Tuple:
+        entries = []
+        for dirpath, _, filenames in os.walk(source):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                stat = os.stat(path)
+                entries.append((os.path.relpath(path, source), stat.st_mtime_ns, stat.st_size))
+        return tuple(sorted(entries))
+
+    def _version_of(self, source: Path) -> str:
+        signature = self._tree_signature(source)
+        key = (str(source.resolve()), signature)
+        version = self._version_cache.get(key)
+        if version is None:
+            digest = hashlib.sha256()
+            for relpath, _, _ in signature:
+                digest.update(relpath.replace('\\', '/').encode('utf-8') + b"\0")
+                digest.update(hashlib.sha256((source / relpath).read_bytes()).digest())
+            version = digest.hexdigest()[:16]
+            self._version_cache[key] = version
+        return version
+
+    def get_version_path(self, version: str) -> Path:
+        return self.root / version
+
+    def current_version(self) -> Optional[str]:
+        try:
+            return self.current_file.read_text(encoding='utf-8').strip() or None
+        except FileNotFoundError:
+            return None
+
+    def import_directory(self, source: Path) -> str:
+        """Store a common/ tree (once per distinct content) and make it current."""
+        source = Path(source)
+        if not source.is_dir():
+            raise FileNotFoundError(f"Common assets directory not found: {source}")
+
+        with self._lock:
+            version = self._version_of(source)
+            version_path = self.get_version_path(version)
+            if not version_path.exists():
+                self.root.mkdir(parents=True, exist_ok=True)
+                staging = self.root / f".staging-{uuid.uuid4().hex}"
+                shutil.copytree(source, staging)
+                try:
+                    os.replace(staging, version_path)
+                except OSError:
+                    # Another process stored the same version first
+                    shutil.rmtree(staging, ignore_errors=True)
+                logger.info(f"Stored common assets version {version}")
+
+            if self.current_version() != version:
+                self._set_current(version)
+            return version
+
+    def _replace_symlink(self, link: Path, target: Path) -> None:
+        temp = link.with_name(f".{link.name}-{uuid.uuid4().hex}")
+        os.symlink(os.path.relpath(target, link.parent), temp, target_is_directory=True)
+        os.replace(temp, link)
+
+    def _set_current(self, version: str) -> None:
+        temp = self.current_file.with_name(f".CURRENT-{uuid.uuid4().hex}")
+        temp.write_text(version, encoding='utf-8')
+        os.replace(temp, self.current_file)
+        if self.symlinks_supported():
+            self._replace_symlink(self.current_link, self.get_version_path(version))
+
+    def _hardlink_tree(self, source: Path, destination: Path) -> None:
+        def link(src, dst):
+            try:
+                os.link(src, dst)
+            except OSError:
+                shutil.copy2(src, dst)
+        shutil.copytree(source, destination, copy_function=link)
+
+    def link_site(self, site_path: Path) -> None:
+        """Point a site's common/ at the current shared version."""
+        version = self.current_version()
+        if version is None:
+            raise FileNotFoundError("No common assets have been imported")
+
+        destination = Path(site_path) / "common"
+        if self.symlinks_supported():
+            if destination.is_dir() and not destination.is_symlink():
+                # Replace a legacy per-site copy
+                shutil.rmtree(destination)
+            self._replace_symlink(destination, self.current_link)
+            return
+
+        staging = destination.with_name(f".common-{uuid.uuid4().hex}")
+        self._hardlink_tree(self.get_version_path(version), staging)
+        if destination.exists():
+            shutil.rmtree(destination)
+        os.replace(staging, destination)
+
+    def upgrade(self, source: Path) -> Dict:
+        """Import a new common/ tree and bring every site onto it."""
+        version = self.import_directory(source)
+        relinked = []
+        for site_path in self._site_paths():
+            common = site_path / "common"
+            if self.symlinks_supported() and common.is_symlink():
+                continue  # Follows common/current already
+            self.link_site(site_path)
+            relinked.append(site_path.name)
+        return {"version": version, "relinked": relinked}
+
+    def _site_paths(self) -> List[Path]:
+        if not self.sites_dir.exists():
+            return []
+        return [path for path in self.sites_dir.iterdir()
+                if path.is_dir() and not path.name.startswith('.') and (path / "site.json").exists()]
+
+    def prune(self) -> List[str]:
+        """Delete stored versions other than the current one."""
+        current = self.current_version()
+        removed = []
+        if not self.root.exists():
+            return removed
+        for path in self.root.iterdir():
+            if path.name.startswith('.') or path.name in ("current", "CURRENT", current) or not path.is_dir():
+                continue
+            shutil.rmtree(path)
+            removed.append(path.name)
+        return removed
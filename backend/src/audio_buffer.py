@@ -0,0 +1,106 @@
+import threading
+from typing import Optional
+
+import numpy as np
+
+
+class AudioRingBuffer:
+    """Bounded float32 buffer that the capture callback writes into directly.
+
+    Every sample is stored twice, at ``i`` and ``i + capacity``, so the most
+    recent ``capacity`` samples are always contiguous and view() can hand the
+    transcriber a slice of the buffer instead of a concatenated copy.
+
+    Storage starts at ``initial_seconds`` and doubles as needed up to
+    ``max_seconds``; after that the oldest audio is overwritten. Sample
+    positions are absolute (counted from the last clear()), so callers can keep
+    offsets across wrap-arounds.
+    """
+
+    def __init__(self, samplerate: int, max_seconds: float = 300.0, initial_seconds: float = 30.0):
+        self.samplerate = samplerate
+        self.max_capacity = max(1, int(max_seconds * samplerate))
+        self._capacity = min(self.max_capacity, max(1, int(initial_seconds * samplerate)))
+        self._data = np.zeros(2 * self._capacity, dtype=np.float32)
+        self._written = 0
+        self._lock = threading.Lock()
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    @property
+    def total_samples(self) -> int:
+        """Number of samples written since the last clear(), including dropped ones."""
+        return self._written
+
+    @property
+    def first_sample(self) -> int:
+        """Absolute position of the oldest sample still held."""
+        return max(0, self._written - self._capacity)
+
+    @property
+    def dropped_samples(self) -> int:
+        return self.first_sample
+
+    def clear(self) -> None:
+        with self._lock:
+            self._written = 0
+
+    def _place(self, samples: np.ndarray, position: int) -> None:
+        capacity = self._capacity
+        offset = position % capacity
+        head = min(len(samples), capacity - offset)
+        self._data[offset:offset + head] = samples[:head]
+        self._data[offset + capacity:offset + capacity + head] = samples[:head]
+        tail = len(samples) - head
+        if tail:
+            self._data[:tail] = samples[head:]
+            self._data[capacity:capacity + tail] = samples[head:]
+
+    def _grow(self, needed: int) -> None:
+        capacity = self._capacity
+        while capacity < needed and capacity < self.max_capacity:
+            capacity = min(self.max_capacity, capacity * 2)
+        if capacity == self._capacity:
+            return
+
+        start = self.first_sample
+        retained = self._view(start, self._written).copy()
+        self._capacity = capacity
+        self._data = np.zeros(2 * capacity, dtype=np.float32)
+        self._place(retained, start)
+
+    def write(self, block: np.ndarray) -> None:
+        """Append a block of samples (any shape; mono audio is flattened)."""
+        samples = block.reshape(-1)
+        count = len(samples)
+        with self._lock:
+            if self._written + count > self._capacity:
+                self._grow(self._written + count)
+
+            position = self._written
+            if count > self._capacity:
+                position += count - self._capacity
+                samples = samples[-self._capacity:]
+            self._place(samples, position)
+            self._written += count
+
+    def _view(self, start: int, end: int) -> np.ndarray:
+        start = max(start, self._written - self._capacity)
+        end = min(end, self._written)
+        if end <= start:
+            return self._data[:0]
+        capacity = self._capacity
+        stop = end % capacity + capacity
+        return self._data[stop - (end - start):stop]
+
+    def view(self, start: int = 0, end: Optional[int] = None) -> np.ndarray:
+        """Zero-copy view of samples [start, end) by absolute position.
+
+        The range is clamped to the audio still held. The view aliases the
+        buffer, so it is only stable while no more than ``capacity - len``
+        further samples are written (always true once capture has stopped).
+        """
+        with self._lock:
+            return self._view(start, self._written if end is None else end)
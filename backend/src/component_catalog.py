@@ -0,0 +1,170 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from http_cache import etag_from_bytes
+
+logging.basicConfig(format='%(levelname)s:%(message)s', level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TARGET_PATTERN = re.compile(r'<!-- @target\s+(.+?)\s+-->')
+PARAM_PATTERN = re.compile(r'<!-- @param\s+(\w+)\s+-->')
+DIRECTIVE_PATTERN = re.compile(r'<!--\s*@(target|param).*?-->')
+PLACEHOLDER_PATTERN = re.compile(r'\$\{(\w+)\}')
+
+COMPONENT_FIELDS = ('id', 'name', 'target', 'params', 'file_path', 'content')
+
+
+def parse_component(xml_file: Path, builder_dir: Path) -> Dict:
+    with open(xml_file, 'r', encoding='utf-8') as f:
+        content = f.read()
+
+    # Extract component info
+    component_id = xml_file.stem
+    component_name = component_id.replace('-', ' ').replace('_', ' ').title()
+
+    # Extract @target
+    target_match = TARGET_PATTERN.search(content)
+    target = target_match.group(1) if target_match else None
+
+    # Extract @param entries
+    params = PARAM_PATTERN.findall(content)
+
+    # Get relative file path for loading content
+    rel_path = xml_file.relative_to(builder_dir)
+    rel_path = str(rel_path).replace('\\', '/')  # Normalize path separators
+
+    return {
+        'id': component_id,
+        'name': component_name,
+        'target': target,
+        'params': params,
+        'file_path': rel_path,
+        'content': content
+    }
+
+
+class ComponentCatalog:
+    """Parsed component XML files, indexed by target selector.
+
+    Files are parsed once and re-parsed only when their mtime/size changes.
+    Serialized JSON bodies are cached per filter until the catalog changes.
+    """
+
+    def __init__(self, builder_dir: Path, refresh_interval: float = 1.0):
+        self.builder_dir = Path(builder_dir)
+        self.components_dir = self.builder_dir / "components"
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._files: Dict[str, Tuple[Tuple[int, int], Dict]] = {}
+        self._components: List[Dict] = []
+        self._by_target: Dict[str, List[Dict]] = {}
+        self._by_id: Dict[str, Dict] = {}
+        self._bodies: Dict[Tuple, Tuple[bytes, str]] = {}
+        self._checked_at = 0.0
+
+    def _scan(self) -> Dict[str, os.stat_result]:
+        found = {}
+        for dirpath, _, filenames in os.walk(self.components_dir):
+            for filename in filenames:
+                if filename.endswith('.xml'):
+                    path = os.path.join(dirpath, filename)
+                    try:
+                        found[path] = os.stat(path)
+                    except OSError:
+                        continue
+        return found
+
+    def refresh(self, force: bool = False) -> bool:
+        """Re-parse changed component files. Returns True if the catalog changed."""
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._checked_at < self.refresh_interval:
+                return False
+            self._checked_at = now
+
+            changed = False
+            found = self._scan()
+            for path in set(self._files) - set(found):
+                del self._files[path]
+                changed = True
+
+            for path, stat in found.items():
+                signature = (stat.st_mtime_ns, stat.st_size)
+                cached = self._files.get(path)
+                if cached and cached[0] == signature:
+                    continue
+                try:
+                    component = parse_component(Path(path), self.builder_dir)
+                except (OSError, ValueError) as e:
+                    logger.error(f"Failed to parse component {path}: {e}")
+                    self._files.pop(path, None)
+                    changed = True
+                    continue
+                self._files[path] = (signature, component)
+                changed = True
+
+            if changed:
+                self._rebuild_index()
+            return changed
+
+    def _rebuild_index(self) -> None:
+        self._components = [self._files[path][1] for path in sorted(self._files)]
+        by_target: Dict[str, List[Dict]] = {}
+        for component in self._components:
+            if component['target']:
+                by_target.setdefault(component['target'], []).append(component)
+        self._by_target = by_target
+        self._by_id = {component['id']: component for component in self._components}
+        self._bodies = {}
+
+    def components(self, target: Optional[str] = None) -> List[Dict]:
+        self.refresh()
+        if target is None:
+            return list(self._components)
+        return list(self._by_target.get(target, []))
+
+    def get(self, component_id: str) -> Optional[Dict]:
+        self.refresh()
+        return self._by_id.get(component_id)
+
+    def targets(self) -> List[str]:
+        self.refresh()
+        return list(self._by_target)
+
+    def serialize(self, fields: Optional[Iterable[str]] = None, target: Optional[str] = None) -> Tuple[bytes, str]:
+        """Return the JSON body and ETag for a (possibly filtered) listing.
+
+        Bodies are cached per field subset and known target, so the cache
+        cannot grow beyond 2**len(COMPONENT_FIELDS) * (targets + 1) entries
+        however the query strings vary.
+        """
+        if fields is not None:
+            requested = set(fields)
+            unknown = sorted(requested - set(COMPONENT_FIELDS))
+            if unknown:
+                raise ValueError(f"Unknown component fields: {', '.join(unknown)}")
+            # Order and duplicates in the query do not matter
+            fields = tuple(field for field in COMPONENT_FIELDS if field in requested)
+
+        self.refresh()
+        if target is not None and target not in self._by_target:
+            # Every unknown target lists nothing; they share one entry
+            target = ""
+        key = (fields, target)
+        cached = self._bodies.get(key)
+        if cached:
+            return cached
+
+        components = self._components if target is None else self._by_target.get(target, [])
+        if fields is not None:
+            components = [{field: component[field] for field in fields} for component in components]
+        body = json.dumps({"components": components}).encode('utf-8')
+        cached = (body, etag_from_bytes(body))
+        self._bodies[key] = cached
+        return cached
@@ -0,0 +1,225 @@
+import gzip
+import io
+import logging
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from metrics import REGISTRY
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; responses are only gzipped without it
+    brotli = None
+
+logging.basicConfig(format='%(levelname)s:%(message)s', level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "application/xml", "image/svg+xml")
+# Suffix added inside a compressed response's ETag, e.g. "abc" -> "abc-gzip"
+ETAG_SUFFIXES = {"gzip": "-gzip", "br": "-br"}
+
+COMPRESSION_SECONDS = REGISTRY.histogram("http_compression_seconds", "Time spent compressing response bodies",
+                                         ("encoding",))
+COMPRESSION_CACHE_HITS = REGISTRY.counter("http_compression_cache_hits_total",
+                                          "Compressed bodies served from the cache")
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """``gzip;q=0.8, br`` -> ``{"gzip": 0.8, "br": 1.0}``"""
+    encodings = {}
+    for part in header.split(','):
+        name, _, params = part.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        encodings[name] = q
+    return encodings
+
+
+def negotiate(header: Optional[str], available: Tuple[str, ...]) -> Optional[str]:
+    """Pick the client's most preferred of ``available`` (earlier wins ties), or None for identity."""
+    if not header:
+        return None
+    accepted = parse_accept_encoding(header)
+    best, best_q = None, 0.0
+    for encoding in available:
+        q = accepted.get(encoding, accepted.get('*', 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(data: bytes, encoding: str, level: int = 6) -> bytes:
+    with COMPRESSION_SECONDS.time(encoding=encoding):
+        if encoding == "br":
+            # Brotli quality 5 compresses about as fast as gzip -6 but smaller
+            return brotli.compress(data, quality=5)
+        return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def _strip_etag_suffixes(header: str) -> str:
+    for suffix in ETAG_SUFFIXES.values():
+        header = header.replace(suffix + '"', '"')
+    return header
+
+
+class CompressionMiddleware:
+    """WSGI middleware negotiating gzip/brotli response compression.
+
+    Bodies of compressible types at least ``min_size`` bytes long are
+    compressed for clients that accept it, with ``Vary: Accept-Encoding``
+    and the encoding appended to the ETag. Compressed bodies of responses
+    with an ETag are cached (LRU, ``cache_bytes`` total) keyed by path, ETag
+    and encoding, so unchanged pages and the component catalog are
+    compressed once. Request bodies sent with ``Content-Encoding: gzip`` are
+    decompressed before the app sees them, up to ``max_request_bytes``.
+    """
+
+    def __init__(self, app, min_size: int = 1024, level: int = 6, cache_bytes: int = 64 * 1024 * 1024,
+                 max_request_bytes: int = 32 * 1024 * 1024, max_response_bytes: int = 64 * 1024 * 1024):
+        self.app = app
+        self.min_size = min_size
+        self.level = level
+        self.cache_bytes = cache_bytes
+        self.max_request_bytes = max_request_bytes
+        self.max_response_bytes = max_response_bytes
+        self.encodings = ("br", "gzip") if brotli is not None else ("gzip",)
+        self._cache: "OrderedDict[Tuple[str, str, str], bytes]" = OrderedDict()
+        self._cache_size = 0
+        self._lock = threading.Lock()
+
+    def _cache_get(self, key: Tuple[str, str, str]) -> Optional[bytes]:
+        with self._lock:
+            body = self._cache.get(key)
+            if body is not None:
+                self._cache.move_to_end(key)
+            return body
+
+    def _cache_put(self, key: Tuple[str, str, str], body: bytes) -> None:
+        if len(body) > self.cache_bytes // 4:
+            return
+        with self._lock:
+            previous = self._cache.pop(key, None)
+            if previous is not None:
+                self._cache_size -= len(previous)
+            self._cache[key] = body
+            self._cache_size += len(body)
+            while self._cache_size > self.cache_bytes:
+                _, evicted = self._cache.popitem(last=False)
+                self._cache_size -= len(evicted)
+
+    def _decode_request(self, environ) -> Optional[str]:
+        """Decompress a gzip request body in place; returns an error message on failure."""
+        encoding = environ.pop('HTTP_CONTENT_ENCODING', '').strip().lower()
+        if encoding in ('', 'identity'):
+            return None
+        if encoding not in ('gzip', 'x-gzip'):
+            return f"Unsupported Content-Encoding: {encoding}"
+        try:
+            length = int(environ.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            return "Invalid Content-Length"
+        decompressor = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+        try:
+            body = decompressor.decompress(environ['wsgi.input'].read(length), self.max_request_bytes + 1)
+        except zlib.error:
+            return "Malformed gzip request body"
+        if len(body) > self.max_request_bytes or decompressor.unconsumed_tail:
+            return "Decompressed request body too large"
+        environ['wsgi.input'] = io.BytesIO(body)
+        environ['CONTENT_LENGTH'] = str(len(body))
+        return None
+
+    def __call__(self, environ, start_response):
+        error = self._decode_request(environ)
+        if error:
+            start_response('400 Bad Request', [('Content-Type', 'text/plain; charset=utf-8')])
+            return [error.encode('utf-8')]
+
+        # Validators of compressed representations refer to the same resource version
+        for name in ('HTTP_IF_NONE_MATCH', 'HTTP_IF_MATCH'):
+            if name in environ:
+                environ[name] = _strip_etag_suffixes(environ[name])
+
+        encoding = None
+        if environ.get('REQUEST_METHOD') != 'HEAD':
+            encoding = negotiate(environ.get('HTTP_ACCEPT_ENCODING'), self.encodings)
+        captured = {}
+
+        def capturing_start_response(status, headers, exc_info=None):
+            captured["status"], captured["headers"], captured["exc_info"] = status, headers, exc_info
+            # Written only through the returned body
+            return lambda data: None
+
+        result = self.app(environ, capturing_start_response)
+        if "status" not in captured:
+            # start_response deferred to the first iteration; Bottle never does this
+            result = self._consume(result)
+        status, headers = captured["status"], list(captured["headers"])
+        header_map = {name.lower(): value for name, value in headers}
+        if not self._compressible(status, header_map):
+            start_response(status, headers, captured["exc_info"])
+            return result
+
+        _vary(headers)
+        length = header_map.get('content-length')
+        if encoding is None or (length is not None and not self.min_size <= int(length) <= self.max_response_bytes):
+            start_response(status, headers, captured["exc_info"])
+            return result
+
+        body = self._consume(result)[0]
+        if len(body) < self.min_size:
+            start_response(status, headers, captured["exc_info"])
+            return [body]
+
+        etag = header_map.get('etag')
+        key = (environ.get('PATH_INFO', '') + '?' + environ.get('QUERY_STRING', ''), etag, encoding)
+        compressed = self._cache_get(key) if etag else None
+        if compressed is not None:
+            COMPRESSION_CACHE_HITS.inc()
+        else:
+            compressed = compress(body, encoding, self.level)
+            if etag:
+                self._cache_put(key, compressed)
+
+        headers = [(name, value) for name, value in headers if name.lower() not in ('content-length', 'etag')]
+        headers.append(('Content-Encoding', encoding))
+        headers.append(('Content-Length', str(len(compressed))))
+        if etag:
+            headers.append(('ETag', etag[:-1] + ETAG_SUFFIXES[encoding] + '"' if etag.endswith('"') else etag))
+        start_response(status, headers, captured["exc_info"])
+        return [compressed]
+
+    @staticmethod
+    def _consume(result) -> List[bytes]:
+        try:
+            return [b"".join(result)]
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+
+    @staticmethod
+    def _compressible(status: str, header_map: Dict[str, str]) -> bool:
+        if not status.startswith('200') or 'content-encoding' in header_map:
+            return False
+        content_type = header_map.get('content-type', '').lower()
+        # Event streams never end, so their body cannot be buffered
+        return content_type.startswith(COMPRESSIBLE_TYPES) and not content_type.startswith('text/event-stream')
+
+
+def _vary(headers: List[Tuple[str, str]]) -> None:
+    for i, (name, value) in enumerate(headers):
+        if name.lower() == 'vary':
+            if 'accept-encoding' not in value.lower():
+                headers[i] = (name, value + ', Accept-Encoding')
+            return
+    headers.append(('Vary', 'Accept-Encoding'))
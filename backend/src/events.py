@@ -0,0 +1,256 @@
+import json
+import logging
+import selectors
+import socket
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, Iterator, Optional, Tuple
+
+from metrics import REGISTRY
+
+logging.basicConfig(format='%(levelname)s:%(message)s', level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Reconnection delay suggested to EventSource clients
+RETRY_MS = 3000
+HEARTBEAT = b": ping\n\n"
+
+EVENTS_PUBLISHED = REGISTRY.counter("events_published_total", "Change events published", ("type",))
+EVENTS_DROPPED_CLIENTS = REGISTRY.counter("events_dropped_clients_total",
+                                          "Event stream clients disconnected for falling too far behind")
+
+
+def format_event(event_id: str, event_type: str, data: Dict) -> bytes:
+    # Compact JSON has no raw newlines, so it fits on one data: line
+    return f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode('utf-8')
+
+
+class _Event:
+    __slots__ = ("seq", "site_id", "payload")
+
+    def __init__(self, seq: int, site_id: Optional[str], payload: bytes):
+        self.seq = seq
+        self.site_id = site_id
+        self.payload = payload
+
+
+class _Client:
+    __slots__ = ("sock", "site_id", "buffer", "last_write", "mask")
+
+    def __init__(self, sock: socket.socket, site_id: Optional[str], buffer: bytes):
+        self.sock = sock
+        self.site_id = site_id
+        self.buffer = bytearray(buffer)
+        self.last_write = time.monotonic()
+        self.mask = 0
+
+
+def _wants(site_id: Optional[str], event: _Event) -> bool:
+    # Site-less events (e.g. STT sessions) go to every stream
+    return site_id is None or event.site_id is None or event.site_id == site_id
+
+
+class EventBus:
+    """Change events (sites, pages, STT sessions) fanned out as Server-Sent Events.
+
+    Events carry IDs of the form ``<epoch>-<seq>``; the last ``history`` are
+    kept so a reconnecting client sending ``Last-Event-ID`` gets what it
+    missed. When those events are gone (or the server restarted, changing
+    the epoch) it gets a ``reset`` event instead and should re-list.
+
+    Connections handed over by the HTTP server (``attach``) are all served
+    by one selector thread, so idle clients hold no request thread; a
+    client whose unsent events exceed ``max_buffer`` bytes is dropped.
+    ``stream`` is the fallback for servers that cannot hand connections
+    over and holds its request thread for as long as the client listens.
+    """
+
+    def __init__(self, history: int = 1024, heartbeat: float = 15.0, max_clients: int = 512,
+                 max_buffer: int = 1024 * 1024):
+        self.heartbeat = heartbeat
+        self.max_clients = max_clients
+        self.max_buffer = max_buffer
+        self._epoch = f"{int(time.time() * 1000):x}"
+        self._seq = 0
+        self._history: Deque[_Event] = deque(maxlen=history)
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._clients: Dict[socket.socket, _Client] = {}
+        self._streams = 0
+        self._closed = False
+        self._selector: Optional[selectors.BaseSelector] = None
+        self._wake_r = self._wake_w = None
+        self._thread: Optional[threading.Thread] = None
+        REGISTRY.gauge("events_clients", "Connected event stream clients", lambda: len(self._clients) + self._streams)
+
+    def _event_id(self, seq: int) -> str:
+        return f"{self._epoch}-{seq}"
+
+    def publish(self, event_type: str, data: Dict, site_id: Optional[str] = None) -> str:
+        """Send an event to every matching client; returns its ID."""
+        with self._lock:
+            self._seq += 1
+            event_id = self._event_id(self._seq)
+            event = _Event(self._seq, site_id, format_event(event_id, event_type, data))
+            self._history.append(event)
+            for client in self._clients.values():
+                if _wants(client.site_id, event):
+                    client.buffer += event.payload
+            self._cond.notify_all()
+        EVENTS_PUBLISHED.inc(type=event_type)
+        self._wake()
+        return event_id
+
+    def _since(self, seq: int, site_id: Optional[str]) -> Optional[bytes]:
+        """Matching events after ``seq``, or None if some were already dropped; call with the lock held."""
+        if seq < self._seq and (not self._history or self._history[0].seq > seq + 1):
+            return None
+        return b"".join(event.payload for event in self._history if event.seq > seq and _wants(site_id, event))
+
+    def _resume(self, last_event_id: Optional[str], site_id: Optional[str]) -> Tuple[bytes, int]:
+        """Opening bytes of a stream and the sequence number it continues from; call with the lock held."""
+        preamble = f"retry: {RETRY_MS}\n".encode('ascii')
+        current = f"id: {self._event_id(self._seq)}\n\n".encode('ascii')
+        if not last_event_id:
+            # Empty event that only sets the client's Last-Event-ID
+            return preamble + current, self._seq
+        epoch, _, seq = last_event_id.partition('-')
+        missed = None
+        if epoch == self._epoch and seq.isdigit() and int(seq) <= self._seq:
+            missed = self._since(int(seq), site_id)
+        if missed is None:
+            reset = format_event(self._event_id(self._seq), "reset", {"reason": "events missed"})
+            return preamble + b"\n" + reset, self._seq
+        return preamble + b"\n" + missed, self._seq
+
+    def has_capacity(self) -> bool:
+        with self._lock:
+            return not self._closed and len(self._clients) + self._streams < self.max_clients
+
+    # Connections taken over from the HTTP server
+
+    def attach(self, sock: socket.socket, site_id: Optional[str] = None, last_event_id: Optional[str] = None,
+               headers: Iterable[Tuple[str, str]] = ()) -> None:
+        """Write the response head and serve the event stream on ``sock`` from the dispatcher thread."""
+        head = ["HTTP/1.1 200 OK", "Content-Type: text/event-stream", "Cache-Control: no-cache",
+                "Connection: close", "X-Accel-Buffering: no"]
+        head += [f"{name}: {value}" for name, value in headers]
+        sock.setblocking(False)
+        with self._lock:
+            if self._closed:
+                sock.close()
+                return
+            opening, _ = self._resume(last_event_id, site_id)
+            self._clients[sock] = _Client(sock, site_id, ("\r\n".join(head) + "\r\n\r\n").encode('latin-1') + opening)
+            if self._thread is None:
+                self._selector = selectors.DefaultSelector()
+                self._wake_r, self._wake_w = socket.socketpair()
+                self._wake_r.setblocking(False)
+                self._wake_w.setblocking(False)
+                self._selector.register(self._wake_r, selectors.EVENT_READ)
+                self._thread = threading.Thread(target=self._run, name="events", daemon=True)
+                self._thread.start()
+        self._wake()
+
+    def _wake(self) -> None:
+        if self._wake_w is not None:
+            try:
+                self._wake_w.send(b"\0")
+            except (BlockingIOError, OSError):
+                pass  # Already pending, or closing
+
+    def _drop(self, client: _Client) -> None:
+        """Forget a client; call with the lock held, from the dispatcher thread."""
+        self._clients.pop(client.sock, None)
+        if client.mask:
+            self._selector.unregister(client.sock)
+        client.sock.close()
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                if self._closed:
+                    for client in list(self._clients.values()):
+                        self._drop(client)
+                    break
+                now = time.monotonic()
+                for client in list(self._clients.values()):
+                    if len(client.buffer) > self.max_buffer:
+                        EVENTS_DROPPED_CLIENTS.inc()
+                        self._drop(client)
+                        continue
+                    if not client.buffer and now - client.last_write >= self.heartbeat:
+                        client.buffer += HEARTBEAT
+                    # Always readable-interested: the client closing shows up as EOF
+                    mask = selectors.EVENT_READ | (selectors.EVENT_WRITE if client.buffer else 0)
+                    if mask != client.mask:
+                        if client.mask:
+                            self._selector.modify(client.sock, mask, client)
+                        else:
+                            self._selector.register(client.sock, mask, client)
+                        client.mask = mask
+            ready = self._selector.select(timeout=min(self.heartbeat, 5.0))
+            with self._lock:
+                for key, mask in ready:
+                    if key.fileobj is self._wake_r:
+                        try:
+                            while self._wake_r.recv(4096):
+                                pass
+                        except BlockingIOError:
+                            pass
+                        continue
+                    client = key.data
+                    if client.sock not in self._clients:
+                        continue
+                    try:
+                        if mask & selectors.EVENT_READ and not client.sock.recv(4096):
+                            self._drop(client)
+                            continue
+                        if mask & selectors.EVENT_WRITE and client.buffer:
+                            sent = client.sock.send(client.buffer)
+                            del client.buffer[:sent]
+                            client.last_write = time.monotonic()
+                    except BlockingIOError:
+                        pass
+                    except OSError:
+                        self._drop(client)
+        self._selector.close()
+        self._wake_r.close()
+        self._wake_w.close()
+
+    # Fallback: stream as a WSGI response body
+
+    def stream(self, site_id: Optional[str] = None, last_event_id: Optional[str] = None) -> Iterator[bytes]:
+        """The event stream as a response body iterator; it holds a request thread while connected."""
+        with self._lock:
+            opening, seq = self._resume(last_event_id, site_id)
+            self._streams += 1
+        try:
+            yield opening
+            while True:
+                with self._cond:
+                    woken = self._cond.wait_for(lambda: self._seq > seq or self._closed, timeout=self.heartbeat)
+                    if self._closed:
+                        return
+                    chunk = self._since(seq, site_id)
+                    if chunk is None:
+                        chunk = format_event(self._event_id(self._seq), "reset", {"reason": "events missed"})
+                    seq = self._seq
+                if chunk:
+                    yield chunk
+                elif not woken:
+                    yield HEARTBEAT
+        finally:
+            with self._lock:
+                self._streams -= 1
+
+    def close(self) -> None:
+        """Disconnect every client; reconnecting clients resume from their Last-Event-ID."""
+        with self._lock:
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._thread
+        self._wake()
+        if thread is not None:
+            thread.join(timeout=5)
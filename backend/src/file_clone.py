@@ -0,0 +1,112 @@
+import errno
+import logging
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows; clones fall back to hardlinks or copies
+    fcntl = None
+
+logging.basicConfig(format='%(levelname)s:%(message)s', level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# _IOW(0x94, 9, int): share the source's extents with the destination (btrfs, XFS, bcachefs)
+FICLONE = 0x40049409
+# Errors meaning "this filesystem (pair) cannot do it", as opposed to real I/O failures
+_UNSUPPORTED = {errno.EOPNOTSUPP, errno.ENOTTY, errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EPERM}
+
+
+def reflink(source: Path, destination: Path) -> bool:
+    """Create ``destination`` as a copy-on-write clone of ``source``; False if unsupported."""
+    if fcntl is None:
+        return False
+    with open(source, 'rb') as src, open(destination, 'wb') as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED:
+                raise
+            cloned = False
+        else:
+            cloned = True
+    if not cloned:
+        os.unlink(destination)
+        return False
+    shutil.copystat(source, destination)
+    return True
+
+
+def clone_tree(source: Path, destination: Path,
+               skip: Optional[Callable[[Path], bool]] = None) -> Dict[str, int]:
+    """Recreate a directory tree sharing file data with ``source``; returns file counts per method.
+
+    Files are reflinked where the filesystem supports it, otherwise
+    hardlinked, otherwise copied. Hardlinked files share an inode, so code
+    writing to them must replace them (``atomic_write_bytes``) or call
+    ``break_hardlink`` before modifying them in place. Symlinks and paths
+    for which ``skip`` returns True are left out.
+    """
+    source, destination = Path(source), Path(destination)
+    counts = {"reflink": 0, "hardlink": 0, "copy": 0}
+    methods = ["reflink", "hardlink", "copy"]
+    for dirpath, dirnames, filenames in os.walk(source):
+        current = Path(dirpath)
+        target_dir = destination / current.relative_to(source)
+        target_dir.mkdir(parents=True, exist_ok=True)
+        dirnames[:] = [name for name in dirnames
+                       if not (current / name).is_symlink() and not (skip and skip(current / name))]
+        for name in filenames:
+            path = current / name
+            if path.is_symlink() or (skip and skip(path)):
+                continue
+            target = target_dir / name
+            # The first method that fails for lack of support is not tried again
+            while True:
+                method = methods[0]
+                if method == "reflink":
+                    if reflink(path, target):
+                        break
+                elif method == "hardlink":
+                    try:
+                        os.link(path, target)
+                        break
+                    except OSError as e:
+                        if e.errno not in _UNSUPPORTED and e.errno != errno.EMLINK:
+                            raise
+                else:
+                    shutil.copy2(path, target)
+                    break
+                methods.pop(0)
+            counts[method] += 1
+        shutil.copystat(current, target_dir)
+    return counts
+
+
+def break_hardlink(path: Path) -> bool:
+    """Give ``path`` a private copy of its data if other links share it; returns True if it did.
+
+    Call before appending to or rewriting a file in place that may have
+    been hardlinked by ``clone_tree``.
+    """
+    path = Path(path)
+    try:
+        if path.stat().st_nlink <= 1:
+            return False
+    except FileNotFoundError:
+        return False
+    temp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        if not reflink(path, temp_path):
+            shutil.copy2(path, temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            temp_path.unlink()
+        except FileNotFoundError:
+            pass
+        raise
+    return True
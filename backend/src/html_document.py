@@ -0,0 +1,189 @@
+import re
+from html.parser import HTMLParser
+from typing import Dict, Iterator, List, Optional, Tuple
+
+VOID_ELEMENTS = frozenset((
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link",
+    "meta", "param", "source", "track", "wbr",
+))
+
+
+class Element:
+    """An element located by character offsets into the original source.
+
+    Edits are made by splicing the source at these offsets, so everything
+    outside the edited ranges is preserved byte for byte.
+    """
+
+    __slots__ = ("tag", "attrs", "start", "start_tag_end", "end_tag_start", "end", "parent", "children")
+
+    def __init__(self, tag: str, attrs: Dict[str, str], start: int, start_tag_end: int,
+                 parent: Optional["Element"]):
+        self.tag = tag
+        self.attrs = attrs
+        self.start = start
+        self.start_tag_end = start_tag_end
+        self.end_tag_start = start_tag_end
+        self.end = start_tag_end
+        self.parent = parent
+        self.children: List["Element"] = []
+
+    @property
+    def id(self) -> Optional[str]:
+        return self.attrs.get("id")
+
+    @property
+    def classes(self) -> List[str]:
+        return (self.attrs.get("class") or "").split()
+
+    def start_tag(self, source: str) -> str:
+        return source[self.start:self.start_tag_end]
+
+    def inner_html(self, source: str) -> str:
+        return source[self.start_tag_end:self.end_tag_start]
+
+    def outer_html(self, source: str) -> str:
+        return source[self.start:self.end]
+
+    def iter(self) -> Iterator["Element"]:
+        yield self
+        for child in self.children:
+            yield from child.iter()
+
+    def __repr__(self):
+        return f"<Element {self.tag} {self.start}:{self.end}>"
+
+
+class _OffsetParser(HTMLParser):
+    def __init__(self, source: str):
+        super().__init__(convert_charrefs=False)
+        self.source = source
+        self.line_offsets = [0]
+        for match in re.finditer('\n', source):
+            self.line_offsets.append(match.end())
+        self.root = Element("#document", {}, 0, 0, None)
+        self.stack = [self.root]
+
+    def _offset(self) -> int:
+        line, column = self.getpos()
+        return self.line_offsets[line - 1] + column
+
+    def handle_starttag(self, tag, attrs):
+        start = self._offset()
+        start_tag_end = start + len(self.get_starttag_text())
+        parent = self.stack[-1]
+        element = Element(tag, {name: value or "" for name, value in attrs}, start, start_tag_end, parent)
+        parent.children.append(element)
+        if tag not in VOID_ELEMENTS:
+            self.stack.append(element)
+
+    def handle_startendtag(self, tag, attrs):
+        start = self._offset()
+        start_tag_end = start + len(self.get_starttag_text())
+        parent = self.stack[-1]
+        parent.children.append(Element(tag, {name: value or "" for name, value in attrs},
+                                       start, start_tag_end, parent))
+
+    def handle_endtag(self, tag):
+        start = self._offset()
+        end = self.source.find('>', start) + 1 or len(self.source)
+        if not any(element.tag == tag for element in self.stack[1:]):
+            return  # stray end tag
+        # Close implicitly ended elements (e.g. unclosed <p>) at this end tag
+        while self.stack[-1].tag != tag:
+            unclosed = self.stack.pop()
+            unclosed.end_tag_start = unclosed.end = start
+        element = self.stack.pop()
+        element.end_tag_start = start
+        element.end = end
+
+    def close(self):
+        super().close()
+        while len(self.stack) > 1:
+            unclosed = self.stack.pop()
+            unclosed.end_tag_start = unclosed.end = len(self.source)
+        self.root.end_tag_start = self.root.end = len(self.source)
+
+
+def parse(source: str) -> Element:
+    """Parse HTML into an Element tree rooted at a #document node."""
+    parser = _OffsetParser(source)
+    parser.feed(source)
+    parser.close()
+    return parser.root
+
+
+def splice(source: str, edits: List[Tuple[int, int, str]]) -> str:
+    """Apply non-overlapping (start, end, replacement) edits to the source."""
+    parts = []
+    position = len(source)
+    for start, end, replacement in sorted(edits, key=lambda edit: edit[0], reverse=True):
+        parts.append(source[end:position])
+        parts.append(replacement)
+        position = start
+    parts.append(source[:position])
+    return "".join(reversed(parts))
+
+
+_SIMPLE_SELECTOR = re.compile(r'([a-zA-Z][\w-]*|\*)?((?:[#.][\w-]+|\[[^\]]+\])*)$')
+_SELECTOR_PART = re.compile(r'([#.])([\w-]+)|\[\s*([\w-]+)\s*(?:=\s*["\']?([^"\'\]]*)["\']?)?\s*\]')
+
+
+def _compile_simple(selector: str):
+    match = _SIMPLE_SELECTOR.match(selector)
+    if not match:
+        raise ValueError(f"Unsupported selector: {selector}")
+    tag = match.group(1)
+    ids, classes, attrs = [], [], []
+    for part in _SELECTOR_PART.finditer(match.group(2)):
+        kind, name, attr, value = part.groups()
+        if kind == '#':
+            ids.append(name)
+        elif kind == '.':
+            classes.append(name)
+        else:
+            attrs.append((attr.lower(), value))
+
+    def matches(element: Element) -> bool:
+        if tag and tag != '*' and element.tag != tag.lower():
+            return False
+        if any(element.id != element_id for element_id in ids):
+            return False
+        element_classes = element.classes
+        if any(cls not in element_classes for cls in classes):
+            return False
+        for name, value in attrs:
+            if name not in element.attrs or (value is not None and element.attrs[name] != value):
+                return False
+        return True
+
+    return matches
+
+
+def select(root: Element, selector: str) -> List[Element]:
+    """Match a CSS selector in document order.
+
+    Supports compound selectors (tag, #id, .class, [attr], [attr=value]),
+    the descendant combinator and comma-separated groups.
+    """
+    results = []
+    seen = set()
+    for group in selector.split(','):
+        steps = [_compile_simple(part) for part in group.split()]
+        if not steps:
+            raise ValueError(f"Empty selector: {selector!r}")
+        for element in root.iter():
+            if element is root or not steps[-1](element):
+                continue
+            # Match the remaining steps against ancestors, right to left
+            ancestor = element.parent
+            remaining = steps[:-1]
+            while remaining and ancestor is not None and ancestor is not root:
+                if remaining[-1](ancestor):
+                    remaining = remaining[:-1]
+                ancestor = ancestor.parent
+            if not remaining and id(element) not in seen:
+                seen.add(id(element))
+                results.append(element)
+    results.sort(key=lambda element: element.start)
+    return results
@@ -0,0 +1,64 @@
+import hashlib
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Optional
+
+from bottle import HTTPError, HTTPResponse, request, response
+
+
+def etag_from_bytes(data: bytes) -> str:
+    return f'"{hashlib.sha1(data).hexdigest()}"'
+
+
+def _parse_etags(header: str):
+    return [tag.strip() for tag in header.split(',') if tag.strip()]
+
+
+def cache_headers(etag: str, mtime: Optional[float] = None) -> Dict[str, str]:
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if mtime is not None:
+        headers["Last-Modified"] = formatdate(mtime, usegmt=True)
+    return headers
+
+
+def check_not_modified(etag: str, mtime: Optional[float] = None) -> None:
+    """Set validator headers and raise a 304 when the client copy is current."""
+    headers = cache_headers(etag, mtime)
+    for name, value in headers.items():
+        response.set_header(name, value)
+
+    if_none_match = request.get_header('If-None-Match')
+    if if_none_match is not None:
+        tags = _parse_etags(if_none_match)
+        # Weak comparison is allowed for If-None-Match
+        if '*' in tags or etag in tags or f"W/{etag}" in tags:
+            raise HTTPResponse(status=304, headers=headers)
+        return
+
+    if_modified_since = request.get_header('If-Modified-Since')
+    if if_modified_since and mtime is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return
+        if int(mtime) <= since:
+            raise HTTPResponse(status=304, headers=headers)
+
+
+def check_precondition(current_etag: Optional[str]) -> Optional[str]:
+    """Validate If-Match against the current validator.
+
+    Returns the expected ETag (or None when the client sent no precondition)
+    and raises 412 when the resource has changed since the client read it.
+    """
+    if_match = request.get_header('If-Match')
+    if if_match is None:
+        return None
+
+    tags = _parse_etags(if_match)
+    if current_etag is None:
+        raise HTTPError(412, "Precondition failed: resource does not exist")
+    if '*' in tags:
+        return current_etag
+    if current_etag not in tags:
+        raise HTTPError(412, "Precondition failed: resource was modified")
+    return current_etag
@@ -0,0 +1,177 @@
+import base64
+import bisect
+import binascii
+import json
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+# Listings without a limit return every item, as they did before pagination
+MAX_LIMIT = 500
+
+# Sort keys accepted by the listing endpoints; values compare as strings, so
+# ISO timestamps sort chronologically and names case-insensitively
+SORT_KEYS = ("updated_at", "name", "created_at")
+
+
+def sort_value(item: Mapping, sort: str) -> str:
+    value = item.get(sort)
+    if isinstance(value, int):
+        return f"{value:012d}"
+    value = value or ""
+    return value.casefold() if sort == "name" else str(value)
+
+
+class ListingParams:
+    """Parsed ``sort``, ``order``, ``cursor``, ``limit`` and ``fields`` query parameters."""
+
+    def __init__(self, sort: str, descending: bool, after: Optional[Tuple[str, str]], limit: Optional[int],
+                 fields: Optional[List[str]]):
+        self.sort = sort
+        self.descending = descending
+        self.after = after
+        self.limit = limit
+        self.fields = fields
+
+    @classmethod
+    def parse(cls, query: Mapping[str, str], default_sort: str, default_order: str = "asc",
+              allowed_fields: Iterable[str] = (), sort_keys: Sequence[str] = SORT_KEYS) -> "ListingParams":
+        """Raises ValueError for unknown sort keys or fields and malformed cursors or limits."""
+        sort = query.get("sort") or default_sort
+        if sort not in sort_keys:
+            raise ValueError(f"sort must be one of {', '.join(sort_keys)}")
+        # default_order belongs to default_sort; other sorts default to ascending
+        order = query.get("order") or (default_order if sort == default_sort else "asc")
+        if order not in ("asc", "desc"):
+            raise ValueError("order must be asc or desc")
+        limit = None
+        if query.get("limit"):
+            try:
+                limit = min(MAX_LIMIT, max(1, int(query["limit"])))
+            except ValueError:
+                raise ValueError("limit must be an integer")
+
+        after = None
+        if query.get("cursor"):
+            cursor = decode_cursor(query["cursor"])
+            if cursor[:2] != [sort, order]:
+                raise ValueError("cursor was issued for a different sort order")
+            after = (cursor[2], cursor[3])
+
+        fields = None
+        if query.get("fields"):
+            fields = [field.strip() for field in query["fields"].split(',') if field.strip()]
+            unknown = set(fields) - set(allowed_fields)
+            if unknown:
+                raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+        return cls(sort, order == "desc", after, limit, fields)
+
+    def cursor_for(self, key: Tuple[str, str]) -> str:
+        return encode_cursor([self.sort, "desc" if self.descending else "asc", key[0], key[1]])
+
+
+def encode_cursor(values: List) -> str:
+    data = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> List:
+    try:
+        data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(data)
+    except (binascii.Error, ValueError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != 4 or not all(isinstance(v, str) for v in values):
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def project(item: Dict, fields: Optional[Sequence[str]]) -> Dict:
+    if fields is None:
+        return item
+    return {field: item.get(field) for field in fields}
+
+
+class SortedIndex:
+    """``(sort value, id)`` keys kept in order as items change, for keyset pagination.
+
+    Paging continues after the last key a client saw, so pages stay
+    consistent while items are added or removed between requests.
+    """
+
+    def __init__(self, key: Callable[[Mapping], str]):
+        self._key = key
+        self._keys: List[Tuple[str, str]] = []
+        self._by_id: Dict[str, Tuple[str, str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def update(self, item_id: str, item: Mapping) -> None:
+        key = (self._key(item), item_id)
+        if self._by_id.get(item_id) == key:
+            return
+        self.remove(item_id)
+        bisect.insort(self._keys, key)
+        self._by_id[item_id] = key
+
+    def extend(self, items: Mapping[str, Mapping]) -> None:
+        """Add many items with a single sort."""
+        for item_id, item in items.items():
+            self.remove(item_id)
+            self._by_id[item_id] = (self._key(item), item_id)
+            self._keys.append(self._by_id[item_id])
+        self._keys.sort()
+
+    def remove(self, item_id: str) -> None:
+        key = self._by_id.pop(item_id, None)
+        if key is not None:
+            i = bisect.bisect_left(self._keys, key)
+            if i < len(self._keys) and self._keys[i] == key:
+                del self._keys[i]
+
+    def page(self, after: Optional[Tuple[str, str]], limit: Optional[int],
+             descending: bool = False) -> Tuple[List[Tuple[str, str]], bool]:
+        """Up to ``limit`` (default: all) keys following ``after``, and whether more remain."""
+        if limit is None:
+            limit = len(self._keys)
+        if descending:
+            end = len(self._keys) if after is None else bisect.bisect_left(self._keys, tuple(after))
+            start = max(0, end - limit)
+            return self._keys[start:end][::-1], start > 0
+        start = 0 if after is None else bisect.bisect_right(self._keys, tuple(after))
+        return self._keys[start:start + limit], start + limit < len(self._keys)
+
+
+class SortedListing:
+    """Items by ID with a SortedIndex per sort key, for listings that change one item at a time.
+
+    Items are replaced, never modified in place, so the dicts page()
+    returns can be serialized without holding a lock. Not thread-safe.
+    """
+
+    def __init__(self, sort_keys: Sequence[str], items: Mapping[str, Dict]):
+        self._items: Dict[str, Dict] = dict(items)
+        self._indexes = {sort: SortedIndex(lambda item, sort=sort: sort_value(item, sort)) for sort in sort_keys}
+        for index in self._indexes.values():
+            index.extend(self._items)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, item_id: str) -> Optional[Dict]:
+        return self._items.get(item_id)
+
+    def update(self, item_id: str, item: Dict) -> None:
+        self._items[item_id] = item
+        for index in self._indexes.values():
+            index.update(item_id, item)
+
+    def remove(self, item_id: str) -> None:
+        self._items.pop(item_id, None)
+        for index in self._indexes.values():
+            index.remove(item_id)
+
+    def page(self, params: ListingParams) -> Tuple[List[Dict], Optional[str]]:
+        """One page per ``params``, projected; returns the items and the next cursor."""
+        keys, more = self._indexes[params.sort].page(params.after, params.limit, params.descending)
+        items = [project(self._items[key[1]], params.fields) for key in keys]
+        return items, params.cursor_for(keys[-1]) if more and keys else None
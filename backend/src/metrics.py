@@ -0,0 +1,256 @@
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+logging.basicConfig(format='%(levelname)s:%(message)s', level=logging.INFO)
+logger = logging.getLogger(__name__)
+# One key=value line per request; silence with logging.getLogger("access").setLevel(logging.WARNING)
+access_logger = logging.getLogger("access")
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict) -> Tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(_Metric):
+    """A value read from a callback at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, function: Callable[[], float]):
+        super().__init__(name, help_text)
+        self.function = function
+
+    def samples(self) -> List[str]:
+        try:
+            value = self.function()
+        except Exception:
+            logger.exception(f"Gauge {self.name} failed")
+            return []
+        return [f"{self.name} {_format_value(value)}"]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [per-bucket counts (+Inf last), sum]
+        self._values: Dict[Tuple, List] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels) -> int:
+        entry = self._values.get(self._key(labels))
+        return sum(entry[0]) if entry else 0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, (list(entry[0]), entry[1])) for key, entry in self._values.items())
+        lines = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            # Registering the same name again returns the existing metric
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help_text: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: Iterable[str] = (),
+                  buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def gauge(self, name: str, help_text: str, function: Callable[[], float]) -> Gauge:
+        with self._lock:
+            # Gauges are rebound so the latest owner's callback is reported
+            gauge = self._metrics[name] = Gauge(name, help_text, function)
+            return gauge
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            metrics = [self._metrics[name] for name in sorted(self._metrics)]
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds", "Time to produce a full response", ("method", "route", "status"))
+HTTP_REQUEST_BYTES = REGISTRY.counter(
+    "http_request_bytes_total", "Request body bytes received", ("method", "route"))
+HTTP_RESPONSE_BYTES = REGISTRY.counter(
+    "http_response_bytes_total", "Response body bytes sent", ("method", "route"))
+
+
+class _ClosingIterator:
+    """Counts response bytes and records the request once the body is sent."""
+
+    def __init__(self, iterable, finish: Callable[[int], None]):
+        self._iterable = iterable
+        self._iterator = iter(iterable)
+        self._finish = finish
+        self._sent = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        chunk = next(self._iterator)
+        self._sent += len(chunk)
+        return chunk
+
+    def close(self):
+        try:
+            if hasattr(self._iterable, 'close'):
+                self._iterable.close()
+        finally:
+            self._finish(self._sent)
+
+
+class MetricsMiddleware:
+    """WSGI middleware recording latency and body sizes per matched route.
+
+    Routes are labelled by their rule (e.g. ``/api/v1/sites/<site_id>``),
+    which Bottle stores in ``environ['bottle.route']``, so label
+    cardinality stays bounded.
+    """
+
+    def __init__(self, app, registry: MetricsRegistry = REGISTRY):
+        self.app = app
+        self.request_seconds = registry.get("http_request_duration_seconds") or HTTP_REQUEST_SECONDS
+        self.request_bytes = registry.get("http_request_bytes_total") or HTTP_REQUEST_BYTES
+        self.response_bytes = registry.get("http_response_bytes_total") or HTTP_RESPONSE_BYTES
+
+    def __call__(self, environ, start_response):
+        started = time.perf_counter()
+        status_holder = []
+        # Read before inner middleware (e.g. request decompression) rewrites it, so this is the wire size
+        try:
+            received = int(environ.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            received = 0
+
+        def recording_start_response(status, headers, exc_info=None):
+            status_holder[:] = [status.split(' ', 1)[0]]
+            return start_response(status, headers, exc_info)
+
+        def finish(sent: int) -> None:
+            elapsed = time.perf_counter() - started
+            route = environ.get('bottle.route')
+            rule = route.rule if route is not None else "unmatched"
+            method = environ.get('REQUEST_METHOD', '')
+            status = status_holder[0] if status_holder else "000"
+            self.request_seconds.observe(elapsed, method=method, route=rule, status=status)
+            self.request_bytes.inc(received, method=method, route=rule)
+            self.response_bytes.inc(sent, method=method, route=rule)
+            access_logger.info(f"method={method} path={environ.get('PATH_INFO', '')} route={rule} "
+                               f"status={status} ms={elapsed * 1000:.1f} in={received} out={sent}")
+
+        try:
+            result = self.app(environ, recording_start_response)
+        except Exception:
+            status_holder[:] = ["500"]
+            finish(0)
+            raise
+        return _ClosingIterator(result, finish)
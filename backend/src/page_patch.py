@@ -0,0 +1,128 @@
+import html
+from typing import Dict, List, Optional, Tuple
+
+import html_document
+from render_engine import RenderEngine
+
+MAX_OPERATIONS = 100
+OPERATIONS = ("insert_component", "replace_content", "remove")
+
+
+class PatchError(ValueError):
+    """An operation is malformed or refers to something that does not exist."""
+
+
+def split_target(target: str) -> Tuple[str, str]:
+    """Split a component target such as ``main#main-article:child`` into selector and position."""
+    selector, _, position = target.partition(':')
+    return selector.strip(), position.strip() or "before"
+
+
+def _find(root: html_document.Element, selector: str, index: int) -> html_document.Element:
+    try:
+        matches = html_document.select(root, selector)
+    except ValueError as e:
+        raise PatchError(str(e))
+    if not -len(matches) <= index < len(matches):
+        raise PatchError(f"Selector {selector!r} matched {len(matches)} elements, no index {index}")
+    return matches[index]
+
+
+def _line_indent(source: str, offset: int) -> Tuple[int, Optional[str]]:
+    line_start = source.rfind('\n', 0, offset) + 1
+    prefix = source[line_start:offset]
+    return line_start, prefix if prefix.strip() == "" else None
+
+
+def _indent(markup: str, indent: str) -> str:
+    return "\n".join(indent + line if line.strip() else line for line in markup.split("\n"))
+
+
+def _insert(source: str, element: html_document.Element, position: str, markup: str) -> str:
+    if position == "child":
+        # Append as the last child, indented one level deeper than the closing tag
+        line_start, indent = _line_indent(source, element.end_tag_start)
+        if indent is not None and line_start > element.start_tag_end:
+            return html_document.splice(source, [(line_start, line_start, _indent(markup, indent + "  ") + "\n")])
+        return html_document.splice(source, [(element.end_tag_start, element.end_tag_start, markup)])
+    if position == "before":
+        line_start, indent = _line_indent(source, element.start)
+        if indent is not None:
+            return html_document.splice(source, [(line_start, line_start, _indent(markup, indent) + "\n")])
+        return html_document.splice(source, [(element.start, element.start, markup)])
+    raise PatchError(f"Unsupported target position: {position}")
+
+
+def _remove(source: str, element: html_document.Element) -> str:
+    start, end = element.start, element.end
+    # Remove the whole line when the element is the only thing on it
+    line_start, indent = _line_indent(source, start)
+    if indent is not None and source[end:end + 1] == '\n':
+        start, end = line_start, end + 1
+    return html_document.splice(source, [(start, end, "")])
+
+
+def _index(operation: Dict) -> int:
+    index = operation.get("index", 0)
+    if not isinstance(index, int) or isinstance(index, bool):
+        raise PatchError("index must be an integer")
+    return index
+
+
+def apply_operation(source: str, operation: Dict, engine: RenderEngine) -> str:
+    if not isinstance(operation, dict):
+        raise PatchError("Each operation must be an object")
+    op = operation.get("op")
+    root = html_document.parse(source)
+
+    if op == "insert_component":
+        component = engine.catalog.get(str(operation.get("component", "")))
+        if component is None:
+            raise PatchError(f"Unknown component: {operation.get('component')}")
+        target = operation.get("target") or component["target"]
+        if not target:
+            raise PatchError(f"Component {component['id']} has no target; pass one explicitly")
+        params = operation.get("params") or {}
+        if not isinstance(params, dict):
+            raise PatchError("params must be an object")
+        try:
+            markup = engine.render_component(component["id"], params)
+        except ValueError as e:
+            raise PatchError(str(e))
+        selector, position = split_target(target)
+        return _insert(source, _find(root, selector, _index(operation)), position, markup)
+
+    if op == "replace_content":
+        element = _find(root, str(operation.get("selector", "")), _index(operation))
+        if "html" in operation:
+            content = str(operation["html"])
+        elif "text" in operation:
+            content = html.escape(str(operation["text"]), quote=False)
+        else:
+            raise PatchError("replace_content needs html or text")
+        return html_document.splice(source, [(element.start_tag_end, element.end_tag_start, content)])
+
+    if op == "remove":
+        element = _find(root, str(operation.get("selector", "")), _index(operation))
+        if element.tag in ("html", "head", "body"):
+            raise PatchError(f"Refusing to remove <{element.tag}>")
+        return _remove(source, element)
+
+    raise PatchError(f"Unknown operation {op!r}; expected one of {', '.join(OPERATIONS)}")
+
+
+def apply_operations(source: str, operations: List[Dict], engine: RenderEngine) -> str:
+    """Apply PATCH operations in order; all of them succeed or PatchError is raised.
+
+    Operations:
+      {"op": "insert_component", "component": id, "target"?: "sel:child", "index"?: n, "params"?: {...}}
+      {"op": "replace_content", "selector": sel, "index"?: n, "html" | "text": value}
+      {"op": "remove", "selector": sel, "index"?: n}
+    """
+    if not isinstance(operations, list) or not operations:
+        raise PatchError("operations must be a non-empty list")
+    if len(operations) > MAX_OPERATIONS:
+        raise PatchError(f"At most {MAX_OPERATIONS} operations per request")
+    for operation in operations:
+        source = apply_operation(source, operation, engine)
+    return source
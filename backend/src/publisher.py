@@ -0,0 +1,286 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import html_document
+from asset_optimizer import AssetOptimizer, write_precompressed
+from site_manager import SiteManager, atomic_write_bytes, atomic_write_text
+
+logging.basicConfig(format='%(levelname)s:%(message)s', level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Bump when the output format changes so every page is rebuilt once
+PUBLISHER_VERSION = 2
+MANIFEST_NAME = "build-manifest.json"
+
+# Editor-only resources and DOM added by page_mod_scripts.js
+EDITOR_SCRIPTS = ("page_mod_scripts.js",)
+EDITOR_STYLESHEETS = ("editor.css", "easymde.min.css")
+EDITOR_ELEMENT_CLASSES = frozenset(("component-insertion-button", "component-edit-button",
+                                    "component-selection-modal"))
+EDITOR_ATTRIBUTES = ("data-markdown",)
+
+
+def _is_editor_class(cls: str) -> bool:
+    return cls == "editable" or cls.startswith("editable-")
+
+
+def _drop_range(source: str, start: int, end: int) -> tuple:
+    # Remove the whole line when the element is the only thing on it
+    line_start = source.rfind('\n', 0, start) + 1
+    if source[line_start:start].strip() == "" and source[end:end + 1] == '\n':
+        return (line_start, end + 1, "")
+    return (start, end, "")
+
+
+def _clean_start_tag(tag_text: str, element: html_document.Element) -> Optional[str]:
+    """Rewrite editor-only classes/attributes out of a start tag, or None if clean."""
+    classes = element.classes
+    kept = [cls for cls in classes if not _is_editor_class(cls)]
+    dirty_attrs = [name for name in EDITOR_ATTRIBUTES if name in element.attrs]
+    if len(kept) == len(classes) and not dirty_attrs:
+        return None
+
+    if len(kept) != len(classes):
+        class_attr = re.compile(r'\sclass\s*=\s*("[^"]*"|\'[^\']*\'|[^\s>]+)', re.IGNORECASE)
+        replacement = f' class="{" ".join(kept)}"' if kept else ""
+        tag_text = class_attr.sub(lambda _: replacement, tag_text, count=1)
+    for name in dirty_attrs:
+        tag_text = re.sub(r'\s' + re.escape(name) + r'(\s*=\s*("[^"]*"|\'[^\']*\'|[^\s>]+))?', "",
+                          tag_text, count=1, flags=re.IGNORECASE)
+    return tag_text
+
+
+def strip_editor_artifacts(source: str) -> str:
+    """Turn an editor page into production HTML.
+
+    Removes the editor script and stylesheets, insertion/edit buttons left in
+    the DOM and the editable-* marker classes. Everything else is kept as is.
+    """
+    root = html_document.parse(source)
+    edits = []
+
+    def visit(element: html_document.Element):
+        for child in element.children:
+            src = child.attrs.get("src", "")
+            href = child.attrs.get("href", "")
+            if (child.tag == "script" and src.endswith(EDITOR_SCRIPTS)) or \
+                    (child.tag == "link" and href.endswith(EDITOR_STYLESHEETS)) or \
+                    EDITOR_ELEMENT_CLASSES.intersection(child.classes):
+                edits.append(_drop_range(source, child.start, child.end))
+                continue
+            cleaned = _clean_start_tag(child.start_tag(source), child)
+            if cleaned is not None:
+                edits.append((child.start, child.start_tag_end, cleaned))
+            visit(child)
+
+    visit(root)
+    return html_document.splice(source, edits)
+
+
+class SitePublisher:
+    """Builds production HTML for a site from its editor pages.
+
+    A build manifest records a hash of each page's sources; pages whose
+    sources are unchanged since the last build are skipped, and the stat()
+    signature stored alongside lets unchanged pages skip even the hashing.
+    """
+
+    def __init__(self, site_manager: SiteManager, workers: Optional[int] = None, optimize: bool = True):
+        self.site_manager = site_manager
+        self.workers = workers or min(8, (os.cpu_count() or 1) + 2)
+        # Minify, fingerprint and precompress output (see asset_optimizer)
+        self.optimize = optimize
+        self._publish_locks: Dict[str, threading.Lock] = {}
+        self._publish_locks_lock = threading.Lock()
+
+    def get_manifest_path(self, site_id: str) -> Path:
+        return self.site_manager.get_site_path(site_id) / MANIFEST_NAME
+
+    def load_manifest(self, site_id: str) -> Dict:
+        try:
+            with self.get_manifest_path(site_id).open('r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get("version") == PUBLISHER_VERSION:
+                return manifest
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+        return {"version": PUBLISHER_VERSION, "pages": {}}
+
+    def save_manifest(self, site_id: str, manifest: Dict) -> None:
+        atomic_write_text(self.get_manifest_path(site_id), json.dumps(manifest, indent=2))
+
+    def _page_sources(self, site_id: str, page_id: str) -> List[Path]:
+        editor_path = self.site_manager.get_site_editor_path(site_id)
+        return [editor_path / f"{page_id}.html", editor_path / f"{page_id}.css"]
+
+    @staticmethod
+    def _signature(paths: List[Path]) -> List:
+        signature = []
+        for path in paths:
+            try:
+                stat = path.stat()
+                signature.append([stat.st_mtime_ns, stat.st_size])
+            except FileNotFoundError:
+                signature.append(None)
+        return signature
+
+    @staticmethod
+    def _hash(paths: List[Path]) -> str:
+        digest = hashlib.sha256(str(PUBLISHER_VERSION).encode())
+        for path in paths:
+            digest.update(path.name.encode())
+            try:
+                digest.update(path.read_bytes())
+            except FileNotFoundError:
+                digest.update(b"\0missing")
+        return digest.hexdigest()
+
+    def _dependencies_unchanged(self, site_path: Path, previous: Dict) -> bool:
+        return all(self._signature([site_path / source])[0] == signature
+                   for source, signature in previous.get("dependencies", {}).items())
+
+    def _build_page(self, site_id: str, page_id: str, previous: Optional[Dict], force: bool,
+                    optimizer: Optional[AssetOptimizer]) -> Dict:
+        sources = self._page_sources(site_id, page_id)
+        signature = self._signature(sources)
+        site_path = self.site_manager.get_site_path(site_id)
+        if previous and not all((site_path / output).exists() for output in previous.get("outputs", [])):
+            previous = None
+        if previous and (force or not self._dependencies_unchanged(site_path, previous)):
+            previous = dict(previous, source_hash=None)
+        if previous and previous.get("signature") == signature and previous.get("source_hash"):
+            return dict(previous, status="skipped")
+
+        source_hash = self._hash(sources)
+        if previous and previous.get("source_hash") == source_hash:
+            return dict(previous, signature=signature, status="skipped")
+
+        html_source, css_source = sources
+        with html_source.open('r', encoding='utf-8') as f:
+            content = strip_editor_artifacts(f.read())
+
+        page_path = self.site_manager.get_page_path(site_id, page_id)
+        entry = {"source_hash": source_hash, "signature": signature, "status": "published"}
+        if optimizer is not None:
+            content, assets = optimizer.optimize_page(content, html_source.parent)
+            data = content.encode('utf-8')
+            # Outputs can be rebuilt, so they are swapped in atomically but not fsynced
+            atomic_write_bytes(page_path, data, fsync=False)
+            outputs = [page_path.name] + [path.name for path in write_precompressed(page_path, data)]
+            entry["assets"] = sorted(set(assets.values()))
+            entry["dependencies"] = {source: self._signature([site_path / source])[0] for source in assets}
+        else:
+            outputs = [page_path.name]
+            atomic_write_text(page_path, content, fsync=False)
+            if css_source.exists():
+                atomic_write_bytes(site_path / css_source.name, css_source.read_bytes(), fsync=False)
+                outputs.append(css_source.name)
+
+        # Drop outputs of the previous build that this one no longer produces
+        for output in set((previous or {}).get("outputs", [])) - set(outputs):
+            try:
+                (site_path / output).unlink()
+            except FileNotFoundError:
+                pass
+
+        entry["outputs"] = outputs
+        return entry
+
+    def publish_lock(self, site_id: str) -> threading.Lock:
+        """Lock serialising publishes of one site.
+
+        Concurrent runs would race on the manifest, and one run's garbage
+        collection could delete assets the other just wrote. Editor saves
+        do not take it, so they are not held up by a publish.
+        """
+        with self._publish_locks_lock:
+            lock = self._publish_locks.get(site_id)
+            if lock is None:
+                lock = self._publish_locks[site_id] = threading.Lock()
+            return lock
+
+    def publish_site(self, site_id: str, force: bool = False) -> Optional[Dict]:
+        with self.publish_lock(site_id):
+            return self._publish_site(site_id, force)
+
+    def _publish_site(self, site_id: str, force: bool) -> Optional[Dict]:
+        started = time.perf_counter()
+        page_ids = self.site_manager.list_page_ids(site_id)
+        if page_ids is None:
+            return None
+
+        manifest = self.load_manifest(site_id)
+        previous_pages = manifest.get("pages", {})
+        site_path = self.site_manager.get_site_path(site_id)
+        optimizer = AssetOptimizer(site_path) if self.optimize else None
+
+        # Pages are independent, so they are checked and rendered in parallel
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {page_id: executor.submit(self._build_page, site_id, page_id,
+                                                previous_pages.get(page_id), force, optimizer)
+                       for page_id in page_ids}
+            results = {page_id: future.result() for page_id, future in futures.items()}
+
+        # Remove output of pages that no longer exist
+        removed = []
+        for page_id, entry in previous_pages.items():
+            if page_id in results:
+                continue
+            for output in entry.get("outputs", []):
+                try:
+                    (site_path / output).unlink()
+                except FileNotFoundError:
+                    pass
+            removed.append(page_id)
+
+        pages = {}
+        for page_id, result in results.items():
+            pages[page_id] = {key: value for key, value in result.items() if key != "status"}
+        if pages != previous_pages:
+            self.save_manifest(site_id, {"version": PUBLISHER_VERSION, "pages": pages})
+
+        # Fingerprinted assets are shared between pages; delete the unreferenced ones
+        if optimizer is not None and (removed or any(r["status"] == "published" for r in results.values())):
+            optimizer.collect_garbage([asset for entry in pages.values() for asset in entry.get("assets", [])])
+
+        return {
+            "site_id": site_id,
+            "published": [page_id for page_id, result in results.items() if result["status"] == "published"],
+            "skipped": [page_id for page_id, result in results.items() if result["status"] == "skipped"],
+            "removed": removed,
+            "seconds": time.perf_counter() - started
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Publish editor pages as production HTML")
+    parser.add_argument("site_ids", nargs="*", help="Sites to publish (default: all sites)")
+    parser.add_argument("--sites-dir", default="../sites", help="Sites directory")
+    parser.add_argument("--force", action="store_true", help="Rebuild pages even if unchanged")
+    parser.add_argument("--workers", type=int, default=None, help="Pages rendered in parallel")
+    parser.add_argument("--no-optimize", action="store_true",
+                        help="Skip minification, fingerprinting and precompression")
+    args = parser.parse_args()
+
+    publisher = SitePublisher(SiteManager(args.sites_dir), workers=args.workers, optimize=not args.no_optimize)
+    site_ids = args.site_ids or [site["id"] for site in publisher.site_manager.list_sites()]
+    for site_id in site_ids:
+        result = publisher.publish_site(site_id, force=args.force)
+        if result is None:
+            logger.error(f"Site not found: {site_id}")
+            continue
+        logger.info(f"{site_id}: published {len(result['published'])}, skipped {len(result['skipped'])}, "
+                    f"removed {len(result['removed'])} in {result['seconds'] * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
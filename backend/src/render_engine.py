@@ -0,0 +1,207 @@
+import html
+import logging
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+from component_catalog import DIRECTIVE_PATTERN, PARAM_PATTERN, PLACEHOLDER_PATTERN, ComponentCatalog
+from metrics import REGISTRY
+
+logging.basicConfig(format='%(levelname)s:%(message)s', level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TEMPLATE_NAME_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+# Substituted into every page template by create_page, declared or not
+TEMPLATE_PARAMS = ("PAGE_ID",)
+MAX_BATCH = 200
+
+RENDER_COMPILES = REGISTRY.counter("render_compiles_total", "Templates and components compiled", ("kind",))
+RENDER_BATCH_SECONDS = REGISTRY.histogram("render_batch_seconds", "Time spent rendering a batch")
+
+
+class MissingParameters(ValueError):
+    def __init__(self, name: str, missing: List[str]):
+        super().__init__(f"Missing parameters for {name}: {', '.join(missing)}")
+        self.missing = missing
+
+
+class Renderer:
+    """A template or component compiled to literal chunks and parameter slots.
+
+    Rendering joins the chunks with the escaped parameter values, so the
+    source is scanned once, at compile time. Every declared parameter must
+    be given a value; placeholders that are not declared parameters (such
+    as JavaScript template literals) are kept as literal text, as before.
+    """
+
+    __slots__ = ("name", "params", "_chunks", "_slots")
+
+    def __init__(self, name: str, source: str, params: Iterable[str]):
+        self.name = name
+        self.params: Tuple[str, ...] = tuple(dict.fromkeys(params))
+        declared = set(self.params)
+        self._chunks: List[str] = []
+        self._slots: List[str] = []
+        position = 0
+        for match in PLACEHOLDER_PATTERN.finditer(source):
+            if match.group(1) not in declared:
+                continue
+            self._chunks.append(source[position:match.start()])
+            self._slots.append(match.group(1))
+            position = match.end()
+        self._chunks.append(source[position:])
+
+    def validate(self, params: Optional[Mapping]) -> Dict[str, str]:
+        """Raises ValueError for unknown parameters and non-scalar values, MissingParameters for absent ones."""
+        params = params or {}
+        if not isinstance(params, Mapping):
+            raise ValueError("params must be an object")
+        unknown = [name for name in params if name not in self.params]
+        if unknown:
+            raise ValueError(f"Unknown parameters for {self.name}: {', '.join(map(str, unknown))}")
+        values = {}
+        for name, value in params.items():
+            if isinstance(value, bool) or not (value is None or isinstance(value, (str, int, float))):
+                raise ValueError(f"Parameter {name} of {self.name} must be a string or number")
+            if value is None or not str(value).strip():
+                continue
+            # Values usually land in attributes
+            values[name] = html.escape(str(value), quote=True)
+        missing = [name for name in self.params if name not in values]
+        if missing:
+            raise MissingParameters(self.name, missing)
+        return values
+
+    def render(self, params: Optional[Mapping] = None) -> str:
+        values = self.validate(params)
+        parts = [self._chunks[0]]
+        for slot, chunk in zip(self._slots, self._chunks[1:]):
+            parts.append(values[slot])
+            parts.append(chunk)
+        return "".join(parts)
+
+
+def compile_component(component: Dict) -> Renderer:
+    content = DIRECTIVE_PATTERN.sub('', component['content']).strip()
+    return Renderer(component['id'], content, component['params'])
+
+
+def compile_template(name: str, source: str) -> Renderer:
+    """Templates take PAGE_ID plus the names they declare with ``<!-- @param NAME -->``."""
+    declared = PARAM_PATTERN.findall(source)
+    if declared:
+        source = DIRECTIVE_PATTERN.sub('', source)
+    return Renderer(name, source, TEMPLATE_PARAMS + tuple(declared))
+
+
+class RenderEngine:
+    """Compiled, cached renderers for a builder's page templates and components.
+
+    Templates (``templates/<name>.html``) are compiled on first use and
+    recompiled when the file's mtime or size changes, checked at most every
+    ``refresh_interval`` seconds. Components come from ``catalog``, which
+    re-parses changed XML files; each parsed component is compiled once.
+    """
+
+    _instances: Dict[Path, "RenderEngine"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, builder_dir: Path, catalog: Optional[ComponentCatalog] = None,
+                 refresh_interval: float = 1.0):
+        self.builder_dir = Path(builder_dir)
+        self.templates_dir = self.builder_dir / "templates"
+        self.catalog = catalog or ComponentCatalog(self.builder_dir, refresh_interval)
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        # name -> (file signature, last checked, renderer)
+        self._templates: Dict[str, Tuple[Tuple[int, int], float, Renderer]] = {}
+        # component id -> (parsed component it was compiled from, renderer)
+        self._components: Dict[str, Tuple[Dict, Renderer]] = {}
+
+    @classmethod
+    def for_directory(cls, builder_dir: Path) -> "RenderEngine":
+        key = Path(builder_dir).resolve()
+        with cls._instances_lock:
+            engine = cls._instances.get(key)
+            if engine is None:
+                engine = cls._instances[key] = cls(builder_dir)
+            return engine
+
+    def template(self, name: str) -> Renderer:
+        """Raises KeyError for unknown or invalid template names."""
+        if not TEMPLATE_NAME_PATTERN.match(name or ""):
+            raise KeyError(name)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._templates.get(name)
+            if cached and now - cached[1] < self.refresh_interval:
+                return cached[2]
+            path = self.templates_dir / f"{name}.html"
+            try:
+                stat = os.stat(path)
+            except OSError:
+                self._templates.pop(name, None)
+                raise KeyError(name)
+            signature = (stat.st_mtime_ns, stat.st_size)
+            if cached and cached[0] == signature:
+                self._templates[name] = (signature, now, cached[2])
+                return cached[2]
+            renderer = compile_template(name, path.read_text(encoding='utf-8'))
+            RENDER_COMPILES.inc(kind="template")
+            self._templates[name] = (signature, now, renderer)
+            return renderer
+
+    def component(self, component_id: str) -> Renderer:
+        """Raises KeyError for unknown components."""
+        component = self.catalog.get(component_id)
+        if component is None:
+            raise KeyError(component_id)
+        with self._lock:
+            cached = self._components.get(component_id)
+            # The catalog replaces a component's dict when its file changes
+            if cached and cached[0] is component:
+                return cached[1]
+            renderer = compile_component(component)
+            RENDER_COMPILES.inc(kind="component")
+            self._components[component_id] = (component, renderer)
+            return renderer
+
+    def render_template(self, name: str, params: Optional[Mapping] = None) -> str:
+        return self.template(name).render(params)
+
+    def render_component(self, component_id: str, params: Optional[Mapping] = None) -> str:
+        return self.component(component_id).render(params)
+
+    def render_batch(self, items: List[Dict]) -> List[Dict]:
+        """Render ``{"template" | "component": name, "params"?: {...}}`` items.
+
+        Each result is ``{"html": ...}`` or ``{"error": ...}`` (with
+        ``"missing"`` listing absent parameters), in order, so one bad item
+        does not fail the batch. Raises ValueError if ``items``
+        is not a list of at most MAX_BATCH objects.
+        """
+        if not isinstance(items, list):
+            raise ValueError("items must be a list")
+        if len(items) > MAX_BATCH:
+            raise ValueError(f"At most {MAX_BATCH} items per batch")
+        results = []
+        with RENDER_BATCH_SECONDS.time():
+            for item in items:
+                if not isinstance(item, dict) or ("template" in item) == ("component" in item):
+                    results.append({"error": "Each item needs either template or component"})
+                    continue
+                kind = "template" if "template" in item else "component"
+                name = str(item[kind])
+                try:
+                    renderer = self.template(name) if kind == "template" else self.component(name)
+                    results.append({"html": renderer.render(item.get("params"))})
+                except KeyError:
+                    results.append({"error": f"Unknown {kind}: {name}"})
+                except MissingParameters as e:
+                    results.append({"error": str(e), "missing": e.missing})
+                except ValueError as e:
+                    results.append({"error": str(e)})
+        return results
@@ -0,0 +1,241 @@
+import difflib
+import hashlib
+import json
+import logging
+import re
+import shutil
+import threading
+import zlib
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from file_clone import break_hardlink
+
+logging.basicConfig(format='%(levelname)s:%(message)s', level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+REVISIONS_DIRNAME = "revisions"
+INDEX_NAME = "index.jsonl"
+PACK_NAME = "data.pack"
+# Page IDs are also file names under editor/ and revisions/
+PAGE_ID_PATTERN = re.compile(r'^[a-z0-9][a-z0-9_-]{0,63}$')
+
+
+class InvalidPageId(ValueError):
+    pass
+
+
+def check_page_id(page_id: str) -> str:
+    """Return ``page_id``, or raise InvalidPageId if it is not a safe file name."""
+    if not isinstance(page_id, str) or not PAGE_ID_PATTERN.match(page_id):
+        raise InvalidPageId(f"Invalid page ID: {page_id!r}")
+    return page_id
+
+
+def make_delta(base: List[str], target: List[str]) -> List:
+    """Encode target lines as copies of base line ranges plus inserted lines."""
+    ops = []
+    matcher = difflib.SequenceMatcher(None, base, target)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            ops.append([i1, i2])
+        elif j1 != j2:
+            # 'replace' and 'insert'; 'delete' needs no op at all
+            ops.append("".join(target[j1:j2]))
+    return ops
+
+
+def novel_length(base: List[str], target: List[str]) -> int:
+    """Characters of target lines that occur nowhere in base, a lower bound on a delta's inserts."""
+    available = Counter(base)
+    novel = 0
+    for line in target:
+        if available[line] > 0:
+            available[line] -= 1
+        else:
+            novel += len(line)
+    return novel
+
+
+def apply_delta(base: List[str], ops: List) -> str:
+    parts = []
+    for op in ops:
+        if isinstance(op, str):
+            parts.append(op)
+        else:
+            parts.extend(base[op[0]:op[1]])
+    return "".join(parts)
+
+
+class _PageHistory:
+    __slots__ = ("entries", "index_size", "snapshot")
+
+    def __init__(self):
+        self.entries: List[Dict] = []
+        self.index_size = 0
+        # (revision, lines) of the most recently decoded snapshot
+        self.snapshot: Optional[Tuple[int, List[str]]] = None
+
+
+class RevisionStore:
+    """Per-page revision history for one site.
+
+    Revisions are zlib-compressed blobs appended to ``revisions/<page>/data.pack``
+    and described by an append-only ``index.jsonl``. Every revision is either
+    a full snapshot or a line delta against the latest snapshot (never a
+    chain of deltas), so reading any revision costs at most one snapshot
+    decode and one delta application. A new snapshot is taken every
+    ``snapshot_interval`` revisions or once the delta grows past
+    ``max_delta_ratio`` of the page size.
+    """
+
+    def __init__(self, site_path: Path, snapshot_interval: int = 50, max_delta_ratio: float = 0.5):
+        self.root = Path(site_path) / REVISIONS_DIRNAME
+        self.snapshot_interval = snapshot_interval
+        self.max_delta_ratio = max_delta_ratio
+        self._lock = threading.RLock()
+        self._histories: Dict[str, _PageHistory] = {}
+
+    def _page_dir(self, page_id: str) -> Path:
+        """Raises InvalidPageId for IDs that could name a path outside ``root``."""
+        return self.root / check_page_id(page_id)
+
+    def _history(self, page_id: str) -> _PageHistory:
+        """Load the page's index, reading only lines appended since the last call."""
+        index_path = self._page_dir(page_id) / INDEX_NAME
+        history = self._histories.setdefault(page_id, _PageHistory())
+        try:
+            size = index_path.stat().st_size
+        except FileNotFoundError:
+            self._histories[page_id] = history = _PageHistory()
+            return history
+        if size < history.index_size:
+            # Rewritten underneath us (e.g. restored from an archive)
+            self._histories[page_id] = history = _PageHistory()
+        if size == history.index_size:
+            return history
+
+        with index_path.open('rb') as f:
+            f.seek(history.index_size)
+            data = f.read(size - history.index_size)
+        consumed = data.rfind(b'\n') + 1
+        for line in data[:consumed].splitlines():
+            try:
+                history.entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                logger.warning(f"Skipping corrupt revision index line in {index_path}")
+        history.index_size += consumed
+        return history
+
+    def _read_blob(self, page_id: str, entry: Dict) -> bytes:
+        with (self._page_dir(page_id) / PACK_NAME).open('rb') as f:
+            f.seek(entry["offset"])
+            return zlib.decompress(f.read(entry["length"]))
+
+    def _snapshot_lines(self, page_id: str, history: _PageHistory, revision: int) -> List[str]:
+        if history.snapshot and history.snapshot[0] == revision:
+            return history.snapshot[1]
+        entry = history.entries[revision - 1]
+        lines = self._read_blob(page_id, entry).decode('utf-8').splitlines(keepends=True)
+        history.snapshot = (revision, lines)
+        return lines
+
+    def record(self, page_id: str, content: str) -> Optional[Dict]:
+        """Append a revision; returns its metadata, or None if content is unchanged."""
+        data = content.encode('utf-8')
+        sha256 = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            history = self._history(page_id)
+            entries = history.entries
+            if entries and entries[-1]["sha256"] == sha256:
+                return None
+
+            revision = len(entries) + 1
+            entry = {
+                "revision": revision,
+                "created_at": datetime.now().isoformat(),
+                "size": len(data),
+                "sha256": sha256,
+                "base": revision
+            }
+            blob = None
+            base = entries[-1]["base"] if entries else None
+            if base is not None and revision - base < self.snapshot_interval:
+                base_lines = self._snapshot_lines(page_id, history, base)
+                lines = content.splitlines(keepends=True)
+                # SequenceMatcher is quadratic on mostly-rewritten pages; skip it when the
+                # delta cannot come in under the ratio anyway
+                if novel_length(base_lines, lines) <= len(content) * self.max_delta_ratio:
+                    ops = make_delta(base_lines, lines)
+                    encoded = json.dumps(ops, separators=(',', ':')).encode('utf-8')
+                    if len(encoded) <= len(data) * self.max_delta_ratio:
+                        blob = zlib.compress(encoded, 6)
+                        entry["base"] = base
+            if blob is None:
+                blob = zlib.compress(data, 6)
+
+            page_dir = self._page_dir(page_id)
+            page_dir.mkdir(parents=True, exist_ok=True)
+            # A cloned site shares these files with its source until the first append
+            break_hardlink(page_dir / PACK_NAME)
+            break_hardlink(page_dir / INDEX_NAME)
+            with (page_dir / PACK_NAME).open('ab') as f:
+                entry["offset"] = f.tell()
+                entry["length"] = len(blob)
+                f.write(blob)
+            line = (json.dumps(entry, separators=(',', ':')) + "\n").encode('utf-8')
+            with (page_dir / INDEX_NAME).open('ab') as f:
+                f.write(line)
+            entries.append(entry)
+            history.index_size += len(line)
+            if entry["base"] == revision:
+                history.snapshot = (revision, content.splitlines(keepends=True))
+            return self._describe(entry)
+
+    @staticmethod
+    def _describe(entry: Dict) -> Dict:
+        return {
+            "revision": entry["revision"],
+            "created_at": entry["created_at"],
+            "size": entry["size"],
+            "sha256": entry["sha256"],
+            "snapshot": entry["base"] == entry["revision"]
+        }
+
+    def list(self, page_id: str) -> List[Dict]:
+        with self._lock:
+            return [self._describe(entry) for entry in self._history(page_id).entries]
+
+    def latest(self, page_id: str) -> Optional[int]:
+        with self._lock:
+            return len(self._history(page_id).entries) or None
+
+    def get(self, page_id: str, revision: int) -> Optional[str]:
+        with self._lock:
+            history = self._history(page_id)
+            if not 1 <= revision <= len(history.entries):
+                return None
+            entry = history.entries[revision - 1]
+            if entry["base"] == revision:
+                return "".join(self._snapshot_lines(page_id, history, revision))
+            base = self._snapshot_lines(page_id, history, entry["base"])
+            ops = json.loads(self._read_blob(page_id, entry))
+        return apply_delta(base, ops)
+
+    def diff(self, page_id: str, from_revision: int, to_revision: int, context: int = 3) -> Optional[str]:
+        """Unified diff between two revisions; revision 0 is the empty page before the first."""
+        before = "" if from_revision == 0 else self.get(page_id, from_revision)
+        after = self.get(page_id, to_revision)
+        if before is None or after is None:
+            return None
+        return "".join(difflib.unified_diff(
+            before.splitlines(keepends=True), after.splitlines(keepends=True),
+            fromfile=f"{page_id}@{from_revision}", tofile=f"{page_id}@{to_revision}", n=context))
+
+    def delete(self, page_id: str) -> None:
+        page_dir = self._page_dir(page_id)
+        with self._lock:
+            self._histories.pop(page_id, None)
+            shutil.rmtree(page_dir, ignore_errors=True)
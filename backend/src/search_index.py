@@ -0,0 +1,446 @@
+import bisect
+import json
+import logging
+import math
+import os
+import re
+import threading
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from metrics import REGISTRY
+
+logging.basicConfig(format='%(levelname)s:%(message)s', level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+INDEX_DIRNAME = ".search"
+JOURNAL_NAME = "index.jsonl"
+# Plain text kept per page for snippets; terms are indexed from the whole page
+MAX_STORED_TEXT = 20_000
+MAX_PREFIX_TERMS = 64
+SNIPPET_CHARS = 160
+PREFIX_FACTOR = 0.6
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+FIELD_WEIGHTS = {"title": 4.0, "h1": 4.0, "h2": 3.0, "h3": 2.0, "h4": 1.5, "h5": 1.5, "h6": 1.5}
+SKIP_TAGS = {"script", "style", "template", "noscript", "svg"}
+BLOCK_TAGS = {"p", "div", "br", "li", "td", "th", "tr", "section", "article", "header", "footer",
+              "main", "nav", "aside", "blockquote", "pre", "figcaption"} | set(FIELD_WEIGHTS)
+_TOKEN = re.compile(r"\w+")
+_WHITESPACE = re.compile(r"\s+")
+
+SEARCH_QUERY_SECONDS = REGISTRY.histogram("search_query_seconds", "Time to answer a search query")
+SEARCH_INDEX_SECONDS = REGISTRY.histogram("search_index_seconds", "Time to extract and index one page")
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in _TOKEN.findall(text.casefold()) if len(token) > 1 or token.isdigit()]
+
+
+class _TextExtractor(HTMLParser):
+    """Collects visible text and per-term weights, boosting titles and headings."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self.terms: Dict[str, float] = {}
+        self._skip = 0
+        self._weights: List[Tuple[str, float]] = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self._skip += 1
+        elif tag in FIELD_WEIGHTS:
+            self._weights.append((tag, FIELD_WEIGHTS[tag]))
+        if tag in BLOCK_TAGS:
+            self.parts.append(" ")
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            self._skip = max(0, self._skip - 1)
+        elif self._weights and self._weights[-1][0] == tag:
+            self._weights.pop()
+        if tag in BLOCK_TAGS:
+            self.parts.append(" ")
+
+    def handle_data(self, data):
+        if self._skip:
+            return
+        self.parts.append(data)
+        weight = max((w for _, w in self._weights), default=1.0)
+        for token in tokenize(data):
+            self.terms[token] = self.terms.get(token, 0.0) + weight
+
+
+def extract_text(content: str) -> Tuple[Dict[str, float], str]:
+    """Weighted term frequencies and whitespace-collapsed plain text of an HTML page."""
+    parser = _TextExtractor()
+    parser.feed(content)
+    parser.close()
+    text = _WHITESPACE.sub(" ", "".join(parser.parts)).strip()
+    return parser.terms, text
+
+
+class _Document:
+    __slots__ = ("site_id", "page_id", "terms", "length", "text", "record_size")
+
+    def __init__(self, site_id: str, page_id: str, terms: Dict[str, float], text: str, record_size: int):
+        self.site_id = site_id
+        self.page_id = page_id
+        self.terms = terms
+        self.length = sum(terms.values())
+        self.text = text
+        self.record_size = record_size
+
+
+class _SiteCopy:
+    """Queued for a cloned site: copy the source site's documents instead of re-extracting them.
+
+    ``pending`` maps pages that still had updates queued for the source to
+    the clone's files; the copied documents predate those updates, so these
+    pages are read from disk instead.
+    """
+    __slots__ = ("site_id", "pending")
+
+    def __init__(self, site_id: str, pending: Dict[str, Path]):
+        self.site_id = site_id
+        self.pending = pending
+
+
+# What the indexing worker does with a page: index this content, read and index
+# this file, copy another site's pages, or (None) remove it
+_PageSource = Union[str, Path, _SiteCopy, None]
+
+
+class SearchIndex:
+    """Inverted index over the text of every page.
+
+    Page text is extracted with markup stripped; words in titles and headings
+    count more. Updates are queued and applied by a background thread, so
+    saves don't wait for HTML parsing, and each one is appended to
+    ``<sites>/.search/index.jsonl``. Startup replays that journal instead of
+    rescanning the pages; it is rewritten once it holds mostly superseded
+    records. Query words also match as prefixes of indexed terms, found by
+    bisecting a sorted term list.
+    """
+
+    _instances: Dict[Path, "SearchIndex"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, index_dir: Path):
+        self.index_dir = Path(index_dir)
+        self.journal_path = self.index_dir / JOURNAL_NAME
+        self._lock = threading.RLock()
+        self._docs: Dict[str, _Document] = {}
+        self._postings: Dict[str, Dict[str, float]] = {}
+        # Sorted terms for prefix lookups; may contain terms whose postings are gone
+        self._terms: List[str] = []
+        self._stale_terms = 0
+        self._total_length = 0.0
+        self._journal_bytes = 0
+        self._live_bytes = 0
+        self._queue: Dict[Tuple[str, Optional[str]], _PageSource] = {}
+        self._queue_cond = threading.Condition()
+        self._busy = False
+        self._worker: Optional[threading.Thread] = None
+        self.loaded = self.load()
+        REGISTRY.gauge("search_indexed_pages", "Pages in the search index", lambda: len(self._docs))
+
+    @classmethod
+    def for_directory(cls, sites_dir: Path) -> "SearchIndex":
+        key = Path(sites_dir).resolve()
+        with cls._instances_lock:
+            index = cls._instances.get(key)
+            if index is None:
+                index = cls(Path(sites_dir) / INDEX_DIRNAME)
+                cls._instances[key] = index
+            return index
+
+    @staticmethod
+    def _key(site_id: str, page_id: str) -> str:
+        return f"{site_id}/{page_id}"
+
+    # Index maintenance
+
+    def _add_document(self, doc: _Document) -> None:
+        key = self._key(doc.site_id, doc.page_id)
+        self._remove_document(key)
+        self._docs[key] = doc
+        self._total_length += doc.length
+        self._live_bytes += doc.record_size
+        for term, weight in doc.terms.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                i = bisect.bisect_left(self._terms, term)
+                if i < len(self._terms) and self._terms[i] == term:
+                    self._stale_terms -= 1
+                else:
+                    self._terms.insert(i, term)
+            postings[key] = weight
+
+    def _remove_document(self, key: str) -> None:
+        doc = self._docs.pop(key, None)
+        if doc is None:
+            return
+        self._total_length -= doc.length
+        self._live_bytes -= doc.record_size
+        for term in doc.terms:
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(key, None)
+            if not postings:
+                del self._postings[term]
+                self._stale_terms += 1
+        if self._stale_terms > len(self._terms) // 2:
+            self._terms = sorted(self._postings)
+            self._stale_terms = 0
+
+    def _apply(self, record: Dict, record_size: int) -> None:
+        op = record.get("op")
+        if op == "put":
+            self._add_document(_Document(record["site"], record["page"], record["terms"], record["text"],
+                                         record_size))
+        elif op == "delete":
+            self._remove_document(self._key(record["site"], record["page"]))
+        elif op == "delete_site":
+            prefix = record["site"] + "/"
+            for key in [key for key in self._docs if key.startswith(prefix)]:
+                self._remove_document(key)
+
+    def load(self) -> bool:
+        """Replay the journal; returns False when there is no index on disk yet."""
+        try:
+            data = self.journal_path.read_bytes()
+        except FileNotFoundError:
+            return False
+        with self._lock:
+            for line in data.splitlines(keepends=True):
+                if not line.endswith(b"\n"):
+                    break  # Torn final write
+                try:
+                    self._apply(json.loads(line), len(line))
+                except (json.JSONDecodeError, KeyError, TypeError):
+                    logger.warning(f"Skipping corrupt search index record in {self.journal_path}")
+            self._journal_bytes = len(data)
+            self._terms = sorted(self._postings)
+            self._stale_terms = 0
+        logger.info(f"Search index loaded: {len(self._docs)} pages")
+        return True
+
+    def _append(self, record: Dict) -> int:
+        line = (json.dumps(record, separators=(',', ':'), ensure_ascii=False) + "\n").encode('utf-8')
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        with self.journal_path.open('ab') as f:
+            f.write(line)
+        self._journal_bytes += len(line)
+        return len(line)
+
+    def _compact(self) -> None:
+        """Rewrite the journal with one record per live page."""
+        tmp_path = self.journal_path.with_name(f".{JOURNAL_NAME}.tmp")
+        size = 0
+        with tmp_path.open('wb') as f:
+            for doc in self._docs.values():
+                line = (json.dumps({"op": "put", "site": doc.site_id, "page": doc.page_id, "terms": doc.terms,
+                                    "text": doc.text}, separators=(',', ':'), ensure_ascii=False) + "\n"
+                        ).encode('utf-8')
+                f.write(line)
+                doc.record_size = len(line)
+                size += len(line)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.journal_path)
+        self._journal_bytes = self._live_bytes = size
+
+    def _copy_site(self, copy: _SiteCopy, site_id: str) -> None:
+        prefix = copy.site_id + "/"
+        with self._lock:
+            for doc in [doc for key, doc in self._docs.items() if key.startswith(prefix)]:
+                if doc.page_id in copy.pending:
+                    continue
+                record = {"op": "put", "site": site_id, "page": doc.page_id, "terms": doc.terms, "text": doc.text}
+                self._apply(record, self._append(record))
+            if self._journal_bytes > 2 * self._live_bytes + 1024 * 1024:
+                self._compact()
+        for page_id, path in copy.pending.items():
+            # A queued removal left no file to clone
+            self._process(site_id, page_id, path if path.is_file() else None)
+
+    def _process(self, site_id: str, page_id: Optional[str], source: _PageSource) -> None:
+        if isinstance(source, _SiteCopy):
+            self._copy_site(source, site_id)
+            return
+        if page_id is None:
+            record = {"op": "delete_site", "site": site_id}
+        elif source is None:
+            record = {"op": "delete", "site": site_id, "page": page_id}
+        else:
+            with SEARCH_INDEX_SECONDS.time():
+                if isinstance(source, Path):
+                    try:
+                        source = source.read_text(encoding='utf-8')
+                    except (OSError, UnicodeDecodeError):
+                        return
+                terms, text = extract_text(source)
+            record = {"op": "put", "site": site_id, "page": page_id, "terms": terms,
+                      "text": text[:MAX_STORED_TEXT]}
+        with self._lock:
+            self._apply(record, self._append(record))
+            if self._journal_bytes > 2 * self._live_bytes + 1024 * 1024:
+                self._compact()
+
+    def _run(self) -> None:
+        while True:
+            with self._queue_cond:
+                while not self._queue:
+                    self._busy = False
+                    self._queue_cond.notify_all()
+                    self._queue_cond.wait()
+                key = next(iter(self._queue))
+                source = self._queue.pop(key)
+                self._busy = True
+            try:
+                self._process(key[0], key[1], source)
+            except Exception:
+                logger.exception(f"Failed to index {key[0]}/{key[1]}")
+
+    def _enqueue(self, site_id: str, page_id: Optional[str], source: _PageSource) -> None:
+        with self._queue_cond:
+            # A newer update for the same page supersedes a queued one
+            self._queue.pop((site_id, page_id), None)
+            self._queue[(site_id, page_id)] = source
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="search-index", daemon=True)
+                self._worker.start()
+            self._queue_cond.notify_all()
+
+    def index_page(self, site_id: str, page_id: str, content: Union[str, Path]) -> None:
+        """Queue a page (its HTML, or the path to read it from) for indexing."""
+        self._enqueue(site_id, page_id, content)
+
+    def remove_page(self, site_id: str, page_id: str) -> None:
+        self._enqueue(site_id, page_id, None)
+
+    def remove_site(self, site_id: str) -> None:
+        with self._queue_cond:
+            for key in [key for key in self._queue if key[0] == site_id]:
+                del self._queue[key]
+        self._enqueue(site_id, None, None)
+
+    def copy_site(self, source_site_id: str, site_id: str, editor_dir: Path) -> None:
+        """Index a clone of a site, whose pages are in ``editor_dir``, from its source's documents.
+
+        Call it right after cloning the files. Pages with updates still queued
+        for the source are indexed from the clone's files, since a later update
+        to the source would requeue them behind the copy.
+        """
+        with self._queue_cond:
+            pending = {page_id: Path(editor_dir) / f"{page_id}.html"
+                       for queued_site, page_id in self._queue if queued_site == source_site_id and page_id}
+            self._enqueue(site_id, None, _SiteCopy(source_site_id, pending))
+
+    def rebuild(self, pages: Iterable[Tuple[str, str, Path]]) -> int:
+        """Drop the index and queue every ``(site_id, page_id, path)`` for indexing."""
+        with self._lock:
+            site_ids = {doc.site_id for doc in self._docs.values()}
+        for site_id in site_ids:
+            self.remove_site(site_id)
+        count = 0
+        for site_id, page_id, path in pages:
+            self.index_page(site_id, page_id, path)
+            count += 1
+        return count
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until queued updates are applied; False on timeout."""
+        with self._queue_cond:
+            return self._queue_cond.wait_for(lambda: not self._queue and not self._busy, timeout)
+
+    def pending(self) -> int:
+        with self._queue_cond:
+            return len(self._queue) + (1 if self._busy else 0)
+
+    # Queries
+
+    def _expand(self, token: str) -> List[Tuple[str, float]]:
+        """The token itself plus indexed terms it is a prefix of."""
+        matches = []
+        if token in self._postings:
+            matches.append((token, 1.0))
+        i = bisect.bisect_right(self._terms, token)
+        while i < len(self._terms) and len(matches) < MAX_PREFIX_TERMS and self._terms[i].startswith(token):
+            if self._terms[i] in self._postings:
+                matches.append((self._terms[i], PREFIX_FACTOR))
+            i += 1
+        return matches
+
+    def search(self, query: str, limit: int = 20, offset: int = 0, site_id: Optional[str] = None) -> Dict:
+        """Pages containing every query word (or a word it starts with), best BM25 score first."""
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return {"total": 0, "results": []}
+
+        with SEARCH_QUERY_SECONDS.time(), self._lock:
+            count = len(self._docs)
+            average_length = self._total_length / count if count else 1.0
+            scores: Optional[Dict[str, float]] = None
+            matched: Dict[str, List[str]] = {}
+            for token in tokens:
+                token_scores: Dict[str, float] = {}
+                for term, factor in self._expand(token):
+                    postings = self._postings[term]
+                    idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                    for key, weight in postings.items():
+                        if scores is not None and key not in scores:
+                            continue
+                        doc = self._docs[key]
+                        if site_id is not None and doc.site_id != site_id:
+                            continue
+                        norm = BM25_K1 * (1 - BM25_B + BM25_B * doc.length / average_length)
+                        score = factor * idf * weight * (BM25_K1 + 1) / (weight + norm)
+                        if score > token_scores.get(key, 0.0):
+                            token_scores[key] = score
+                        matched.setdefault(key, []).append(term)
+                if scores is None:
+                    scores = token_scores
+                else:
+                    scores = {key: scores[key] + score for key, score in token_scores.items()}
+                if not scores:
+                    break
+
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+            results = []
+            for key, score in ranked[offset:offset + limit]:
+                doc = self._docs[key]
+                snippet, highlights = make_snippet(doc.text, matched[key])
+                results.append({
+                    "site_id": doc.site_id,
+                    "page_id": doc.page_id,
+                    "score": round(score, 4),
+                    "snippet": snippet,
+                    "highlights": highlights,
+                })
+            return {"total": len(ranked), "results": results}
+
+
+def make_snippet(text: str, terms: Iterable[str], width: int = SNIPPET_CHARS) -> Tuple[str, List[List[int]]]:
+    """A window of ``text`` around the first matched term, with [start, end) offsets of matches in it."""
+    pattern = re.compile(r"(?<!\w)(?:" + "|".join(re.escape(term) for term in
+                                                   sorted(set(terms), key=len, reverse=True)) + ")",
+                         re.IGNORECASE)
+    first = pattern.search(text)
+    start = 0
+    if first and first.start() > width // 3:
+        start = text.find(" ", first.start() - width // 3) + 1
+    end = len(text) if start + width >= len(text) else text.rfind(" ", start, start + width)
+    if end <= start:
+        end = min(len(text), start + width)
+    prefix = "…" if start > 0 else ""
+    snippet = prefix + text[start:end] + ("…" if end < len(text) else "")
+    highlights = [[match.start() + len(prefix), match.end() + len(prefix)]
+                  for match in pattern.finditer(text, start, end)]
+    return snippet, highlights
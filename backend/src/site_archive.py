@@ -0,0 +1,319 @@
+import hashlib
+import json
+import logging
+import re
+import shutil
+import uuid
+import zipfile
+from datetime import datetime
+from pathlib import Path, PurePosixPath
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from revision_store import REVISIONS_DIRNAME
+from site_manager import PAGE_ID_PATTERN, SCHEMA_VERSION, SiteManager, atomic_write_text, migrate_site_config
+
+logging.basicConfig(format='%(levelname)s:%(message)s', level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ARCHIVE_FORMAT = "agora-pluribus-site"
+ARCHIVE_VERSION = 1
+EXPORT_MANIFEST = "export.json"
+CHUNK_SIZE = 1024 * 1024
+# Already-compressed files are stored rather than deflated again
+STORED_SUFFIXES = {".gz", ".br", ".zip", ".png", ".jpg", ".jpeg", ".gif", ".webp", ".avif", ".woff", ".woff2",
+                   ".mp3", ".mp4", ".webm"}
+_FILE_NAME = re.compile(r'^[A-Za-z0-9][A-Za-z0-9._-]*$')
+
+
+class ArchiveError(ValueError):
+    pass
+
+
+def _file_metadata(path: Path) -> Dict:
+    """``page_metadata`` computed while reading the file in chunks."""
+    digest, size = hashlib.sha256(), 0
+    with path.open('rb') as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+            size += len(chunk)
+    return {"size": size, "sha256": digest.hexdigest(), "mtime": path.stat().st_mtime}
+
+
+class _StreamBuffer:
+    """Write-only file object for zipfile whose bytes are drained by the exporting generator.
+
+    It has no tell()/seek(), so zipfile writes a streamable archive (data
+    descriptors after each member) and never needs the whole archive at once.
+    """
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> Iterator[bytes]:
+        if self._chunks:
+            data = b"".join(self._chunks)
+            self._chunks.clear()
+            yield data
+
+
+class SiteArchiver:
+    """Exports sites as zip archives and imports them as new sites.
+
+    An archive mirrors the site directory: ``site.json``, ``editor/`` and,
+    optionally, the published output (top-level pages and ``assets/``) and
+    ``revisions/``, plus an ``export.json`` describing the archive. The
+    shared ``common`` directory is not included; imported sites are linked
+    to this installation's copy. Both directions copy file by file in
+    fixed-size chunks, so memory use does not depend on the site's size.
+    """
+
+    def __init__(self, site_manager: SiteManager, max_import_bytes: int = 1024 ** 3):
+        self.site_manager = site_manager
+        self.max_import_bytes = max_import_bytes
+
+    # Export
+
+    def _export_files(self, site_id: str, published: bool, revisions: bool) -> List[Tuple[str, Path]]:
+        site_path = self.site_manager.get_site_path(site_id)
+        files = []
+        editor_path = self.site_manager.get_site_editor_path(site_id)
+        if editor_path.is_dir():
+            files += [(f"editor/{path.name}", path) for path in sorted(editor_path.iterdir())
+                      if path.is_file() and not path.is_symlink() and _FILE_NAME.match(path.name)]
+        if published:
+            for path in sorted(site_path.iterdir()):
+                if path.name == "site.json" or path.is_symlink() or not _FILE_NAME.match(path.name):
+                    continue
+                if path.is_file():
+                    files.append((path.name, path))
+                elif path.name == "assets":
+                    files += [(path.name + "/" + child.relative_to(path).as_posix(), child)
+                              for child in sorted(path.rglob("*")) if child.is_file() and not child.is_symlink()]
+        if revisions:
+            revisions_path = site_path / REVISIONS_DIRNAME
+            if revisions_path.is_dir():
+                files += [(child.relative_to(site_path).as_posix(), child)
+                          for child in sorted(revisions_path.rglob("*")) if child.is_file()]
+        return files
+
+    def export_site(self, site_id: str, published: bool = False, revisions: bool = False) -> Optional[Iterator[bytes]]:
+        """Return an iterator of zip archive bytes, or None if the site does not exist.
+
+        The file list is taken up front; pages are read as they are streamed,
+        and because page writes replace files atomically each member is a
+        consistent version of its file.
+        """
+        site_config = self.site_manager.get_site_config(site_id)
+        if site_config is None:
+            return None
+        files = self._export_files(site_id, published, revisions)
+        manifest = {
+            "format": ARCHIVE_FORMAT,
+            "version": ARCHIVE_VERSION,
+            "schema_version": site_config.get("schema_version", 1),
+            "site_id": site_id,
+            "exported_at": datetime.now().isoformat(),
+            "published": published,
+            "revisions": revisions,
+        }
+        return self._stream(site_config, manifest, files)
+
+    @staticmethod
+    def _stream(site_config: Dict, manifest: Dict, files: List[Tuple[str, Path]]) -> Iterator[bytes]:
+        buffer = _StreamBuffer()
+        with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=6) as archive:
+            archive.writestr(EXPORT_MANIFEST, json.dumps(manifest, indent=2))
+            archive.writestr("site.json", json.dumps(site_config, indent=2))
+            yield from buffer.drain()
+            for arcname, path in files:
+                try:
+                    source = path.open('rb')
+                except FileNotFoundError:
+                    continue  # Deleted since the listing was taken
+                with source:
+                    info = zipfile.ZipInfo.from_file(path, arcname)
+                    if path.suffix.lower() in STORED_SUFFIXES:
+                        info.compress_type = zipfile.ZIP_STORED
+                    else:
+                        info.compress_type = zipfile.ZIP_DEFLATED
+                    with archive.open(info, 'w', force_zip64=info.file_size > 2 ** 31) as member:
+                        while True:
+                            chunk = source.read(CHUNK_SIZE)
+                            if not chunk:
+                                break
+                            member.write(chunk)
+                            yield from buffer.drain()
+                yield from buffer.drain()
+        yield from buffer.drain()
+
+    # Import
+
+    @staticmethod
+    def _target_path(name: str) -> PurePosixPath:
+        """Validate a member name against the archive layout and return it as a relative path."""
+        path = PurePosixPath(name)
+        if name.startswith('/') or '\\' in name or any(part in ('', '.', '..') for part in path.parts):
+            raise ArchiveError(f"Invalid path in archive: {name}")
+        parts = path.parts
+        if len(parts) == 1 and _FILE_NAME.match(parts[0]):
+            return path
+        if len(parts) == 2 and parts[0] == "editor" and _FILE_NAME.match(parts[1]):
+            return path
+        if parts[0] == "assets" and all(_FILE_NAME.match(part) for part in parts[1:]):
+            return path
+        if (len(parts) == 3 and parts[0] == REVISIONS_DIRNAME and PAGE_ID_PATTERN.match(parts[1])
+                and parts[2] in ("data.pack", "index.jsonl")):
+            return path
+        raise ArchiveError(f"Unexpected file in archive: {name}")
+
+    def _read_json(self, archive: zipfile.ZipFile, name: str, limit: int = 16 * 1024 * 1024) -> Dict:
+        try:
+            info = archive.getinfo(name)
+        except KeyError:
+            raise ArchiveError(f"Archive has no {name}")
+        if info.file_size > limit:
+            raise ArchiveError(f"{name} is too large")
+
+        def reject_duplicates(pairs):
+            keys = [key for key, _ in pairs]
+            if len(keys) != len(set(keys)):
+                raise ArchiveError(f"Duplicate keys in {name}")
+            return dict(pairs)
+
+        try:
+            with archive.open(info) as f:
+                value = json.loads(f.read(limit + 1), object_pairs_hook=reject_duplicates)
+        except (json.JSONDecodeError, UnicodeDecodeError, zipfile.BadZipFile) as e:
+            raise ArchiveError(f"Invalid {name}: {e}")
+        if not isinstance(value, dict):
+            raise ArchiveError(f"Invalid {name}")
+        return value
+
+    @staticmethod
+    def _check_v1_pages(pages: List) -> None:
+        """Reject version 1 page entries that migrate_site_config would drop."""
+        seen = set()
+        for entry in pages:
+            if not isinstance(entry, dict):
+                raise ArchiveError("site.json has an invalid page list")
+            for page_id in entry:
+                if not PAGE_ID_PATTERN.match(page_id):
+                    raise ArchiveError(f"Invalid page ID: {page_id}")
+                if page_id in seen:
+                    raise ArchiveError(f"Duplicate page ID: {page_id}")
+                seen.add(page_id)
+
+    def _extract(self, archive: zipfile.ZipFile, staging: Path) -> None:
+        total = 0
+        for info in archive.infolist():
+            if info.is_dir() or info.filename in (EXPORT_MANIFEST, "site.json"):
+                continue
+            # Symlinks (S_IFLNK in the high bits of external_attr) could point outside the site
+            if (info.external_attr >> 16) & 0o170000 == 0o120000:
+                raise ArchiveError(f"Symbolic link in archive: {info.filename}")
+            target = staging.joinpath(*self._target_path(info.filename).parts)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            with archive.open(info) as source, target.open('wb') as dest:
+                while True:
+                    chunk = source.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    # Counted as extracted, since declared sizes can lie
+                    total += len(chunk)
+                    if total > self.max_import_bytes:
+                        raise ArchiveError("Archive expands beyond the import size limit")
+                    dest.write(chunk)
+
+    def import_site(self, fileobj: BinaryIO, name: Optional[str] = None,
+                    website_builder_path: str = "") -> Dict:
+        """Create a new site from an archive read from a seekable file object.
+
+        Raises ArchiveError when the archive is malformed, does not follow the
+        export layout, or has invalid or missing pages.
+        """
+        site_id = str(uuid.uuid4())
+        sites_dir = self.site_manager.sites_dir
+        # Dot-directories are ignored by the registry until renamed into place
+        staging = sites_dir / f".import-{site_id}"
+        try:
+            try:
+                archive = zipfile.ZipFile(fileobj)
+            except zipfile.BadZipFile as e:
+                raise ArchiveError(f"Not a zip archive: {e}")
+            with archive:
+                manifest = self._read_json(archive, EXPORT_MANIFEST)
+                if manifest.get("format") != ARCHIVE_FORMAT or not isinstance(manifest.get("version"), int):
+                    raise ArchiveError("Not a site export archive")
+                if manifest["version"] > ARCHIVE_VERSION:
+                    raise ArchiveError(f"Archive version {manifest['version']} is newer than supported")
+                site_config = self._read_json(archive, "site.json")
+                staging.mkdir(parents=True)
+                try:
+                    self._extract(archive, staging)
+                except zipfile.BadZipFile as e:
+                    raise ArchiveError(f"Corrupt archive: {e}")
+
+            editor_path = staging / "editor"
+            editor_path.mkdir(exist_ok=True)
+            if isinstance(site_config.get("pages"), dict):
+                site_config.setdefault("schema_version", SCHEMA_VERSION)
+            elif isinstance(site_config.get("pages"), list) and site_config.get("schema_version", 1) < SCHEMA_VERSION:
+                # Migration drops these with only a warning; an import must not lose pages
+                self._check_v1_pages(site_config["pages"])
+            try:
+                migrate_site_config(site_config, editor_path)
+            except (AttributeError, TypeError):
+                raise ArchiveError("site.json has an invalid page list")
+            pages = site_config.get("pages")
+            if not isinstance(pages, dict):
+                raise ArchiveError("site.json has no pages")
+            for page_id, page in pages.items():
+                if not PAGE_ID_PATTERN.match(page_id):
+                    raise ArchiveError(f"Invalid page ID: {page_id}")
+                if not isinstance(page, dict):
+                    raise ArchiveError(f"Invalid entry for page {page_id}")
+                page_path = editor_path / f"{page_id}.html"
+                if not page_path.is_file():
+                    raise ArchiveError(f"Page {page_id} has no editor/{page_id}.html")
+                page.update(_file_metadata(page_path))
+
+            now = datetime.now().isoformat()
+            site_config.update({
+                "schema_version": SCHEMA_VERSION,
+                "id": site_id,
+                "name": name or site_config.get("name") or "Imported site",
+                "created_at": now,
+                "updated_at": now,
+            })
+            atomic_write_text(staging / "site.json", json.dumps(site_config, indent=2))
+
+            # Link common before the site becomes visible
+            asset_store = self.site_manager.asset_store
+            source_common = Path(website_builder_path) / "common"
+            if asset_store.current_version() is None and website_builder_path and source_common.is_dir():
+                asset_store.import_directory(source_common)
+            if asset_store.current_version() is not None:
+                asset_store.link_site(staging)
+            staging.rename(sites_dir / site_id)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        self.site_manager.registry.store(site_id, site_config)
+        self.site_manager.notify_site("site.created", site_config)
+        for page_id in pages:
+            self.site_manager.search_index.index_page(site_id, page_id,
+                                                      self.site_manager.get_page_editor_path(site_id, page_id))
+        logger.info(f"Imported site {site_id} ({len(pages)} pages) from archive exported from "
+                    f"{manifest.get('site_id')}")
+        return self.site_manager.get_site_config(site_id)
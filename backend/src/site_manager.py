@@ -1,18 +1,39 @@
+import atexit
+import copy
+import hashlib
+import itertools
 import logging
 import os
 import json
+import threading
+import time
 import uuid
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional, Tuple
 from pathlib import Path
 import shutil
 import re
 import unicodedata
 
+from asset_store import SharedAssetStore
+from events import EventBus
+from file_clone import clone_tree
+from listing import SORT_KEYS, ListingParams, SortedIndex, SortedListing, project, sort_value
+from metrics import REGISTRY
+from render_engine import RenderEngine
+from revision_store import PAGE_ID_PATTERN, RevisionStore, check_page_id
+from search_index import SearchIndex
+
 logging.basicConfig(format='%(levelname)s:%(message)s', level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+SCHEMA_VERSION = 2
+
+DISK_SECONDS = REGISTRY.histogram("site_disk_operation_seconds", "Time spent in SiteManager disk I/O",
+                                  ("operation",))
+
+
 def slugify_to_filename(text: str, max_length: int = 16) -> str:
     # Normalize unicode and remove accents
     text = unicodedata.normalize("NFD", text)
@@ -25,10 +46,363 @@ def slugify_to_filename(text: str, max_length: int = 16) -> str:
     return text.strip('-')[:max_length]
 
 
+def unique_page_id(base: str, existing) -> str:
+    """``base``, or ``base-2``, ``base-3``... if that page ID is taken."""
+    base = base or "page"
+    page_id, n = base, 1
+    while page_id in existing:
+        n += 1
+        page_id = f"{base}-{n}"
+    return page_id
+
+
+def page_metadata(data: bytes, stat: os.stat_result) -> Dict:
+    """Cached in site.json so listings need neither stat() nor a read."""
+    return {"size": len(data), "sha256": hashlib.sha256(data).hexdigest(), "mtime": stat.st_mtime}
+
+
+def migrate_site_config(config: Dict, editor_dir: Path) -> bool:
+    """Upgrade a site config to SCHEMA_VERSION in place; returns True if it changed.
+
+    Version 1 (no ``schema_version``) stored pages as a list of single-key
+    dicts, ``[{page_id: name}, ...]``. Version 2 stores an ordered mapping
+    ``{page_id: {"name", "created_at", "size", "sha256", "mtime"}}``.
+    """
+    if config.get("schema_version", 1) >= SCHEMA_VERSION:
+        return False
+
+    pages = {}
+    for entry in config.get("pages", []):
+        for page_id, name in entry.items():
+            if page_id in pages:
+                # Two names slugified to the same ID and shared one file
+                logger.warning(f"Site {config.get('id')}: dropping duplicate page entry {page_id} ({name})")
+                continue
+            if not PAGE_ID_PATTERN.match(page_id):
+                # e.g. the empty ID of a name with no ASCII letters, which no route can address
+                logger.warning(f"Site {config.get('id')}: dropping page entry with invalid ID {page_id!r} ({name})")
+                continue
+            page = {"name": name, "created_at": config.get("created_at")}
+            page_path = editor_dir / f"{page_id}.html"
+            try:
+                page.update(page_metadata(page_path.read_bytes(), page_path.stat()))
+            except OSError:
+                pass
+            pages[page_id] = page
+    config["pages"] = pages
+    config["schema_version"] = SCHEMA_VERSION
+    return True
+
+
+def file_etag(stat: os.stat_result) -> str:
+    """Strong validator derived from a file's mtime and size (no read needed)."""
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def atomic_write_bytes(path: Path, data: bytes, fsync: bool = True) -> None:
+    """Write a file so readers see either the old or the new content, never a partial one.
+
+    The data goes to a temporary file in the same directory which is fsynced
+    and then renamed over the target.
+    """
+    path = Path(path)
+    temp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        with temp_path.open('wb') as f:
+            f.write(data)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            temp_path.unlink()
+        except FileNotFoundError:
+            pass
+        raise
+
+    if fsync and hasattr(os, 'O_DIRECTORY'):
+        # Persist the rename itself (not supported on Windows)
+        dir_fd = os.open(path.parent, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        except OSError:
+            pass
+        finally:
+            os.close(dir_fd)
+
+
+def atomic_write_text(path: Path, text: str, fsync: bool = True) -> None:
+    atomic_write_bytes(path, text.encode('utf-8'), fsync)
+
+
+# Fields the listing endpoints can project; page_count is derived
+SITE_FIELDS = ("id", "name", "description", "created_at", "updated_at", "pages", "page_count")
+PAGE_FIELDS = ("id", "name", "site_id", "position", "created_at", "updated_at", "modified_at", "size", "sha256")
+PAGE_SORT_KEYS = ("position",) + SORT_KEYS
+
+
+class PreconditionFailed(Exception):
+    pass
+
+
+class _SiteEntry:
+    __slots__ = ("config", "signature", "checked_at", "version", "_etag")
+
+    def __init__(self, config: Dict, signature: Tuple[int, int], checked_at: float):
+        self.config = config
+        self.signature = signature
+        self.checked_at = checked_at
+        # Assigned by the registry; a new entry (and version) replaces the old one on every change
+        self.version = 0
+        self._etag: Optional[str] = None
+
+    @property
+    def etag(self) -> str:
+        """Strong validator of the config itself, which may be ahead of site.json while writes are coalesced."""
+        if self._etag is None:
+            data = json.dumps(self.config, sort_keys=True, separators=(',', ':')).encode('utf-8')
+            self._etag = f'"{hashlib.sha1(data).hexdigest()}"'
+        return self._etag
+
+    @property
+    def last_modified(self) -> Optional[float]:
+        try:
+            return datetime.fromisoformat(self.config["updated_at"]).timestamp()
+        except (KeyError, TypeError, ValueError):
+            return None
+
+
+class SiteRegistry:
+    """Process-wide cache of parsed site.json files.
+
+    Entries are validated against the config file's mtime/size, so reads only
+    touch the disk with a stat() and re-parse a config only after it changed.
+    The set of site directories is rescanned only when the sites directory
+    itself changes (its mtime moves whenever a site is added or removed).
+    """
+
+    _instances: Dict[Path, "SiteRegistry"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, sites_dir: Path, revalidate_interval: float = 1.0):
+        self.sites_dir = sites_dir
+        self.revalidate_interval = revalidate_interval
+        self._lock = threading.RLock()
+        self._entries: Dict[str, _SiteEntry] = {}
+        self._site_ids: List[str] = []
+        self._dir_signature: Optional[int] = None
+        self._listing: Optional[List[Dict]] = None
+        self._site_locks: Dict[str, threading.RLock] = {}
+        self._versions = itertools.count(1)
+        # Sorted (value, site_id) keys per sort key, updated whenever an entry changes
+        self._indexes = {sort: SortedIndex(lambda config, sort=sort: sort_value(config, sort))
+                         for sort in SORT_KEYS}
+
+    @classmethod
+    def for_directory(cls, sites_dir: Path) -> "SiteRegistry":
+        key = sites_dir.resolve()
+        with cls._instances_lock:
+            registry = cls._instances.get(key)
+            if registry is None:
+                registry = cls(sites_dir)
+                cls._instances[key] = registry
+            return registry
+
+    def _config_path(self, site_id: str) -> Path:
+        return self.sites_dir / site_id / "site.json"
+
+    def site_lock(self, site_id: str) -> threading.RLock:
+        """Lock serialising read-modify-write cycles on one site."""
+        with self._lock:
+            lock = self._site_locks.get(site_id)
+            if lock is None:
+                lock = self._site_locks[site_id] = threading.RLock()
+            return lock
+
+    @staticmethod
+    def _signature(stat: os.stat_result) -> Tuple[int, int]:
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _load(self, site_id: str, now: float) -> Optional[_SiteEntry]:
+        config_path = self._config_path(site_id)
+        try:
+            stat = config_path.stat()
+            entry = self._entries.get(site_id)
+            if entry and entry.signature == self._signature(stat):
+                entry.checked_at = now
+                return entry
+
+            with DISK_SECONDS.time(operation="read_config"), config_path.open('r', encoding='utf-8') as f:
+                config = json.load(f)
+            if migrate_site_config(config, config_path.parent / "editor"):
+                # Not under site_lock: writers take that before this lock. Any writer
+                # read its config through here, so it is already migrated.
+                atomic_write_text(config_path, json.dumps(config, indent=2))
+                stat = config_path.stat()
+                logger.info(f"Migrated {config_path} to schema version {SCHEMA_VERSION}")
+        except (FileNotFoundError, NotADirectoryError):
+            self._forget(site_id)
+            return None
+        except (json.JSONDecodeError, IOError):
+            logger.warning(f"Unreadable site config: {config_path}")
+            entry = self._entries.get(site_id)
+            if entry:
+                # Keep serving the last good config rather than dropping the site
+                entry.checked_at = now
+                return entry
+            return None
+
+        entry = _SiteEntry(config, self._signature(stat), now)
+        self._set_entry(site_id, entry)
+        return entry
+
+    def _set_entry(self, site_id: str, entry: _SiteEntry) -> None:
+        entry.version = next(self._versions)
+        self._entries[site_id] = entry
+        for index in self._indexes.values():
+            index.update(site_id, entry.config)
+        self._listing = None
+
+    def _lookup(self, site_id: str) -> Optional[_SiteEntry]:
+        now = time.monotonic()
+        entry = self._entries.get(site_id)
+        if entry and now - entry.checked_at < self.revalidate_interval:
+            return entry
+        return self._load(site_id, now)
+
+    def _forget(self, site_id: str) -> None:
+        if self._entries.pop(site_id, None) is not None:
+            for index in self._indexes.values():
+                index.remove(site_id)
+            self._listing = None
+
+    def _refresh_site_ids(self) -> None:
+        try:
+            dir_signature = self.sites_dir.stat().st_mtime_ns
+        except FileNotFoundError:
+            for site_id in list(self._entries):
+                self._forget(site_id)
+            self._site_ids = []
+            self._listing = None
+            return
+
+        if dir_signature == self._dir_signature:
+            return
+
+        with os.scandir(self.sites_dir) as it:
+            # Dot-directories hold shared data (e.g. the asset store), not sites
+            site_ids = sorted(item.name for item in it if item.is_dir() and not item.name.startswith('.'))
+        for site_id in set(self._entries) - set(site_ids):
+            self._forget(site_id)
+        # New sites must be loaded to appear in the sorted indexes
+        now = time.monotonic()
+        for site_id in set(site_ids) - set(self._entries):
+            self._load(site_id, now)
+        self._site_ids = site_ids
+        self._dir_signature = dir_signature
+        self._listing = None
+
+    def get(self, site_id: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._lookup(site_id)
+            return copy.deepcopy(entry.config) if entry else None
+
+    def list(self) -> List[Dict]:
+        """Return every readable site config.
+
+        The returned dicts are shared with the cache and must be treated as
+        read-only; use get() for a private copy.
+        """
+        with self._lock:
+            self._refresh_site_ids()
+            for site_id in self._site_ids:
+                self._lookup(site_id)
+            if self._listing is None:
+                self._listing = [self._entries[site_id].config
+                                 for site_id in self._site_ids if site_id in self._entries]
+            return list(self._listing)
+
+    def page(self, sort: str, after: Optional[Tuple[str, str]], limit: int,
+             descending: bool = False) -> Tuple[List[Dict], Optional[Tuple[str, str]], int]:
+        """One page of site configs in ``sort`` order.
+
+        Returns the configs (shared and read-only, as with list()), the key to
+        continue after (None on the last page) and the total number of sites.
+        Only the returned entries are revalidated against disk.
+        """
+        with self._lock:
+            self._refresh_site_ids()
+            index = self._indexes[sort]
+            keys, more = index.page(after, limit, descending)
+            configs = []
+            for _, site_id in keys:
+                entry = self._lookup(site_id)
+                if entry:
+                    configs.append(entry.config)
+            return configs, keys[-1] if more and keys else None, len(index)
+
+    def lookup(self, site_id: str) -> Optional[_SiteEntry]:
+        """The site's current entry; its config is shared and read-only, as with list()."""
+        with self._lock:
+            return self._lookup(site_id)
+
+    def version(self, site_id: str) -> Optional[int]:
+        entry = self.lookup(site_id)
+        return entry.version if entry else None
+
+    def signature(self, site_id: str) -> Optional[Tuple[int, int]]:
+        """Validator of the site's config as last read or written, None if the site is unknown."""
+        with self._lock:
+            entry = self._lookup(site_id)
+            return entry.signature if entry else None
+
+    def store(self, site_id: str, site_config: Dict) -> None:
+        """Record a config that was just written to disk by this process."""
+        with self._lock:
+            try:
+                stat = self._config_path(site_id).stat()
+            except FileNotFoundError:
+                self._forget(site_id)
+                return
+            self._set_entry(site_id, _SiteEntry(copy.deepcopy(site_config), self._signature(stat), time.monotonic()))
+
+    def discard(self, site_id: str) -> None:
+        with self._lock:
+            self._forget(site_id)
+
+
 class SiteManager:
-    def __init__(self, sites_directory="../sites"):
+    """Sites, pages and their configs on disk.
+
+    Files are replaced atomically and read-modify-write cycles on a site's
+    config are serialised with a per-site lock. With ``coalesce_delay`` set,
+    saves that only bump ``updated_at`` are kept in memory and written at
+    most once per delay (and on flush()/exit) instead of on every save.
+    With ``events`` set, site and page changes are published to it.
+    """
+
+    def __init__(self, sites_directory="../sites", coalesce_delay: float = 0.0,
+                 events: Optional[EventBus] = None):
         self.sites_dir = Path(sites_directory)
+        self.events = events
         self.ensure_sites_directory()
+        self.registry = SiteRegistry.for_directory(self.sites_dir)
+        self.asset_store = SharedAssetStore(self.sites_dir)
+        self.coalesce_delay = coalesce_delay
+        self._pending: Dict[str, threading.Timer] = {}
+        self._pending_lock = threading.Lock()
+        self._revision_stores: Dict[str, RevisionStore] = {}
+        # site_id -> (registry version it reflects, page listing), kept current by page writes
+        self._page_listings: Dict[str, Tuple[int, SortedListing]] = {}
+        self._listings_lock = threading.Lock()
+        if coalesce_delay > 0:
+            atexit.register(self.flush)
+        self.search_index = SearchIndex.for_directory(self.sites_dir)
+        if not self.search_index.loaded:
+            # First start with search: index existing pages once, in the background
+            self.search_index.loaded = True
+            self.reindex_search()
     
     def ensure_sites_directory(self):
         if not self.sites_dir.exists():
@@ -41,51 +415,138 @@ class SiteManager:
         return self.sites_dir / site_id / "editor"
 
     def get_page_editor_path(self, site_id: str, page_id: str) -> Path:
-        return self.get_site_editor_path(site_id) / f"{page_id}.html"
+        return self.get_site_editor_path(site_id) / f"{check_page_id(page_id)}.html"
     
     def get_site_config_path(self, site_id: str) -> Path:
         return self.get_site_path(site_id) / "site.json"
 
+    def site_lock(self, site_id: str) -> threading.RLock:
+        return self.registry.site_lock(site_id)
+
+    def _cancel_pending(self, site_id: str) -> None:
+        with self._pending_lock:
+            timer = self._pending.pop(site_id, None)
+        if timer:
+            timer.cancel()
+
     def update_site_config(self, site_id: str, site_config: Dict) -> None:
-        config_path = self.get_site_config_path(site_id)
-        with config_path.open('w', encoding='utf-8') as f:
-            json.dump(site_config, f, indent=2)
+        with self.site_lock(site_id):
+            # This write includes any coalesced updated_at bump
+            self._cancel_pending(site_id)
+            with DISK_SECONDS.time(operation="write_config"):
+                atomic_write_text(self.get_site_config_path(site_id), json.dumps(site_config, indent=2))
+            self.registry.store(site_id, site_config)
+
+    def touch_site(self, site_id: str, site_config: Dict) -> None:
+        """Bump updated_at, coalescing the config write when enabled."""
+        site_config["updated_at"] = datetime.now().isoformat()
+        if self.coalesce_delay <= 0:
+            self.update_site_config(site_id, site_config)
+            return
+
+        with self.site_lock(site_id):
+            # Cached in memory now, written by the timer
+            self.registry.store(site_id, site_config)
+            with self._pending_lock:
+                if site_id in self._pending:
+                    return
+                timer = threading.Timer(self.coalesce_delay, self.flush, args=(site_id,))
+                timer.daemon = True
+                self._pending[site_id] = timer
+            timer.start()
+
+    def flush(self, site_id: Optional[str] = None) -> None:
+        """Write coalesced config changes for one site, or all sites, to disk."""
+        with self._pending_lock:
+            site_ids = [site_id] if site_id else list(self._pending)
+        for pending_id in site_ids:
+            with self.site_lock(pending_id):
+                with self._pending_lock:
+                    timer = self._pending.pop(pending_id, None)
+                if timer is None:
+                    continue
+                timer.cancel()
+                site_config = self.registry.get(pending_id)
+                if site_config is None:
+                    continue
+                try:
+                    with DISK_SECONDS.time(operation="write_config"):
+                        atomic_write_text(self.get_site_config_path(pending_id), json.dumps(site_config, indent=2))
+                except FileNotFoundError:
+                    continue  # Site deleted meanwhile
+                before = self.registry.version(pending_id)
+                self.registry.store(pending_id, site_config)
+                # Same config, now on disk: the page listing still applies
+                self._carry_page_listing(pending_id, before)
     
+    def get_site_with_validators(self, site_id: str) -> Optional[Tuple[Dict, str, Optional[float]]]:
+        """(config, ETag, Last-Modified time) taken together from the registry, or None.
+
+        Unlike site.json's stat, these include changes still waiting to be
+        coalesced into a write. The config is shared and must not be modified.
+        """
+        entry = self.registry.lookup(site_id)
+        return (entry.config, entry.etag, entry.last_modified) if entry else None
+
+    def get_page_stat(self, site_id: str, page_id: str) -> Optional[os.stat_result]:
+        try:
+            return self.get_page_editor_path(site_id, page_id).stat()
+        except OSError:
+            return None
+
+    def get_page_etag(self, site_id: str, page_id: str) -> Optional[str]:
+        stat = self.get_page_stat(site_id, page_id)
+        return file_etag(stat) if stat else None
+
     def get_page_path(self, site_id: str, page_id: str) -> Path:
-        return self.get_site_path(site_id) / f"{page_id}.html"
+        return self.get_site_path(site_id) / f"{check_page_id(page_id)}.html"
     
+    def get_revision_store(self, site_id: str) -> RevisionStore:
+        with self._pending_lock:
+            store = self._revision_stores.get(site_id)
+            if store is None:
+                store = self._revision_stores[site_id] = RevisionStore(self.get_site_path(site_id))
+            return store
+
     def get_page_template_path(self, site_id: str, page_id: str) -> Path:
-        return self.get_site_path(site_id) / "pages" / f"{page_id}.template"
+        return self.get_site_path(site_id) / "pages" / f"{check_page_id(page_id)}.template"
     
+    def reindex_search(self) -> int:
+        """Rebuild the search index from the pages on disk; returns the number of pages queued."""
+        pages = [(site["id"], page_id, self.get_page_editor_path(site["id"], page_id))
+                 for site in self.list_sites() for page_id in self.list_page_ids(site["id"]) or []]
+        return self.search_index.rebuild(pages)
+
+    def notify(self, event_type: str, site_id: str, **data) -> None:
+        """Publish a change event (``site.created``, ``page.updated``...) if events are enabled."""
+        if self.events is not None:
+            self.events.publish(event_type, dict(data, site_id=site_id), site_id=site_id)
+
+    def notify_site(self, event_type: str, site_config: Dict) -> None:
+        site = {key: value for key, value in site_config.items() if key != "pages"}
+        self.notify(event_type, site_config["id"], site=dict(site, page_count=len(site_config.get("pages", {}))))
+
+    def _notify_page(self, event_type: str, site_id: str, page_id: str, site_config: Dict,
+                     stat: Optional[os.stat_result] = None) -> None:
+        pages = site_config.get("pages", {})
+        page = pages.get(page_id, {})
+        self.notify(event_type, site_id, page_id=page_id, name=page.get("name"),
+                    position=list(pages).index(page_id) if page_id in pages else None,
+                    size=page.get("size"), sha256=page.get("sha256"),
+                    etag=file_etag(stat) if stat is not None else None, updated_at=site_config.get("updated_at"))
+
     def list_sites(self) -> List[Dict]:
-        sites = []
-        if not self.sites_dir.exists():
-            return sites
-
-        for item in self.sites_dir.iterdir():
-            site_path = self.get_site_path(item.name)
-            if site_path.is_dir():
-                config_path = self.get_site_config_path(item.name)
-                if config_path.exists():
-                    try:
-                        with config_path.open('r', encoding='utf-8') as f:
-                            site_config = json.load(f)
-                            sites.append(site_config)
-                    except (json.JSONDecodeError, IOError):
-                        continue
-        return sites
+        return self.registry.list()
+
+    def page_sites(self, params: ListingParams) -> Tuple[List[Dict], Optional[str], int]:
+        """One page of sites per ``params``: (sites, next cursor, total sites)."""
+        configs, last_key, total = self.registry.page(params.sort, params.after, params.limit, params.descending)
+        sites = [project(dict(config, page_count=len(config.get("pages", []))), params.fields)
+                 for config in configs]
+        return sites, params.cursor_for(last_key) if last_key else None, total
     
     def get_site_config(self, site_id: str) -> Optional[Dict]:
-        config_path = self.get_site_config_path(site_id)
-        logger.info(f"Get site {site_id} config: {config_path}")
-        if not config_path.exists():
-            return None
-
-        try:
-            with config_path.open('r', encoding='utf-8') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, IOError):
-            return None
+        return self.registry.get(site_id)
     
     def create_site(self, name: str, description: str = "", website_builder_path: str = "") -> Optional[Dict]:
         site_id = str(uuid.uuid4())
@@ -99,21 +560,21 @@ class SiteManager:
         editor_path.mkdir(parents=True, exist_ok=True)
         logger.info(f"Editor path: {editor_path}")
 
-        # Copy common directory from ap-website-builder
+        # Link common directory from ap-website-builder via the shared asset store
         source_scripts_path = Path(website_builder_path) / "common"
-        dest_scripts_path = site_path / "common"
         logger.info(f"source scripts path: {source_scripts_path}")
-        logger.info(f"dest scripts path: {dest_scripts_path}")
-        shutil.copytree(source_scripts_path, dest_scripts_path, dirs_exist_ok=True)
+        self.asset_store.import_directory(source_scripts_path)
+        self.asset_store.link_site(site_path)
 
         # Create site configuration
         site_config = {
+            "schema_version": SCHEMA_VERSION,
             "id": site_id,
             "name": name,
             "description": description,
             "created_at": datetime.now().isoformat(),
             "updated_at": datetime.now().isoformat(),
-            "pages": []  # Start with empty pages array
+            "pages": {}  # page_id -> page metadata, in navigation order
         }
 
         # Save configuration first
@@ -121,73 +582,193 @@ class SiteManager:
 
         # Reload the config to get the updated pages array
         site_config = self.get_site_config(site_id)
+        self.notify_site("site.created", site_config)
 
         return site_config
     
     def update_site(self, site_id: str, name: Optional[str] = None, description: Optional[str] = None) -> Optional[Dict]:
-        site_config = self.get_site_config(site_id)
-        if not site_config:
-            return None
-        
-        # Update fields
-        if name is not None:
-            site_config["name"] = name
-        if description is not None:
-            site_config["description"] = description
-        site_config["updated_at"] = datetime.now().isoformat()
-        
-        # Save updated configuration
-        self.update_site_config(site_id, site_config)
-        
+        with self.site_lock(site_id):
+            site_config = self.get_site_config(site_id)
+            if not site_config:
+                return None
+
+            # Update fields
+            if name is not None:
+                site_config["name"] = name
+            if description is not None:
+                site_config["description"] = description
+            site_config["updated_at"] = datetime.now().isoformat()
+
+            # Save updated configuration
+            self.update_site_config(site_id, site_config)
+            self.notify_site("site.updated", site_config)
+
         return site_config
     
+    def clone_site(self, site_id: str, name: Optional[str] = None) -> Optional[Dict]:
+        """Copy a site under a new ID without copying its data.
+
+        Pages, revisions and published output are reflinked or hardlinked
+        (see file_clone) and only site.json is written, with a new id, name
+        and timestamps. Writers replace files rather than rewriting them, and
+        revision packs are unshared before they are appended to, so the two
+        sites diverge file by file as they are edited.
+        """
+        with self.site_lock(site_id):
+            source_config = self.get_site_config(site_id)
+            if not source_config:
+                return None
+            clone_id = str(uuid.uuid4())
+            source_path = self.get_site_path(site_id)
+            # Hidden until complete, like the registry's other dot-directories
+            staging = self.sites_dir / f".clone-{clone_id}"
+            try:
+                with DISK_SECONDS.time(operation="clone_site"):
+                    # site.json may be behind the registry while writes are coalesced, so it is rewritten
+                    counts = clone_tree(source_path, staging, skip=lambda path: path.name.startswith('.') or (
+                        path.parent == source_path and path.name in ("site.json", "common")))
+                    now = datetime.now().isoformat()
+                    site_config = copy.deepcopy(source_config)
+                    site_config.update({
+                        "id": clone_id,
+                        "name": name or f"{source_config.get('name', '')} (copy)",
+                        "created_at": now,
+                        "updated_at": now,
+                    })
+                    atomic_write_text(staging / "site.json", json.dumps(site_config, indent=2))
+                    if self.asset_store.current_version() is not None:
+                        self.asset_store.link_site(staging)
+                    os.rename(staging, self.get_site_path(clone_id))
+            except BaseException:
+                shutil.rmtree(staging, ignore_errors=True)
+                raise
+            self.registry.store(clone_id, site_config)
+            # Pages with source updates still queued are indexed from the cloned files
+            self.search_index.copy_site(site_id, clone_id, self.get_site_editor_path(clone_id))
+            self.notify_site("site.created", site_config)
+
+        logger.info(f"Cloned site {site_id} as {clone_id} ({', '.join(f'{n} {method}' for method, n in counts.items() if n)})")
+        return site_config
+
     def delete_site(self, site_id: str) -> bool:
         site_path = self.get_site_path(site_id)
         if not site_path.exists():
             return False
         
-        try:
-            shutil.rmtree(site_path)
-            return True
-        except OSError:
-            return False
+        with self.site_lock(site_id):
+            self._cancel_pending(site_id)
+            try:
+                with DISK_SECONDS.time(operation="delete_site"):
+                    shutil.rmtree(site_path)
+                self.notify("site.deleted", site_id)
+                return True
+            except OSError:
+                return False
+            finally:
+                self.registry.discard(site_id)
+                with self._pending_lock:
+                    self._revision_stores.pop(site_id, None)
+                with self._listings_lock:
+                    self._page_listings.pop(site_id, None)
+                self.search_index.remove_site(site_id)
     
+    def list_page_ids(self, site_id: str) -> Optional[List[str]]:
+        site_config = self.get_site_config(site_id)
+        if not site_config:
+            return None
+        return list(site_config.get("pages", {}))
+
+    @staticmethod
+    def _page_record(site_id: str, position: int, page_id: str, page: Dict) -> Dict:
+        modified_at = datetime.fromtimestamp(page["mtime"]).isoformat() if "mtime" in page else None
+        return {
+            "id": page_id,
+            "name": page.get("name"),
+            "site_id": site_id,
+            "position": position,
+            "created_at": page.get("created_at"),
+            "updated_at": modified_at,
+            "modified_at": modified_at,
+            "size": page.get("size"),
+            "sha256": page.get("sha256")
+        }
+
     def list_pages(self, site_id: str) -> List[Dict]:
+        """Pages in config order, described from the metadata cached in site.json."""
         site_config = self.get_site_config(site_id)
         if not site_config:
             return []
-        
-        pages = []
-        site_editor_dir = self.get_site_editor_path(site_id)
-
-        for page in site_config.get("pages", []):
-            page_id = list(page.keys())[0]
-            page_name = page[page_id]
-            page_path = site_editor_dir / f"{page_id}.html"
-            if page_path.exists():
-                stat = page_path.stat()
-                pages.append({
-                    "id": page_id,
-                    "name": page_name,
-                    "site_id": site_id,
-                    "modified_at": datetime.fromtimestamp(stat.st_mtime).isoformat()
-                })
-        
-        return pages
-    
-    def get_page_content(self, site_id: str, page_id: str) -> Optional[str]:
-        page_path = self.get_page_editor_path(site_id, page_id)
-        logger.info(f"Page path: {page_path.absolute()}")
-        if not page_path.exists():
+        return [self._page_record(site_id, position, page_id, page)
+                for position, (page_id, page) in enumerate(site_config.get("pages", {}).items())]
+
+    def page_pages(self, site_id: str, params: ListingParams) -> Optional[Tuple[List[Dict], Optional[str], int]]:
+        """One page of a site's pages per ``params``: (pages, next cursor, total pages), or None.
+
+        The sorted listing is built once per registry version of the config
+        and then updated page by page by create_page, update_page_content
+        and delete_page, so requests neither copy the config nor re-sort.
+        """
+        entry = self.registry.lookup(site_id)
+        if entry is None:
             return None
+        with self._listings_lock:
+            cached = self._page_listings.get(site_id)
+            if cached is None or cached[0] != entry.version:
+                pages = entry.config.get("pages", {})
+                listing = SortedListing(PAGE_SORT_KEYS, {
+                    page_id: self._page_record(site_id, position, page_id, page)
+                    for position, (page_id, page) in enumerate(pages.items())})
+                cached = self._page_listings[site_id] = (entry.version, listing)
+            pages, next_cursor = cached[1].page(params)
+            return pages, next_cursor, len(cached[1])
+
+    def _carry_page_listing(self, site_id: str, before: Optional[int],
+                            update: Optional[Callable[[SortedListing], None]] = None) -> None:
+        """Move the cached listing from registry version ``before`` to the current one.
 
+        ``update`` applies the page change just written. A listing built for
+        another version is dropped and rebuilt on the next read. Call with
+        the site lock held, right after the config was stored.
+        """
+        after = self.registry.version(site_id)
+        with self._listings_lock:
+            cached = self._page_listings.pop(site_id, None)
+            if cached is None or cached[0] != before or after is None:
+                return
+            if update is not None:
+                update(cached[1])
+            self._page_listings[site_id] = (after, cached[1])
+
+    def _update_listed_page(self, site_id: str, before: Optional[int], page_id: str, site_config: Dict) -> None:
+        def update(listing: SortedListing) -> None:
+            existing = listing.get(page_id)
+            position = existing["position"] if existing else len(site_config["pages"]) - 1
+            listing.update(page_id, self._page_record(site_id, position, page_id, site_config["pages"][page_id]))
+        self._carry_page_listing(site_id, before, update)
+
+    def _remove_listed_page(self, site_id: str, before: Optional[int], page_id: str, site_config: Dict) -> None:
+        def update(listing: SortedListing) -> None:
+            removed = listing.get(page_id)
+            listing.remove(page_id)
+            if removed is None:
+                return
+            # Later pages move up one position
+            pages = site_config["pages"]
+            for position, later_id in enumerate(list(pages)[removed["position"]:], removed["position"]):
+                listing.update(later_id, self._page_record(site_id, position, later_id, pages[later_id]))
+        self._carry_page_listing(site_id, before, update)
+
+    def get_page_content(self, site_id: str, page_id: str) -> Optional[str]:
+        page_path = self.get_page_editor_path(site_id, page_id)
+        logger.debug("Page path: %s", page_path)
         try:
-            with page_path.open('r', encoding='utf-8') as f:
+            with DISK_SECONDS.time(operation="read_page"), page_path.open('r', encoding='utf-8') as f:
                 content = f.read()
-                logger.info(f"Retrieved content: {content}")
-                return content
         except IOError:
             return None
+        # Page bodies are only logged when debug logging is enabled
+        logger.debug("Retrieved content: %s", content)
+        return content
     
     def get_page_template(self, site_id: str, page_id: str) -> Optional[str]:
         template_path = self.get_page_template_path(site_id, page_id)
@@ -203,81 +784,139 @@ class SiteManager:
     def create_page(self, site_id: str, page_name: str, template: str = "", style: str = "", website_builder_path: str = "") -> Optional[str]:
         logger.info(f"CREATING PAGE: {site_id}: {page_name}, {template}, {style}")
 
-        # Add page to site config
-        site_config = self.get_site_config(site_id)
-        if not site_config.get("pages"):
-            page_id = 'index'
-        else:
-            page_id = slugify_to_filename(page_name)
-        site_config["pages"].append({page_id: page_name})
-        site_config["updated_at"] = datetime.now().isoformat()
-        self.update_site_config(site_id, site_config)
+        with self.site_lock(site_id):
+            site_config = self.get_site_config(site_id)
+            if not site_config:
+                return None
+            listed_version = self.registry.version(site_id)
+            pages = site_config["pages"]
+            page_id = 'index' if not pages else unique_page_id(slugify_to_filename(page_name), pages)
 
-        editor_path: Path = self.get_site_editor_path(site_id)
-        try:
-            # Create index.html from template
-            source_template_path = Path(website_builder_path) / "templates" / f"{template}.html"
-            logger.info(f"Source template: {source_template_path}")
-            with source_template_path.open('r', encoding='utf-8') as f:
-                content = f.read()
-                content = content.replace("${PAGE_ID}", page_id)
-                logger.info(f"content: {content}")
-            page_path = editor_path / f"{page_id}.html"
-            logger.info(f"Destination template: {page_path}")
-            with page_path.open('w', encoding='utf-8') as f:
-                f.write(content)
-
-            # Copy style from template
-            source_style_path = Path(website_builder_path) / "styles" / f"{style}.css"
-            dest_style_path = editor_path / f"{page_id}.css"
-            if source_style_path.exists():
-                shutil.copy2(source_style_path, dest_style_path)
-
-            return page_id
-        except Exception as e:
-            logger.exception(e)
-            return None
-    
-    def update_page_content(self, site_id: str, page_id: str, content: str) -> bool:
-        # Verify site exists and page is registered
-        site_config = self.get_site_config(site_id)
+            editor_path: Path = self.get_site_editor_path(site_id)
+            try:
+                # Create the page from its template, compiled once per builder directory
+                content = RenderEngine.for_directory(Path(website_builder_path)).render_template(
+                    template, {"PAGE_ID": page_id})
+                logger.debug("content: %s", content)
+                page_path = editor_path / f"{page_id}.html"
+                logger.info(f"Destination template: {page_path}")
+                with DISK_SECONDS.time(operation="write_page"):
+                    atomic_write_text(page_path, content)
+                with DISK_SECONDS.time(operation="record_revision"):
+                    self.get_revision_store(site_id).record(page_id, content)
+                self.search_index.index_page(site_id, page_id, content)
 
-        page_path = self.get_page_editor_path(site_id, page_id)
-        try:
-            with page_path.open('w', encoding='utf-8') as f:
-                f.write(content)
+                # Copy style from template
+                source_style_path = Path(website_builder_path) / "styles" / f"{style}.css"
+                dest_style_path = editor_path / f"{page_id}.css"
+                if source_style_path.exists():
+                    shutil.copy2(source_style_path, dest_style_path)
 
-            # Update site's modified time
-            site_config["updated_at"] = datetime.now().isoformat()
-            self.update_site_config(site_id, site_config)
-            
-            return True
-        except IOError:
-            return False
+                # Register the page once its file exists; created_at is its first mtime,
+                # so it matches the updated_at listings derive from that mtime
+                page_stat = page_path.stat()
+                now = datetime.fromtimestamp(page_stat.st_mtime).isoformat()
+                pages[page_id] = dict({"name": page_name, "created_at": now},
+                                      **page_metadata(content.encode('utf-8'), page_stat))
+                site_config["updated_at"] = now
+                self.update_site_config(site_id, site_config)
+                self._update_listed_page(site_id, listed_version, page_id, site_config)
+                self._notify_page("page.created", site_id, page_id, site_config, page_stat)
+
+                return page_id
+            except Exception as e:
+                logger.exception(e)
+                return None
+
+    def update_page_content(self, site_id: str, page_id: str, content: str, expected_etag: Optional[str] = None) -> bool:
+        """Returns False if the site or page does not exist; raises InvalidPageId for malformed IDs."""
+        check_page_id(page_id)
+        with self.site_lock(site_id):
+            # Verify site exists and page is registered
+            site_config = self.get_site_config(site_id)
+            if not site_config or page_id not in site_config.get("pages", {}):
+                return False
+            listed_version = self.registry.version(site_id)
+
+            # Checked under the lock so concurrent conditional PUTs cannot both win
+            if expected_etag is not None and self.get_page_etag(site_id, page_id) != expected_etag:
+                raise PreconditionFailed(f"Page {site_id}/{page_id} was modified")
+
+            page_path = self.get_page_editor_path(site_id, page_id)
+            revisions = self.get_revision_store(site_id)
+            try:
+                if revisions.latest(page_id) is None and page_path.exists():
+                    # Page predates revision history; keep its current content as revision 1
+                    revisions.record(page_id, page_path.read_text(encoding='utf-8'))
+                with DISK_SECONDS.time(operation="write_page"):
+                    atomic_write_text(page_path, content)
+                with DISK_SECONDS.time(operation="record_revision"):
+                    revisions.record(page_id, content)
+                self.search_index.index_page(site_id, page_id, content)
+
+                # Refresh the page's cached metadata and the site's modified time
+                stat = page_path.stat()
+                site_config["pages"][page_id].update(page_metadata(content.encode('utf-8'), stat))
+                self.touch_site(site_id, site_config)
+                self._update_listed_page(site_id, listed_version, page_id, site_config)
+                self._notify_page("page.updated", site_id, page_id, site_config, stat)
+
+                return True
+            except IOError:
+                return False
     
     def delete_page(self, site_id: str, page_id: str) -> bool:
-        site_config = self.get_site_config(site_id)
-        
+        """Returns False if the site or page does not exist; raises InvalidPageId for malformed IDs."""
+        check_page_id(page_id)
         site_editor_path = self.get_site_editor_path(site_id)
-        try:
-            # Remove from config
-            for i in range(len(site_config["pages"])):
-                page = site_config["pages"][i]
-                curr_id = list(page.keys())[0]
-                if curr_id == page_id:
-                    del site_config["pages"][i]
-                    break
-            site_config["updated_at"] = datetime.now().isoformat()
+        with self.site_lock(site_id):
+            site_config = self.get_site_config(site_id)
+            if not site_config or page_id not in site_config.get("pages", {}):
+                return False
+            listed_version = self.registry.version(site_id)
+            try:
+                # Remove from config
+                del site_config["pages"][page_id]
+                site_config["updated_at"] = datetime.now().isoformat()
 
-            self.update_site_config(site_id, site_config)
+                self.update_site_config(site_id, site_config)
+                self._remove_listed_page(site_id, listed_version, page_id, site_config)
 
-            pathlist = Path(site_editor_path).glob(f'**/{page_id}.[a-z]*')
-            logger.info(f"Deleting: {site_editor_path}")
-            for path in pathlist:
-                logger.info(f"  {path}")
-                path.unlink()
-            
-            return True
-        except (OSError, ValueError):
-            return False
+                pathlist = Path(site_editor_path).glob(f'**/{page_id}.[a-z]*')
+                logger.info(f"Deleting: {site_editor_path}")
+                for path in pathlist:
+                    logger.info(f"  {path}")
+                    path.unlink()
+                self.get_revision_store(site_id).delete(page_id)
+                self.search_index.remove_page(site_id, page_id)
+                self.notify("page.deleted", site_id, page_id=page_id, updated_at=site_config["updated_at"])
+
+                return True
+            except (OSError, ValueError):
+                return False
+
+    def modify_page_content(self, site_id: str, page_id: str, transform: Callable[[str], str],
+                            expected_etag: Optional[str] = None) -> bool:
+        """Read-modify-write a page under the site lock (used for partial updates)."""
+        check_page_id(page_id)
+        with self.site_lock(site_id):
+            if expected_etag is not None and self.get_page_etag(site_id, page_id) != expected_etag:
+                raise PreconditionFailed(f"Page {site_id}/{page_id} was modified")
+            content = self.get_page_content(site_id, page_id)
+            if content is None:
+                return False
+            return self.update_page_content(site_id, page_id, transform(content))
+
+    def restore_page_revision(self, site_id: str, page_id: str, revision: int,
+                              expected_etag: Optional[str] = None) -> Optional[Dict]:
+        """Make an old revision the page's content again.
 
+        The restored content is saved as a new revision, so the restore
+        itself can be undone.
+        """
+        check_page_id(page_id)
+        with self.site_lock(site_id):
+            content = self.get_revision_store(site_id).get(page_id, revision)
+            if content is None or not self.update_page_content(site_id, page_id, content, expected_etag):
+                return None
+            return {"restored": revision, "revision": self.get_revision_store(site_id).latest(page_id)}
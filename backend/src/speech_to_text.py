@@ -1,105 +1,444 @@
 # pip install faster-whisper sounddevice numpy
-import queue
 import threading
 import time
+from collections import namedtuple
 from contextlib import contextmanager
 
 import numpy as np
-import sounddevice as sd
-from faster_whisper import WhisperModel
+
+from audio_buffer import AudioRingBuffer
+from metrics import REGISTRY
+from vad import NoiseFloor, extract_spans, speech_spans, to_source_offset
 
 SR = 16000
 CH = 1
 DTYPE = "float32"
 
+VAD_MODES = ("energy", "whisper", None)
+
+Segment = namedtuple("Segment", ["text", "start", "end"])
+
+STT_VAD_SECONDS = REGISTRY.histogram("stt_vad_seconds", "Voice activity detection time per window")
+STT_INFERENCE_SECONDS = REGISTRY.histogram("stt_inference_seconds", "Whisper inference time per window")
+STT_DECODED_AUDIO_SECONDS = REGISTRY.counter("stt_decoded_audio_seconds_total", "Audio seconds passed to Whisper")
+STT_REALTIME_FACTOR = REGISTRY.histogram(
+    "stt_audio_seconds_per_wall_second", "Audio seconds decoded per second of inference",
+    buckets=(0.5, 1, 2, 5, 10, 20, 50, 100))
+STT_CAPTURE_SECONDS = REGISTRY.histogram(
+    "stt_capture_seconds", "Length of captured recordings", buckets=(1, 2, 5, 10, 30, 60, 120, 300))
+STT_FINALIZE_SECONDS = REGISTRY.histogram(
+    "stt_finalize_seconds", "Time from transcription start to final text after a recording stops")
+
 class SpeechToText:
-    def __init__(self):
-        self.model = WhisperModel("base", device="auto", compute_type="int8")
-        self.audio_queue = queue.Queue()
+    def __init__(self, model_size="base", device="auto", compute_type="int8", cpu_threads=0,
+                 num_workers=1, warmup=True, streaming=False, step_seconds=1.0,
+                 min_window_seconds=2.0, stability_seconds=1.5, max_window_seconds=25.0,
+                 max_record_seconds=300.0, vad="energy", vad_parameters=None):
+        # "energy" trims silence with NumPy framing before inference,
+        # "whisper" uses faster-whisper's Silero vad_filter instead.
+        if vad not in VAD_MODES:
+            raise ValueError(f"Unknown VAD mode: {vad}")
+
+        # The Whisper model is loaded on first use or by load_model_async(),
+        # so constructing SpeechToText never blocks on model loading.
+        self.model_size = model_size
+        self.device = device
+        self.compute_type = compute_type
+        self.cpu_threads = cpu_threads
+        self.num_workers = num_workers
+        self.warmup = warmup
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._model_state = "unloaded"
+        self._model_error = None
+        self._model_timings = {}
+
+        self.vad = vad
+        self.vad_parameters = vad_parameters or {}
+
+        # Recording options shared by every RecordingSession
+        self.max_record_seconds = max_record_seconds
+        self.streaming = streaming
+        self.step_seconds = step_seconds
+        self.min_window_seconds = min_window_seconds
+        self.stability_seconds = stability_seconds
+        self.max_window_seconds = max_window_seconds
+        self._default_session = None
+
+    @property
+    def model(self):
+        if self._model is not None:
+            return self._model
+        return self.load_model()
+
+    @model.setter
+    def model(self, model):
+        with self._model_lock:
+            self._model = model
+            self._model_state = "ready"
+
+    def load_model(self):
+        """Load (and warm up) the Whisper model, blocking until it is ready."""
+        with self._model_lock:
+            if self._model is not None:
+                return self._model
+
+            self._model_state = "loading"
+            self._model_error = None
+            try:
+                from faster_whisper import WhisperModel
+
+                started = time.perf_counter()
+                model = WhisperModel(self.model_size, device=self.device, compute_type=self.compute_type,
+                                     cpu_threads=self.cpu_threads, num_workers=self.num_workers)
+                self._model_timings["load_seconds"] = time.perf_counter() - started
+
+                if self.warmup:
+                    self._model_state = "warming"
+                    started = time.perf_counter()
+                    self._warm_up(model)
+                    self._model_timings["warmup_seconds"] = time.perf_counter() - started
+            except Exception as e:
+                self._model_state = "error"
+                self._model_error = str(e)
+                raise
+
+            self._model = model
+            self._model_state = "ready"
+            return model
+
+    def load_model_async(self):
+        """Start loading the model on a background thread."""
+        def load():
+            try:
+                self.load_model()
+            except Exception as e:
+                print(f"Model loading error: {e}")
+
+        thread = threading.Thread(target=load, daemon=True)
+        thread.start()
+        return thread
+
+    def _warm_up(self, model):
+        # A short decode pays the first-call costs (kernel selection, allocator
+        # growth) before a real dictation does. Low-level noise rather than
+        # zeros keeps the decoder from short-circuiting.
+        noise = np.random.default_rng(0).normal(0, 0.01, SR).astype(DTYPE)
+        segments, _ = model.transcribe(noise, language="en", beam_size=1)
+        for _ in segments:
+            pass
+
+    def status(self):
+        return {
+            "state": self._model_state,
+            "ready": self._model_state == "ready",
+            "model_size": self.model_size,
+            "device": self.device,
+            "compute_type": self.compute_type,
+            "cpu_threads": self.cpu_threads,
+            "error": self._model_error,
+            **self._model_timings
+        }
+
+    def create_session(self, session_id=None, executor=None):
+        return RecordingSession(self, session_id, executor)
+
+    # Single-session interface, kept for callers that only ever record once
+    # at a time. Concurrent clients go through STTSessionManager instead.
+    @property
+    def is_recording(self):
+        return bool(self._default_session and self._default_session.is_recording)
+
+    @property
+    def transcription(self):
+        return self._default_session.transcription if self._default_session else None
+
+    @property
+    def last_timings(self):
+        return self._default_session.last_timings if self._default_session else {}
+
+    def start_recording(self):
+        if self.is_recording:
+            return
+        self._default_session = self.create_session("default")
+        self._default_session.start()
+
+    def stop_recording(self):
+        if not self._default_session:
+            return None
+        return self._default_session.stop()
+
+    def get_partial(self):
+        if not self._default_session:
+            return {"is_recording": False, "committed": "", "tentative": "", "text": ""}
+        return self._default_session.partial()
+
+    def transcribe(self, audio, prompt=None, timings=None, noise_floor=None):
+        """Run VAD and Whisper on a window of audio.
+
+        Segment times are seconds relative to the window. Phase timings are
+        accumulated into the optional ``timings`` dict. ``noise_floor`` carries
+        the energy VAD's background estimate from one window to the next.
+        """
+        timings = timings if timings is not None else {}
+
+        def add(**values):
+            for key, value in values.items():
+                timings[key] = timings.get(key, 0) + value
+
+        spans = None
+        kwargs = {}
+        if self.vad == "energy":
+            started = time.perf_counter()
+            spans = speech_spans(audio, SR, noise_floor=noise_floor, **self.vad_parameters)
+            elapsed = time.perf_counter() - started
+            add(vad_seconds=elapsed)
+            STT_VAD_SECONDS.observe(elapsed)
+            if not spans:
+                # Nothing was said; skip inference entirely
+                add(skipped=1)
+                return []
+            audio = extract_spans(audio, spans)
+        elif self.vad == "whisper":
+            kwargs = {"vad_filter": True, "vad_parameters": self.vad_parameters or None}
+
+        started = time.perf_counter()
+        segments, _ = self.model.transcribe(audio, language="en", initial_prompt=prompt, **kwargs)
+        segments = [Segment(s.text, s.start, s.end) for s in segments]
+        elapsed = time.perf_counter() - started
+        add(inference_seconds=elapsed, decoded_seconds=len(audio) / SR, inferences=1)
+        STT_INFERENCE_SECONDS.observe(elapsed)
+        STT_DECODED_AUDIO_SECONDS.inc(len(audio) / SR)
+        if elapsed > 0:
+            STT_REALTIME_FACTOR.observe(len(audio) / SR / elapsed)
+
+        if spans:
+            # Map times in the trimmed audio back onto the original window
+            segments = [Segment(s.text,
+                                to_source_offset(spans, int(s.start * SR)) / SR,
+                                to_source_offset(spans, int(s.end * SR)) / SR)
+                        for s in segments]
+        return segments
+
+
+class RecordingSession:
+    """One microphone capture and its transcription state.
+
+    Sessions share the SpeechToText model; each owns its audio buffer,
+    capture thread and (in streaming mode) its own background worker. With
+    ``executor`` set, that worker runs each window's inference on it, so
+    streaming sessions share the pool that bounds concurrent inferences.
+    """
+
+    def __init__(self, stt, session_id=None, executor=None):
+        self.stt = stt
+        self.session_id = session_id
+        self.executor = executor
+        # Captured audio; the oldest samples are dropped past max_record_seconds
+        self.audio_buffer = AudioRingBuffer(SR, max_seconds=stt.max_record_seconds)
         self.is_recording = False
         self.transcription = None
-        self._stream = None
+        self.last_timings = {}
+        self.started_at = None
+        self.stopped_at = None
         self._recording_thread = None
+        self._streaming_thread = None
         self._stop_event = threading.Event()
-        
-    def start_recording(self):
+        self._state_lock = threading.Lock()
+        self._committed = []
+        self._committed_until = 0
+        self._tentative = ""
+        # Background level for the energy VAD, learned over this recording
+        self._noise_floor = NoiseFloor()
+        self._timings = {"vad_seconds": 0.0, "inference_seconds": 0.0,
+                         "decoded_seconds": 0.0, "inferences": 0, "skipped": 0}
+
+    @property
+    def state(self):
+        if self.is_recording:
+            return "recording"
+        if self.transcription is None:
+            return "captured" if self.stopped_at else "idle"
+        return "done"
+
+    def start(self, source=None):
+        """Start capturing from the microphone, or from ``source``.
+
+        ``source`` is an iterable of float32 sample blocks (e.g. a recorded
+        clip for benchmarks); it is responsible for its own pacing.
+        """
         if self.is_recording:
             return
-            
+
         self.is_recording = True
         self.transcription = None
+        self.started_at = time.monotonic()
+        self.stopped_at = None
         self._stop_event.clear()
-        
-        # Clear any old audio data
-        while not self.audio_queue.empty():
-            try:
-                self.audio_queue.get_nowait()
-            except queue.Empty:
-                break
-                
-        self._recording_thread = threading.Thread(target=self._record_audio, daemon=True)
+
+        if source is None:
+            self._recording_thread = threading.Thread(target=self._record_audio, daemon=True)
+        else:
+            self._recording_thread = threading.Thread(target=self._play_source, args=(source,), daemon=True)
         self._recording_thread.start()
-        
-    def stop_recording(self):
+
+        if self.stt.streaming:
+            self._streaming_thread = threading.Thread(target=self._stream_transcribe, daemon=True)
+            self._streaming_thread.start()
+
+    def stop_capture(self):
+        """Stop recording without transcribing what is left."""
         if not self.is_recording:
-            return self.transcription
-            
+            return
+
         self.is_recording = False
+        self.stopped_at = time.monotonic()
         self._stop_event.set()
-        
+
         if self._recording_thread:
             self._recording_thread.join(timeout=5)
-            
-        # Process collected audio
-        self._process_audio()
+        if self._streaming_thread:
+            self._streaming_thread.join()
+            self._streaming_thread = None
+
+    def finish(self):
+        """Transcribe the uncommitted remainder; returns the full transcription."""
+        if self.transcription is None:
+            self._process_audio()
         return self.transcription
-        
+
+    def stop(self):
+        self.stop_capture()
+        return self.finish()
+
+    def partial(self):
+        """Committed text plus the current tentative tail, for live captions."""
+        with self._state_lock:
+            committed = " ".join(self._committed)
+            tentative = self._tentative
+        if not self.is_recording and self.transcription is not None:
+            committed, tentative = self.transcription, ""
+        return {
+            "session_id": self.session_id,
+            "state": self.state,
+            "is_recording": self.is_recording,
+            "committed": committed,
+            "tentative": tentative,
+            "text": " ".join(part for part in (committed, tentative) if part)
+        }
+
     def _record_audio(self):
+        import sounddevice as sd
+
         def callback(indata, frames, time_info, status):
             if status:
                 print(f"Audio input status: {status}")
             if not self._stop_event.is_set():
-                try:
-                    self.audio_queue.put_nowait(indata.copy())
-                except queue.Full:
-                    pass
-                    
+                self.audio_buffer.write(indata)
+
         try:
             with sd.InputStream(
-                samplerate=SR, 
-                channels=CH, 
-                dtype=DTYPE, 
+                samplerate=SR,
+                channels=CH,
+                dtype=DTYPE,
                 callback=callback
             ):
                 while not self._stop_event.is_set():
                     time.sleep(0.1)
         except Exception as e:
             print(f"Recording error: {e}")
-            
-    def _process_audio(self):
-        if self.audio_queue.empty():
-            self.transcription = ""
-            return
-            
-        audio_data = []
-        while not self.audio_queue.empty():
-            try:
-                chunk = self.audio_queue.get_nowait()
-                audio_data.append(chunk)
-            except queue.Empty:
-                break
-                
-        if not audio_data:
-            self.transcription = ""
-            return
-            
-        # Combine all audio chunks
-        combined_audio = np.concatenate(audio_data, axis=0).flatten()
-        
-        # Transcribe
+
+    def _play_source(self, source):
         try:
-            segments, _ = self.model.transcribe(combined_audio, language="en")
-            self.transcription = "".join(s.text for s in segments).strip()
+            for block in source:
+                if self._stop_event.is_set():
+                    break
+                self.audio_buffer.write(block)
         except Exception as e:
-            print(f"Transcription error: {e}")
-            self.transcription = ""
+            print(f"Recording error: {e}")
+
+    def _transcribe(self, audio):
+        with self._state_lock:
+            prompt = " ".join(self._committed)[-200:] or None
+        timings = {}
+        segments = self.stt.transcribe(audio, prompt=prompt, timings=timings, noise_floor=self._noise_floor)
+        with self._state_lock:
+            for key, value in timings.items():
+                self._timings[key] = self._timings.get(key, 0) + value
+        return segments
+
+    def _transcribe_window(self, start, end):
+        # The view is taken when inference starts, after any wait for a worker
+        return self._transcribe(self.audio_buffer.view(start, end))
+
+    def _stream_transcribe(self):
+        stt = self.stt
+        while not self._stop_event.wait(stt.step_seconds):
+            # Audio older than the buffer capacity may have been dropped
+            start = max(self._committed_until, self.audio_buffer.first_sample)
+            pending = self.audio_buffer.total_samples - start
+            if pending < stt.min_window_seconds * SR:
+                continue
+
+            try:
+                if self.executor is None:
+                    segments = self._transcribe_window(start, start + pending)
+                else:
+                    # Waits for a free worker, like a stopped recording does
+                    segments = self.executor.submit(self._transcribe_window, start, start + pending).result()
+            except Exception as e:
+                print(f"Streaming transcription error: {e}")
+                continue
+
+            # Segments that end well before the window edge won't change with
+            # more audio; commit them and restart the next window after them.
+            window_seconds = pending / SR
+            stable_until = window_seconds - stt.stability_seconds
+            force = window_seconds > stt.max_window_seconds
+            committed = []
+            # Without any speech, the stable part of the window is silence
+            advance = 0.0 if segments else max(0.0, stable_until)
+            for i, segment in enumerate(segments):
+                is_last = i == len(segments) - 1
+                if segment.end <= stable_until or (force and not is_last):
+                    committed.append(segment.text.strip())
+                    advance = segment.end
+                else:
+                    break
+            tentative = " ".join(s.text.strip() for s in segments[len(committed):])
+
+            with self._state_lock:
+                self._committed.extend(text for text in committed if text)
+                self._committed_until = start + int(advance * SR)
+                self._tentative = tentative
+
+    def _process_audio(self):
+        started = time.perf_counter()
+        start = max(self._committed_until, self.audio_buffer.first_sample)
+        total = self.audio_buffer.total_samples
+        with self._state_lock:
+            committed = " ".join(self._committed)
+            decoded_before = self._timings.get("decoded_seconds", 0.0)
+
+        # Transcribe whatever has not been committed by the streaming worker
+        self.transcription = committed
+        if total - start > 0:
+            try:
+                segments = self._transcribe(self.audio_buffer.view(start))
+                tail = "".join(s.text for s in segments).strip()
+                self.transcription = " ".join(part for part in (committed, tail) if part)
+            except Exception as e:
+                print(f"Transcription error: {e}")
+
+        with self._state_lock:
+            self._tentative = ""
+            timings = dict(self._timings)
+        timings.update({
+            "captured_seconds": total / SR,
+            "dropped_seconds": self.audio_buffer.dropped_samples / SR,
+            "final_decoded_seconds": timings.get("decoded_seconds", 0.0) - decoded_before,
+            "stop_seconds": time.perf_counter() - started,
+        })
+        self.last_timings = timings
+        STT_CAPTURE_SECONDS.observe(timings["captured_seconds"])
+        STT_FINALIZE_SECONDS.observe(timings["stop_seconds"])
@@ -0,0 +1,198 @@
+import logging
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Dict, Optional
+
+from events import EventBus
+from metrics import REGISTRY
+from speech_to_text import RecordingSession, SpeechToText
+
+logging.basicConfig(format='%(levelname)s:%(message)s', level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SESSION_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+STT_QUEUE_WAIT_SECONDS = REGISTRY.histogram(
+    "stt_queue_wait_seconds", "Time a stopped recording waits for a transcription worker")
+STT_REJECTED = REGISTRY.counter("stt_rejected_total", "Recordings refused because the queue was full")
+
+
+class SessionNotFound(KeyError):
+    pass
+
+
+class SessionLimitReached(Exception):
+    pass
+
+
+class TranscriptionQueueFull(Exception):
+    pass
+
+
+class TranscriptionTimeout(Exception):
+    pass
+
+
+class _SessionRecord:
+    __slots__ = ("session", "future", "timer", "submitted_at", "finished_at")
+
+    def __init__(self, session: RecordingSession):
+        self.session = session
+        self.future = None
+        self.timer = None
+        self.submitted_at = None
+        self.finished_at = None
+
+
+class STTSessionManager:
+    """Concurrent recording sessions sharing one loaded model.
+
+    Finished clips and streaming windows are transcribed on a bounded worker
+    pool, so at most ``workers`` inferences run at once; when more than
+    ``max_pending`` clips are waiting, stop() raises TranscriptionQueueFull
+    and the captured audio is kept so the client can retry. Recordings are
+    stopped automatically after ``max_record_seconds`` and results are
+    dropped ``result_ttl`` seconds after they are ready. With ``events`` set,
+    session state changes are published to it as ``stt.session`` events.
+    """
+
+    def __init__(self, stt: SpeechToText, workers: int = 2, max_pending: int = 4,
+                 max_sessions: int = 8, max_record_seconds: float = 300.0, result_ttl: float = 300.0,
+                 events: Optional[EventBus] = None):
+        self.stt = stt
+        self.events = events
+        self.workers = workers
+        self.max_sessions = max_sessions
+        self.max_record_seconds = max_record_seconds
+        self.result_ttl = result_ttl
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="stt-worker")
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+        self._sessions: Dict[str, _SessionRecord] = {}
+        self._lock = threading.Lock()
+        self._pending = 0
+        REGISTRY.gauge("stt_pending_transcriptions", "Stopped recordings queued or being transcribed",
+                       lambda: self._pending)
+
+    def _notify(self, session_id: str, state: str) -> None:
+        if self.events is not None:
+            self.events.publish("stt.session", {"session_id": session_id, "state": state})
+
+    def _reap(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            for session_id, record in list(self._sessions.items()):
+                session = record.session
+                done_at = record.finished_at
+                if done_at is None and record.future is None and not session.is_recording:
+                    # Captured but never transcribed (e.g. the queue was full)
+                    done_at = session.stopped_at
+                if done_at is not None and now - done_at > self.result_ttl:
+                    del self._sessions[session_id]
+
+    def _get(self, session_id: str) -> _SessionRecord:
+        with self._lock:
+            record = self._sessions.get(session_id)
+        if record is None:
+            raise SessionNotFound(session_id)
+        return record
+
+    def start(self, session_id: Optional[str] = None, source=None) -> RecordingSession:
+        self._reap()
+        session_id = session_id or uuid.uuid4().hex
+        if not SESSION_ID_PATTERN.match(session_id):
+            raise ValueError(f"Invalid session id: {session_id}")
+
+        with self._lock:
+            record = self._sessions.get(session_id)
+            if record and record.session.is_recording:
+                return record.session
+            recording = sum(1 for r in self._sessions.values() if r.session.is_recording)
+            if recording >= self.max_sessions:
+                raise SessionLimitReached(f"{recording} sessions are already recording")
+
+            record = _SessionRecord(self.stt.create_session(session_id, self._executor))
+            self._sessions[session_id] = record
+
+        record.session.start(source)
+        record.timer = threading.Timer(self.max_record_seconds, self._expire, args=(session_id,))
+        record.timer.daemon = True
+        record.timer.start()
+        self._notify(session_id, record.session.state)
+        return record.session
+
+    def _expire(self, session_id: str) -> None:
+        logger.info(f"STT session {session_id} reached the {self.max_record_seconds}s limit")
+        try:
+            self._submit(self._get(session_id))
+        except (SessionNotFound, TranscriptionQueueFull):
+            pass
+
+    def _run(self, record: _SessionRecord) -> str:
+        STT_QUEUE_WAIT_SECONDS.observe(time.monotonic() - record.submitted_at)
+        try:
+            return record.session.finish()
+        finally:
+            record.finished_at = time.monotonic()
+            with self._lock:
+                self._pending -= 1
+            self._slots.release()
+            self._notify(record.session.session_id, record.session.state)
+
+    def _submit(self, record: _SessionRecord):
+        if record.timer:
+            record.timer.cancel()
+        record.session.stop_capture()
+
+        with self._lock:
+            if record.future is not None:
+                return record.future
+            if not self._slots.acquire(blocking=False):
+                STT_REJECTED.inc()
+                raise TranscriptionQueueFull("Transcription queue is full")
+            record.submitted_at = time.monotonic()
+            self._pending += 1
+            record.future = self._executor.submit(self._run, record)
+        self._notify(record.session.session_id, "queued")
+        return record.future
+
+    def stop(self, session_id: str, timeout: Optional[float] = None) -> Dict:
+        """Stop a recording and wait up to ``timeout`` seconds for its transcription."""
+        future = self._submit(self._get(session_id))
+        try:
+            future.result(timeout=timeout)
+        except FutureTimeout:
+            raise TranscriptionTimeout(session_id)
+        return self.result(session_id)
+
+    def result(self, session_id: str) -> Dict:
+        session = self._get(session_id).session
+        return {
+            "session_id": session_id,
+            "state": session.state,
+            "transcription": session.transcription,
+            "timings": session.last_timings
+        }
+
+    def partial(self, session_id: str) -> Dict:
+        return self._get(session_id).session.partial()
+
+    def status(self) -> Dict:
+        self._reap()
+        with self._lock:
+            sessions = {session_id: record.session.state for session_id, record in self._sessions.items()}
+        return {
+            "workers": self.workers,
+            "sessions": sessions
+        }
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            records = list(self._sessions.values())
+        for record in records:
+            if record.timer:
+                record.timer.cancel()
+            record.session.stop_capture()
+        self._executor.shutdown(wait=wait)
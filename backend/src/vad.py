@@ -0,0 +1,103 @@
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+class NoiseFloor:
+    """Background level (dBFS) tracked across the windows of one recording.
+
+    Each window's quiet frames, those not classed as speech, move the
+    estimate towards their 10th percentile by ``alpha``. A window without
+    quiet frames leaves it unchanged, so continuous speech never becomes
+    the floor.
+    """
+
+    __slots__ = ("alpha", "level")
+
+    def __init__(self, alpha: float = 0.3):
+        self.alpha = alpha
+        self.level: Optional[float] = None
+
+    def update(self, quiet_db: np.ndarray) -> None:
+        if len(quiet_db) == 0:
+            return
+        level = float(np.percentile(quiet_db, 10))
+        self.level = level if self.level is None else self.level + self.alpha * (level - self.level)
+
+
+def speech_spans(audio: np.ndarray, samplerate: int, frame_ms: float = 30.0,
+                 threshold_db: float = -45.0, noise_margin_db: float = 12.0,
+                 padding_ms: float = 250.0, min_silence_ms: float = 600.0,
+                 min_speech_ms: float = 120.0,
+                 noise_floor: Optional[NoiseFloor] = None) -> List[Tuple[int, int]]:
+    """Energy-based voice activity detection.
+
+    Splits the audio into frames and marks a frame as speech when its RMS
+    level is above both ``threshold_db`` (dBFS) and the noise floor plus
+    ``noise_margin_db``. The floor comes from ``noise_floor``, which this
+    call also updates, or is estimated from this audio alone when there is
+    no tracked level yet. If that estimate rejects every frame, the audio
+    may be all speech, and ``threshold_db`` alone decides. Speech runs are
+    padded, gaps shorter than ``min_silence_ms`` are bridged and runs
+    shorter than ``min_speech_ms`` are dropped. Returns [start, end) sample
+    ranges; empty when nothing was said.
+    """
+    frame = max(1, int(samplerate * frame_ms / 1000))
+    num_frames = len(audio) // frame
+    if num_frames == 0:
+        return []
+
+    frames = audio[:num_frames * frame].reshape(num_frames, frame)
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float32), axis=1))
+    level_db = 20 * np.log10(np.maximum(rms, 1e-10))
+    tracked = noise_floor is not None and noise_floor.level is not None
+    floor = noise_floor.level if tracked else np.percentile(level_db, 10)
+    threshold = max(threshold_db, floor + noise_margin_db)
+    speech = level_db > threshold
+    if not tracked and not speech.any():
+        threshold = threshold_db
+        speech = level_db > threshold
+    if noise_floor is not None:
+        noise_floor.update(level_db[~speech])
+
+    voiced = np.flatnonzero(speech)
+    if len(voiced) == 0:
+        return []
+
+    # Group voiced frames into runs, bridging short pauses
+    max_gap = max(1, int(min_silence_ms / frame_ms))
+    breaks = np.flatnonzero(np.diff(voiced) > max_gap)
+    starts = np.concatenate(([voiced[0]], voiced[breaks + 1]))
+    ends = np.concatenate((voiced[breaks], [voiced[-1]])) + 1
+
+    padding = int(samplerate * padding_ms / 1000)
+    min_speech = int(samplerate * min_speech_ms / 1000)
+    spans: List[Tuple[int, int]] = []
+    for start, end in zip(starts * frame, ends * frame):
+        if end - start < min_speech:
+            continue
+        start = max(0, start - padding)
+        end = min(len(audio), end + padding)
+        if spans and start <= spans[-1][1]:
+            spans[-1] = (spans[-1][0], end)
+        else:
+            spans.append((int(start), int(end)))
+    return spans
+
+
+def extract_spans(audio: np.ndarray, spans: List[Tuple[int, int]]) -> np.ndarray:
+    """Join the given spans; a single span is returned as a view without copying."""
+    if len(spans) == 1:
+        start, end = spans[0]
+        return audio[start:end]
+    return np.concatenate([audio[start:end] for start, end in spans])
+
+
+def to_source_offset(spans: List[Tuple[int, int]], offset: int) -> int:
+    """Map a sample offset in extract_spans() output back to the original audio."""
+    for start, end in spans:
+        length = end - start
+        if offset <= length:
+            return start + offset
+        offset -= length
+    return spans[-1][1] if spans else offset
@@ -0,0 +1,198 @@
+import logging
+import signal
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+from bottle import ServerAdapter, WSGIRefServer, run
+
+logging.basicConfig(format='%(levelname)s:%(message)s', level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class _DetachableWriter:
+    """A handler's output stream; writes are dropped once the app has detached the connection."""
+
+    def __init__(self, wfile):
+        self._wfile = wfile
+        self.detached = False
+
+    def write(self, data) -> int:
+        if self.detached:
+            return len(data)
+        return self._wfile.write(data)
+
+    def flush(self) -> None:
+        if not self.detached:
+            self._wfile.flush()
+
+    def __getattr__(self, name):
+        return getattr(self._wfile, name)
+
+
+class _RequestHandler(WSGIRequestHandler):
+    # Socket read/write timeout, so stalled clients cannot pin a worker
+    timeout = 30.0
+
+    def setup(self):
+        super().setup()
+        self.wfile = _DetachableWriter(self.wfile)
+
+    def get_environ(self):
+        environ = super().get_environ()
+        environ['wsgi_server.detach'] = self.detach
+        return environ
+
+    def detach(self) -> socket.socket:
+        """Hand the connection over to the app, e.g. for a long-lived event stream.
+
+        The server writes nothing more to it (the WSGI response is discarded)
+        and does not close it; the caller owns the socket from then on.
+        """
+        self.wfile.detached = True
+        self.close_connection = True
+        self.server.detach_request(self.connection)
+        return self.connection
+
+    def handle(self):
+        try:
+            super().handle()
+        except (socket.timeout, ConnectionError) as e:
+            logger.debug(f"Connection from {self.client_address[0]} dropped: {e}")
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.client_address[0]} {format % args}")
+
+
+class _DetachingServerMixin:
+    """Leaves connections taken over with ``environ['wsgi_server.detach']`` open."""
+
+    def detach_request(self, request) -> None:
+        with self._detached_lock:
+            self._detached.add(request)
+
+    def shutdown_request(self, request):
+        with self._detached_lock:
+            if request in self._detached:
+                self._detached.discard(request)
+                return
+        super().shutdown_request(request)
+
+
+class _DetachableWSGIServer(_DetachingServerMixin, WSGIServer):
+    def __init__(self, *args, **kwargs):
+        self._detached = set()
+        self._detached_lock = threading.Lock()
+        super().__init__(*args, **kwargs)
+
+
+class ThreadPoolWSGIServer(_DetachingServerMixin, WSGIServer):
+    """wsgiref server that handles requests on a fixed pool of threads.
+
+    At most ``threads * backlog_per_thread`` accepted connections are
+    queued; beyond that the accept loop waits and new connections back up
+    in the kernel's listen queue.
+    """
+
+    allow_reuse_address = True
+    request_queue_size = 128
+
+    def __init__(self, server_address, handler_class, threads: int = 16, backlog_per_thread: int = 4):
+        if ':' in server_address[0]:
+            self.address_family = socket.AF_INET6
+        super().__init__(server_address, handler_class)
+        self.threads = threads
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="http")
+        self._slots = threading.BoundedSemaphore(threads * backlog_per_thread)
+        self._detached = set()
+        self._detached_lock = threading.Lock()
+
+    def process_request(self, request, client_address):
+        self._slots.acquire()
+        try:
+            self._executor.submit(self._process, request, client_address)
+        except RuntimeError:
+            # Pool already shut down
+            self._slots.release()
+            self.shutdown_request(request)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._slots.release()
+
+    def server_close(self):
+        super().server_close()
+        # Let in-flight requests finish
+        self._executor.shutdown(wait=True)
+
+
+class ThreadPoolServer(ServerAdapter):
+    """Bottle adapter for ThreadPoolWSGIServer.
+
+    Options: ``threads`` (worker threads) and ``timeout`` (socket timeout in seconds).
+    """
+
+    quiet = True
+
+    def __init__(self, host='127.0.0.1', port=8080, **options):
+        super().__init__(host, port, **options)
+        self.server: Optional[ThreadPoolWSGIServer] = None
+        self._ready = threading.Event()
+
+    def run(self, handler):
+        handler_class = type("RequestHandler", (_RequestHandler,),
+                             {"timeout": float(self.options.get("timeout", _RequestHandler.timeout))})
+        self.server = ThreadPoolWSGIServer((self.host, self.port), handler_class,
+                                           threads=int(self.options.get("threads", 16)))
+        self.server.set_app(handler)
+        self._ready.set()
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+
+    def shutdown(self) -> None:
+        """Stop accepting connections; safe to call from any thread but the serving one."""
+        if self._ready.wait(timeout=5) and self.server:
+            self.server.shutdown()
+
+
+class DevServer(WSGIRefServer):
+    """Bottle's single-threaded development server, with connection detaching for event streams."""
+
+    def __init__(self, host='127.0.0.1', port=8080, **options):
+        options.setdefault('server_class', _DetachableWSGIServer)
+        options.setdefault('handler_class', _RequestHandler)
+        super().__init__(host, port, **options)
+
+
+def serve(app, host: str, port: int, threads: int = 16, timeout: float = 30.0,
+          on_shutdown: Optional[List[Callable[[], None]]] = None) -> None:
+    """Serve a WSGI app until SIGINT/SIGTERM, then drain requests and run cleanups."""
+    server = ThreadPoolServer(host=host, port=port, threads=threads, timeout=timeout)
+
+    def stop(signum, frame):
+        logger.info(f"Received {signal.Signals(signum).name}, shutting down")
+        # shutdown() blocks until serve_forever returns, so it cannot run on the serving thread
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    logger.info(f"Serving on http://{host}:{port} with {threads} threads")
+    run(app, server=server, debug=False, quiet=True)
+
+    for callback in on_shutdown or []:
+        try:
+            callback()
+        except Exception:
+            logger.exception("Shutdown hook failed")
+    logger.info("Server stopped")